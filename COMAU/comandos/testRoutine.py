@@ -159,20 +159,11 @@ def testRoutine(verbose: bool = False) -> Dict[str, Any]:
             
             if response_result_2['success']:
                 print(f"[testRoutine] ✅ Segunda respuesta recibida: 'Take a Photo!'")
-                # Emitir eventos por websocket usando sockets.socketio si está inicializado
+                # Ejecutar procesamiento visual (cola de análisis); broadcast=True: el resultado
+                # completo se emite como SERVER_TEST_RESULT a todos los clientes del dashboard
                 try:
-                    import sockets
-                    if getattr(sockets, 'socketio', None) is not None:
-                        sockets.socketio.emit('AUTO_ANALYZE')
-                    else:
-                        print("[testRoutine] ⚠️ SocketIO no inicializado (sockets.socketio es None)")
-                except Exception as socket_exc:
-                    print(f"[testRoutine] ⚠️ No se pudo emitir AUTO_ANALYZE vía websocket: {socket_exc}")
-
-                # Ejecutar procesamiento visual
-                try:
-                    from src.vision.vision_manager import server_test
-                    server_result = server_test()
+                    from src.vision import analysis_jobs
+                    server_result = analysis_jobs.run_analysis(source='testRoutine', broadcast=True)
                     if isinstance(server_result, dict) and 'overlay_image' in server_result:
                         result_no_img = {k: v for k, v in server_result.items() if k != 'overlay_image'}
                     else:
@@ -258,16 +249,6 @@ def testRoutine(verbose: bool = False) -> Dict[str, Any]:
                                 print(f"[testRoutine] ⚠️ Error esperando confirmación de troquelado: {wait_exc}")
                     except Exception as seq_exc:
                         print(f"[testRoutine] ❌ Error construyendo/enviando secuencia de muescas: {seq_exc}")
-                    # Emitir resultado completo al frontend (incluye overlay para que dashboard muestre imagen)
-                    try:
-                        import sockets
-                        if getattr(sockets, 'socketio', None) is not None:
-                            sockets.socketio.emit('SERVER_TEST_RESULT', server_result)
-                            print("[testRoutine] 📤 Evento SERVER_TEST_RESULT emitido (websocket)")
-                        else:
-                            print("[testRoutine] ⚠️ SocketIO no inicializado, no se emite SERVER_TEST_RESULT")
-                    except Exception as emit_exc:
-                        print(f"[testRoutine] ⚠️ Error emitiendo SERVER_TEST_RESULT: {emit_exc}")
                 except Exception as vision_exc:
                     print(f"[testRoutine] ❌ Error ejecutando análisis visual: {vision_exc}")
 
@@ -1,6 +1,7 @@
 from flask import Flask, send_from_directory, jsonify, request, Response
 import os
 import sys
+import copy
 import signal
 import argparse
 import subprocess
@@ -13,10 +14,16 @@ from datetime import datetime
 from flask_socketio import SocketIO, emit
 import sockets
 
+from src import config_store
 from src.vision import camera_manager
 from src.vision import yolo_detector
+from src.vision import inference_worker
+from src.vision import vision_client
+from src.vision import analysis_jobs
+from src.vision import frame_transport
+from src.vision import config_sync
+from src.vision import health_monitor
 from src.vision.aruco_manager import detect_arucos_in_image, is_frame_detected, is_tool_detected
-from src.vision.vision_manager import server_test
 
 # Importar módulos de rendering
 import muescas_renderer
@@ -88,12 +95,7 @@ def signal_handler(signum, frame):
     cleanup_vision_server()
     exit(0)
 
-# Registrar manejadores de señales
-signal.signal(signal.SIGINT, signal_handler)   # Ctrl+C
-signal.signal(signal.SIGTERM, signal_handler)  # Terminación del sistema
-
-# Registrar función de limpieza al salir
-atexit.register(cleanup_vision_server)
+# Señales y limpieza al salir: se registran en _install_process_hooks() (desde main())
 
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 1
 
@@ -135,7 +137,8 @@ def api_status():
         'ok': True,
         'status': 'online',
         'timestamp': datetime.now().isoformat(),
-        'message': 'Servidor operativo'
+        'message': 'Servidor operativo',
+        'models': yolo_detector.get_models_status()
     })
 
 # ============================================================
@@ -289,26 +292,14 @@ def video_feed():
 # FUNCIONES AUXILIARES DE CONFIGURACIÓN
 # ============================================================
 def load_config():
-    """Carga la configuración completa desde config.json"""
-    if os.path.exists(CONFIG_FILE):
+    """Carga la configuración completa (copia en memoria de config.json)"""
+    if config_store.exists(CONFIG_FILE):
         try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return config_store.load(CONFIG_FILE)
         except Exception as e:
             print(f"[vision] Error cargando configuración: {e}")
     return {'vision': {}, 'aruco': {}}
 
-def save_config(config_data):
-    """Guarda la configuración completa en config.json"""
-    try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config_data, f, indent=2, ensure_ascii=False)
-        print(f"[vision] ✓ Configuración guardada")
-        return True
-    except Exception as e:
-        print(f"[vision] ✗ Error guardando configuración: {e}")
-        return False
-
 def load_aruco_config():
     """Carga la configuración de ArUcos desde config.json"""
     config = load_config()
@@ -329,15 +320,15 @@ def load_aruco_config():
     
     return config.get('aruco', default_aruco)
 
-def save_aruco_config(full_config):
-    """Guarda la configuración COMPLETA en config.json"""
-    try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(full_config, f, indent=2)
-        return True
-    except Exception as e:
-        print(f"[aruco] Error guardando config: {e}")
-        return False
+# Secciones de config.json que forman parte de la configuración del servidor de visión
+VISION_SYNC_SECTIONS = ('aruco', 'vision')
+
+def _on_config_change(path, sections):
+    """Listener de config_store: avisa al frontend y sincroniza el servidor de visión si corresponde"""
+    socketio.emit('CONFIG_CHANGED', {'path': path, 'sections': sections})
+    if any(section in VISION_SYNC_SECTIONS for section in sections):
+        threading.Thread(target=config_sync.sync, daemon=True, name='ConfigSyncOnChange').start()
+
 
 # ============================================================
 # API ARUCO
@@ -386,17 +377,17 @@ def api_overlay_render():
         
         # Obtener frame fresco de la cámara
         print(f"[overlay] Capturando frame fresco de la cámara...")
-        cv2_frame = None
+        frame_ctx = None
         for attempt in range(3):
-            cv2_frame = camera_manager.get_frame_raw()
-            if cv2_frame is not None:
+            frame_ctx = camera_manager.get_frame_context()
+            if frame_ctx is not None:
                 print(f"[overlay] ✓ Frame capturado en intento {attempt + 1}")
                 break
             else:
                 print(f"[overlay] ⚠️ Intento {attempt + 1} falló, reintentando...")
                 time.sleep(0.1)
         
-        if cv2_frame is None:
+        if frame_ctx is None:
             return jsonify({
                 'ok': False,
                 'error': 'No se pudo capturar un frame fresco de la cámara después de 3 intentos'
@@ -407,9 +398,10 @@ def api_overlay_render():
         
         # Usar aruco_manager para toda la lógica específica del proyecto
         result = render_overlay_with_arucos(
-            overlay_manager, cv2_frame, frame_aruco_id, tool_aruco_id,
+            overlay_manager, frame_ctx, frame_aruco_id, tool_aruco_id,
             frame_marker_size, tool_marker_size, center_x, center_y,
-            show_frame, show_tool, show_center
+            show_frame, show_tool, show_center,
+            aruco_config=load_aruco_config()
         )
         
         if not result['ok']:
@@ -418,9 +410,9 @@ def api_overlay_render():
                 'error': result['error']
             }), 500
         
-        # Convertir imagen a escala de grises y luego a RGB para conservar colores de overlays
-        gray_frame = cv2.cvtColor(cv2_frame, cv2.COLOR_BGR2GRAY)
-        rgb_background = cv2.cvtColor(gray_frame, cv2.COLOR_GRAY2RGB)
+        # Fondo en escala de grises (3 canales) para conservar colores de overlays.
+        # Se reutiliza la conversión a grises ya hecha para la detección ArUco.
+        rgb_background = frame_ctx.gray_bgr
         
         # Renderizar overlay sobre fondo en escala de grises
         result_image, view_time = overlay_manager.render(
@@ -448,6 +440,7 @@ def api_overlay_render():
             'base_detected': result['frame_detected'],
             'tool_detected': result['tool_detected'],
             'total_time_ms': int(total_time * 1000),
+            'pose_source': result.get('pose_source', 'full_detection'),
             'detection_info': {
                 'frame_detected': result['frame_detected'],
                 'tool_detected': result['tool_detected'],
@@ -476,48 +469,62 @@ def api_aruco_save_config():
                 'error': 'No se recibieron datos JSON en el request'
             }), 400
         
-        # Obtener configuración actual
+        # Aplicar los datos del request sobre la sección 'aruco' (leer-modificar-escribir atómico)
+        def apply_request(config):
+            aruco_config = config.setdefault('aruco', {})
+            aruco_config.setdefault('base', {})
+            aruco_config.setdefault('tool', {})
+            
+            # Configuración Base
+            if 'frame_aruco_id' in data:
+                aruco_config['base']['reference_id'] = data['frame_aruco_id']
+            if 'frame_marker_size_mm' in data:
+                aruco_config['base']['marker_size_mm'] = data['frame_marker_size_mm']
+            if 'frame_dictionary_id' in data:
+                aruco_config['base']['dictionary_id'] = data['frame_dictionary_id']
+            if 'frame_marker_bits' in data:
+                aruco_config['base']['marker_bits'] = data['frame_marker_bits']
+            if 'show_frame' in data:
+                aruco_config['base']['show_reference'] = data['show_frame']
+            
+            # Configuración Tool
+            if 'tool_aruco_id' in data:
+                aruco_config['tool']['reference_id'] = data['tool_aruco_id']
+            if 'tool_marker_size_mm' in data:
+                aruco_config['tool']['marker_size_mm'] = data['tool_marker_size_mm']
+            if 'tool_dictionary_id' in data:
+                aruco_config['tool']['dictionary_id'] = data['tool_dictionary_id']
+            if 'tool_marker_bits' in data:
+                aruco_config['tool']['marker_bits'] = data['tool_marker_bits']
+            if 'show_tool' in data:
+                aruco_config['tool']['show_reference'] = data['show_tool']
+            if 'frame_correct_perspective' in data:
+                aruco_config['base']['correct_perspective'] = data['frame_correct_perspective']
+            if 'tool_correct_perspective' in data:
+                aruco_config['tool']['correct_perspective'] = data['tool_correct_perspective']
+            
+            # Configuración general
+            if 'troqueladora_center_x_mm' in data:
+                aruco_config['base']['troqueladora_center_x_mm'] = data['troqueladora_center_x_mm']
+            if 'troqueladora_center_y_mm' in data:
+                aruco_config['base']['troqueladora_center_y_mm'] = data['troqueladora_center_y_mm']
+            if 'show_center' in data:
+                aruco_config['show_center'] = data['show_center']
+            if 'use_saved_reference' in data:
+                aruco_config['use_saved_reference'] = data['use_saved_reference']
+            if 'undistort' in data:
+                aruco_config['undistort'] = data['undistort']
+        
+        config_store.update(apply_request, CONFIG_FILE)
         config = load_config()
         aruco_config = config.get('aruco', {})
         
-        # Actualizar configuración con datos del request
-        # Configuración Base
-        if 'frame_aruco_id' in data:
-            aruco_config['base']['reference_id'] = data['frame_aruco_id']
-        if 'frame_marker_size_mm' in data:
-            aruco_config['base']['marker_size_mm'] = data['frame_marker_size_mm']
-        if 'frame_dictionary_id' in data:
-            aruco_config['base']['dictionary_id'] = data['frame_dictionary_id']
-        if 'frame_marker_bits' in data:
-            aruco_config['base']['marker_bits'] = data['frame_marker_bits']
-        if 'show_frame' in data:
-            aruco_config['base']['show_reference'] = data['show_frame']
-            
-        # Configuración Tool
-        if 'tool_aruco_id' in data:
-            aruco_config['tool']['reference_id'] = data['tool_aruco_id']
-        if 'tool_marker_size_mm' in data:
-            aruco_config['tool']['marker_size_mm'] = data['tool_marker_size_mm']
-        if 'tool_dictionary_id' in data:
-            aruco_config['tool']['dictionary_id'] = data['tool_dictionary_id']
-        if 'tool_marker_bits' in data:
-            aruco_config['tool']['marker_bits'] = data['tool_marker_bits']
-        if 'show_tool' in data:
-            aruco_config['tool']['show_reference'] = data['show_tool']
-            
-        # Configuración general
-        if 'troqueladora_center_x_mm' in data:
-            aruco_config['base']['troqueladora_center_x_mm'] = data['troqueladora_center_x_mm']
-        if 'troqueladora_center_y_mm' in data:
-            aruco_config['base']['troqueladora_center_y_mm'] = data['troqueladora_center_y_mm']
-        if 'show_center' in data:
-            aruco_config['show_center'] = data['show_center']
-        if 'use_saved_reference' in data:
-            aruco_config['use_saved_reference'] = data['use_saved_reference']
-        
-        # Guardar configuración
-        config['aruco'] = aruco_config
-        save_config(config)
+        # La referencia guardada debe re-verificarse con la nueva configuración
+        from src.vision.aruco_manager import reset_saved_reference_state, reset_pose_filters
+        from src.vision.rectification import reset_rectification
+        reset_saved_reference_state()
+        reset_pose_filters()
+        reset_rectification()
         
         print(f"[aruco] ✓ Configuración de ArUcos guardada:")
         print(f"  - Frame ArUco ID: {aruco_config.get('base', {}).get('reference_id', 0)}")
@@ -557,15 +564,139 @@ def api_aruco_save_config():
             'error': str(e)
         }), 500
 
+@app.route('/api/aruco/calibrate_batch', methods=['POST'])
+def api_aruco_calibrate_batch():
+    """
+    Calibra Base/Tool sobre un directorio de imágenes o un video, en segundo plano
+    (proceso aparte con pool de procesos). Responde enseguida con el job_id; el
+    resultado se consulta en GET /api/aruco/calibrate_batch/<job_id>
+    """
+    try:
+        from src.vision.aruco_calibration import start_batch_job
+        
+        data = request.get_json() or {}
+        source = data.get('source')
+        if not source or not os.path.exists(source):
+            return jsonify({
+                'ok': False,
+                'error': f'Fuente no encontrada: {source}'
+            }), 400
+        
+        result = start_batch_job(
+            os.path.abspath(source),
+            workers=data.get('workers'),
+            max_frames=data.get('max_frames'),
+            stride=data.get('stride', 1),
+            save=bool(data.get('save', False)),
+            config_file=CONFIG_FILE,
+            on_done=_on_aruco_calibration_done
+        )
+        
+        return jsonify(result), (202 if result.get('ok') else 409)
+        
+    except Exception as e:
+        print(f"[aruco] Error en POST /api/aruco/calibrate_batch: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'ok': False,
+            'error': str(e)
+        }), 500
+
+def _on_aruco_calibration_done(job):
+    """Callback de la calibración en segundo plano: la referencia nueva invalida el estado previo"""
+    if (job.get('result') or {}).get('saved'):
+        from src.vision.aruco_manager import reset_saved_reference_state, reset_pose_filters
+        reset_saved_reference_state()
+        reset_pose_filters()
+
+@app.route('/api/aruco/calibrate_batch/<job_id>', methods=['GET'])
+def api_aruco_calibrate_batch_status(job_id):
+    """Estado y resultado de una calibración en segundo plano"""
+    from src.vision.aruco_calibration import get_batch_job
+    
+    job = get_batch_job(job_id)
+    if job is None:
+        return jsonify({
+            'ok': False,
+            'error': f'Calibración no encontrada: {job_id}'
+        }), 404
+    return jsonify(dict(job, ok=True))
+
+@app.route('/api/aruco/pose_filter', methods=['GET'])
+def api_aruco_pose_filter():
+    """Devuelve las poses filtradas (con confianza) de los marcadores seguidos"""
+    try:
+        from src.vision.aruco_manager import get_pose_filter_status, get_pose_filter_params
+        
+        aruco_config = load_aruco_config()
+        poses = get_pose_filter_status()
+        
+        return jsonify({
+            'ok': True,
+            'params': get_pose_filter_params(aruco_config),
+            'poses': {str(marker_id): pose for marker_id, pose in poses.items()}
+        })
+        
+    except Exception as e:
+        print(f"[aruco] Error en GET /api/aruco/pose_filter: {e}")
+        return jsonify({
+            'ok': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/aruco/verify_reference', methods=['POST'])
+def api_aruco_verify_reference():
+    """Verifica bajo demanda la deriva de la referencia guardada (detección solo en la región guardada)"""
+    try:
+        from src.vision.aruco_manager import (detect_arucos_with_saved_reference, is_saved_reference_enabled,
+                                              get_saved_reference_status)
+        
+        aruco_config = load_aruco_config()
+        if not is_saved_reference_enabled(aruco_config):
+            return jsonify({
+                'ok': False,
+                'error': 'Referencia guardada no habilitada o incompleta'
+            }), 400
+        
+        cv2_frame = camera_manager.get_frame_raw()
+        if cv2_frame is None:
+            return jsonify({
+                'ok': False,
+                'error': 'No se pudo capturar un frame de la cámara'
+            }), 400
+        
+        result = detect_arucos_with_saved_reference(cv2_frame, aruco_config, force_verify=True)
+        verification = result.get('verification', {})
+        
+        return jsonify({
+            'ok': True,
+            'within_tolerance': verification.get('within_tolerance', False),
+            'pose_source': result.get('source'),
+            'verification': verification,
+            'frame_detected': result.get('frame_detected', False),
+            'tool_detected': result.get('tool_detected', False),
+            'status': {k: v for k, v in get_saved_reference_status().items() if k != 'last_check'}
+        })
+        
+    except Exception as e:
+        print(f"[aruco] Error en POST /api/aruco/verify_reference: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'ok': False,
+            'error': str(e)
+        }), 500
+
 # ============================================================
 # API VISION
 # ============================================================
 
 @app.route('/api/server_test', methods=['POST'])
 def api_server_test():
-    """Endpoint para el botón de prueba del Dashboard"""
+    """Endpoint para el botón de prueba del Dashboard (espera el resultado del trabajo de análisis)"""
     try:
-        resultado = server_test()
+        resultado = analysis_jobs.run_analysis(source='api_server_test')
         
         if not resultado.get('ok', False):
             return jsonify(resultado), 500
@@ -580,6 +711,47 @@ def api_server_test():
             'error': f'Error en server_test: {str(e)}'
         }), 500
 
+@app.route('/api/analysis/jobs', methods=['POST'])
+def api_analysis_submit():
+    """
+    Solicita un análisis asíncrono: devuelve el job_id enseguida. El resultado se consulta
+    en /api/analysis/jobs/<job_id>, o llega por SERVER_TEST_RESULT si se envía {'sid': ...}
+    con el id de la conexión Socket.IO del cliente.
+    """
+    sid = (request.get_json(silent=True) or {}).get('sid')
+    return jsonify(analysis_jobs.submit(source='api', recipient=sid)), 202
+
+@app.route('/api/analysis/jobs', methods=['GET'])
+def api_analysis_jobs():
+    """Trabajos de análisis recientes (sin imágenes)"""
+    return jsonify({'ok': True, 'data': analysis_jobs.list_jobs()})
+
+@app.route('/api/analysis/jobs/<job_id>', methods=['GET'])
+def api_analysis_job(job_id):
+    """Estado y resultado de un trabajo de análisis (?image=0 para omitir la imagen)"""
+    job = analysis_jobs.get_job(job_id, include_image=request.args.get('image', '1') != '0')
+    if job is None:
+        return jsonify({'ok': False, 'error': f'Trabajo {job_id} no encontrado'}), 404
+    return jsonify({'ok': True, 'data': job})
+
+def _emit_analysis_result(job):
+    """
+    Listener de analysis_jobs: envía el resultado a los clientes Socket.IO que
+    dispararon el análisis, o a todos si el trabajo es 'broadcast' (rutina del robot).
+    Los trabajos esperados solo por HTTP ya responden en la request.
+    """
+    if not job['recipients'] and not job.get('broadcast'):
+        return
+    result = dict(job['result'], job_id=job['job_id'])
+    result_to_log = {k: v for k, v in result.items() if k != 'overlay_image'}
+    if job.get('broadcast'):
+        print("[socketio] 📤 Respuesta de análisis para todos los clientes (sin imagen):", result_to_log)
+        socketio.emit('SERVER_TEST_RESULT', result)
+        return
+    print(f"[socketio] 📤 Respuesta de análisis para {len(job['recipients'])} cliente(s) (sin imagen):", result_to_log)
+    for sid in job['recipients']:
+        socketio.emit('SERVER_TEST_RESULT', result, to=sid)
+
 
 # ============================================================
 # API MQTT
@@ -587,30 +759,9 @@ def api_server_test():
 
 @app.route('/api/mqtt_icon_status', methods=['GET'])
 def api_mqtt_icon_status():
-    """Endpoint para obtener el estado del icono MQTT"""
+    """Endpoint para obtener el estado del icono MQTT (cacheado por el monitor de salud)"""
     try:
-        from mqtt_manager import get_mqtt_manager
-        
-        manager = get_mqtt_manager()
-        state = manager.state.value
-        connected = manager.connected
-        
-        # Mapear estado a icono
-        icon_map = {
-            'disconnected': 'default',
-            'connecting': 'waiting',
-            'connected': 'success',
-            'error': 'error',
-            'stopping': 'waiting'
-        }
-        
-        return jsonify({
-            'ok': True,
-            'status': icon_map.get(state, 'default'),
-            'icon': icon_map.get(state, 'default'),
-            'connected': connected,
-            'state': state
-        })
+        return jsonify(health_monitor.get_status('mqtt'))
     except Exception as e:
         return jsonify({
             'ok': False,
@@ -619,78 +770,9 @@ def api_mqtt_icon_status():
 
 @app.route('/api/vision_icon_status', methods=['GET'])
 def api_vision_icon_status():
-    """Endpoint para verificar el estado del servidor de visión"""
+    """Endpoint para obtener el estado del servidor de visión (cacheado por el monitor de salud)"""
     try:
-        import requests
-        
-        # Leer IP y puerto desde la configuración
-        vision_server_ip = '127.0.0.1'
-        vision_server_port = 8000  # Puerto por defecto
-        try:
-            with open('config.json', 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                vision_section = config.get('vision', {})
-                vision_server_ip = vision_section.get('vision_server_ip', vision_server_ip)
-                vision_server_port = vision_section.get('vision_server_port', vision_server_port)
-        except:
-            pass  # Usar valores por defecto si no se puede leer la configuración
-        
-        # Verificar si el servidor de visión está respondiendo
-        vision_server_url = f"http://{vision_server_ip}:{vision_server_port}"
-        
-        try:
-            # Hacer una petición simple al servidor de visión con timeout de 2 segundos
-            response = requests.get(f"{vision_server_url}/", timeout=2)
-            
-            if response.status_code == 200:
-                return jsonify({
-                    'ok': True,
-                    'status': 'success',  # Verde - Servidor de visión respondiendo
-                    'server_status': 'online',
-                    'message': 'Servidor de visión funcionando correctamente',
-                    'vision_server_url': vision_server_url,
-                    'response_code': response.status_code,
-                    'timestamp': time.time()
-                })
-            else:
-                return jsonify({
-                    'ok': False,
-                    'status': 'error',  # Rojo - Servidor responde pero con error
-                    'server_status': 'error',
-                    'message': f'Servidor de visión responde con código {response.status_code}',
-                    'vision_server_url': vision_server_url,
-                    'response_code': response.status_code,
-                    'timestamp': time.time()
-                })
-                
-        except requests.exceptions.ConnectTimeout:
-            return jsonify({
-                'ok': False,
-                'status': 'error',  # Rojo - Timeout de conexión
-                'server_status': 'offline',
-                'message': 'Timeout conectando al servidor de visión',
-                'vision_server_url': vision_server_url,
-                'timestamp': time.time()
-            })
-        except requests.exceptions.ConnectionError:
-            return jsonify({
-                'ok': False,
-                'status': 'error',  # Rojo - No se puede conectar
-                'server_status': 'offline',
-                'message': 'No se puede conectar al servidor de visión',
-                'vision_server_url': vision_server_url,
-                'timestamp': time.time()
-            })
-        except Exception as e:
-            return jsonify({
-                'ok': False,
-                'status': 'error',  # Rojo - Error general
-                'server_status': 'offline',
-                'message': f'Error verificando servidor de visión: {str(e)}',
-                'vision_server_url': vision_server_url,
-                'timestamp': time.time()
-            })
-            
+        return jsonify(health_monitor.get_status('vision'))
     except Exception as e:
         return jsonify({
             'ok': False,
@@ -699,6 +781,26 @@ def api_vision_icon_status():
             'server_status': 'offline'
         }), 500
 
+@app.route('/api/health', methods=['GET'])
+def api_health():
+    """Estado cacheado de todos los componentes: {'vision', 'mqtt', 'camera'}"""
+    return jsonify({'ok': True, 'data': health_monitor.get_status()})
+
+def _on_health_change(component, status, previous):
+    """Listener de health_monitor: empuja cada cambio de estado al frontend"""
+    socketio.emit('HEALTH_STATUS', dict(status, component=component))
+    # Servidor de visión que vuelve a estar online (posible reinicio): reenviar la configuración completa
+    if (component == 'vision' and status.get('server_status') == 'online'
+            and previous is not None and previous.get('server_status') != 'online'):
+        config_sync.invalidate()
+        threading.Thread(target=config_sync.sync, daemon=True, name='ConfigSyncOnline').start()
+
+@socketio.on('connect')
+def handle_health_connect():
+    """Estado inicial para cada cliente nuevo (los cambios llegan por HEALTH_STATUS)"""
+    for component, status in health_monitor.get_status().items():
+        emit('HEALTH_STATUS', dict(status, component=component))
+
 @app.route('/api/robot_hello', methods=['POST'])
 def api_robot_hello():
     """Endpoint para enviar comando HOLA al robot COMAU via MQTT"""
@@ -867,12 +969,9 @@ def api_robot_test_routine():
 def api_vision_config():
     """Endpoint para obtener la configuración de visión"""
     try:
-        with open('config.json', 'r') as f:
-            config = json.load(f)
-        
         return jsonify({
             'ok': True,
-            'vision': config.get('vision', {})
+            'vision': config_store.get_section('vision')
         })
         
     except Exception as e:
@@ -887,25 +986,27 @@ def api_vision_set_models():
     try:
         data = request.get_json()
         
-        # Cargar configuración actual
-        with open('config.json', 'r') as f:
-            config = json.load(f)
-        
-        # Actualizar configuración de visión
-        if 'vision' not in config:
-            config['vision'] = {}
-            
-        # Actualizar campos
-        for key, value in data.items():
-            config['vision'][key] = value
-        
-        # Guardar configuración
-        with open('config.json', 'w') as f:
-            json.dump(config, f, indent=2)
+        # Actualizar campos de visión (leer-modificar-escribir atómico). La sección previa
+        # y la resultante se toman dentro de la misma actualización: otra escritura
+        # concurrente no puede quedar entre ambas
+        snapshot = {}
+        def apply_models(config):
+            vision = config.get('vision')
+            snapshot['previous'] = copy.deepcopy(vision) if isinstance(vision, dict) else {}
+            if not isinstance(vision, dict):
+                vision = config['vision'] = {}
+            vision.update(copy.deepcopy(data))
+            snapshot['vision'] = copy.deepcopy(vision)
+            snapshot['camera'] = copy.deepcopy(config.get('camera', {}))
+        config_store.update(apply_models)
+        
+        # Intercambio en caliente de los modelos que cambiaron (en segundo plano)
+        swapping = start_model_hot_swap(snapshot['previous'], snapshot['vision'], snapshot['camera'])
         
         return jsonify({
             'ok': True,
-            'message': 'Configuración guardada correctamente'
+            'message': 'Configuración guardada correctamente',
+            'models_swapping': swapping
         })
         
     except Exception as e:
@@ -914,27 +1015,23 @@ def api_vision_set_models():
             'error': str(e)
         }), 500
 
+@app.route('/api/vision/inference_metrics', methods=['GET'])
+def api_vision_inference_metrics():
+    """Métricas del worker de inferencia, de la caché de resultados y tiempos de llamadas al servidor de visión"""
+    return jsonify({'ok': True, 'data': inference_worker.get_worker_metrics(),
+                    'result_cache': yolo_detector.get_result_cache_stats(),
+                    'vision_client': vision_client.get_timings(),
+                    'frame_transport': frame_transport.get_stats(),
+                    'config_store': config_store.get_stats()})
+
 @app.route('/api/vision/set_roi', methods=['POST'])
 def api_vision_set_roi():
     """Endpoint para guardar configuración ROI"""
     try:
         data = request.get_json()
         
-        # Cargar configuración actual
-        with open('config.json', 'r') as f:
-            config = json.load(f)
-        
-        # Actualizar configuración de visión
-        if 'vision' not in config:
-            config['vision'] = {}
-            
-        # Actualizar campos ROI
-        for key, value in data.items():
-            config['vision'][key] = value
-        
-        # Guardar configuración
-        with open('config.json', 'w') as f:
-            json.dump(config, f, indent=2)
+        # Actualizar campos ROI de visión (leer-modificar-escribir atómico)
+        config_store.update_section('vision', data)
         
         return jsonify({
             'ok': True,
@@ -962,9 +1059,7 @@ def api_vision_server_configure():
         # Leer el puerto desde la configuración
         vision_server_port = 8000  # Puerto por defecto
         try:
-            with open('config.json', 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                vision_server_port = config.get('vision', {}).get('vision_server_port', 8000)
+            vision_server_port = config_store.get_section('vision').get('vision_server_port', 8000)
         except:
             pass  # Usar puerto por defecto si no se puede leer la configuración
         
@@ -1016,6 +1111,11 @@ def api_vision_server_configure():
             'message': 'Error interno del servidor'
         }), 500
 
+@app.route('/api/vision_server/sync_status', methods=['GET'])
+def api_vision_server_sync_status():
+    """Estado de la sincronización de configuración con el servidor de visión"""
+    return jsonify({'ok': True, 'data': config_sync.get_status()})
+
 @app.route('/api/vision_server/configure_roi', methods=['POST'])
 def api_vision_server_configure_roi():
     """Endpoint para configurar ROI en el servidor de visión"""
@@ -1025,9 +1125,7 @@ def api_vision_server_configure_roi():
         # Leer el puerto desde la configuración
         vision_server_port = 8000  # Puerto por defecto
         try:
-            with open('config.json', 'r') as f:
-                config = json.load(f)
-                vision_server_port = config.get('vision', {}).get('vision_server_port', 8000)
+            vision_server_port = config_store.get_section('vision').get('vision_server_port', 8000)
         except:
             pass
         
@@ -1076,11 +1174,10 @@ def api_vision_server_start():
         # Si no se proporciona path, intentar leer desde config.json
         if not vision_server_path:
             try:
-                with open('config.json', 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    vision_server_path = config.get('vision', {}).get('vision_server_path')
-                    if not vision_server_port or vision_server_port == 8000:
-                        vision_server_port = config.get('vision', {}).get('vision_server_port', 8000)
+                vision_config = config_store.get_section('vision')
+                vision_server_path = vision_config.get('vision_server_path')
+                if not vision_server_port or vision_server_port == 8000:
+                    vision_server_port = vision_config.get('vision_server_port', 8000)
             except:
                 pass
         
@@ -1163,9 +1260,10 @@ def api_vision_server_start():
             else:
                 print(f"[illinois-server] ✅ Proceso ejecutándose correctamente (PID: {process.pid})")
             
-            # Configurar ArUcos en el servidor de visión después de iniciarlo
+            # Configurar ArUcos en el servidor de visión después de iniciarlo (proceso nuevo: enviar todo)
             # Esperar un poco más para que el servidor esté completamente listo
             time.sleep(2)
+            config_sync.invalidate()
             try:
                 from src.vision.vision_manager import configure_aruco_vision_server
                 aruco_result = configure_aruco_vision_server('config.json', vision_server_port)
@@ -2537,6 +2635,18 @@ def shutdown_system():
             close_chrome()
             print("✅ Chrome cerrado")
         
+        # Detener el worker de inferencia (libera la memoria compartida)
+        inference_worker.stop_worker()
+        
+        # Cerrar las conexiones keep-alive al servidor de visión y el hilo de análisis
+        vision_client.close()
+        analysis_jobs.shutdown()
+        
+        # Liberar el anillo de memoria compartida de frames y detener reintentos de configuración
+        frame_transport.close()
+        config_sync.stop()
+        health_monitor.stop()
+        
         # Esperar un momento
         time.sleep(0.3)
         
@@ -2555,7 +2665,10 @@ def shutdown_system():
 # INICIALIZACIÓN DE MODELOS YOLO (GLOBAL)
 # ============================================================
 def initialize_yolo_models():
-    """Carga los modelos YOLO globalmente al iniciar el servidor"""
+    """
+    Carga y calienta los modelos YOLO configurados. Se ejecuta en segundo plano
+    (ver start_yolo_preload); el progreso se consulta en /api/status.
+    """
     print("\n[yolo] 🚀 Inicializando modelos YOLO...")
     
     config = load_config()
@@ -2563,40 +2676,109 @@ def initialize_yolo_models():
     
     detection_model_path = vision_config.get('detection_model')
     holes_model_path = vision_config.get('holes_model')
+    inference_backend = vision_config.get('inference_backend', 'ultralytics')
+    print(f"[yolo] Backend de inferencia: {inference_backend}")
+    yolo_detector.set_inference_mode(vision_config.get('inference_mode'))
     
-    # Cargar modelo de detección
-    if detection_model_path:
-        if os.path.exists(detection_model_path):
-            success = yolo_detector.load_model('detection', detection_model_path)
-            if success:
-                print(f"[yolo] ✓ Modelo Detection cargado: {detection_model_path}")
-            else:
-                print(f"[yolo] ✗ Error cargando Detection: {detection_model_path}")
-        else:
-            print(f"[yolo] ⚠️ Archivo no encontrado: {detection_model_path}")
-    else:
-        print(f"[yolo] ⚠️ No configurado modelo Detection en config.json")
+    # Caché LRU de resultados (misma imagen + modelo + umbral = sin nueva inferencia)
+    cache_config = vision_config.get('result_cache', {})
+    yolo_detector.configure_result_cache(cache_config.get('enabled'), cache_config.get('max_entries'),
+                                         cache_config.get('max_mb'))
     
-    # Cargar modelo de agujeros
-    if holes_model_path:
-        if os.path.exists(holes_model_path):
-            success = yolo_detector.load_model('holes', holes_model_path)
-            if success:
-                print(f"[yolo] ✓ Modelo Holes cargado: {holes_model_path}")
-            else:
-                print(f"[yolo] ✗ Error cargando Holes: {holes_model_path}")
+    # Resolución de calentamiento: la preferida de la cámara
+    resolution = config.get('camera', {}).get('preferred_resolution', {})
+    warmup_resolution = (resolution.get('width', yolo_detector.WARMUP_RESOLUTION[0]),
+                         resolution.get('height', yolo_detector.WARMUP_RESOLUTION[1]))
+    
+    # Worker de inferencia en proceso separado: load_model() carga los modelos dentro del worker
+    worker_config = vision_config.get('inference_worker', {})
+    if worker_config.get('enabled', False):
+        ready = inference_worker.start_worker(
+            {},
+            queue_size=worker_config.get('queue_size', inference_worker.DEFAULT_QUEUE_SIZE),
+            deadline_s=worker_config.get('deadline_s', inference_worker.DEFAULT_DEADLINE_S),
+            wait_ready=False
+        )
+        # Sin esperar: las cargas de abajo quedan en la cola del worker hasta que arranque
+        print(f"[yolo] {'✓' if ready else '✗'} Worker de inferencia lanzado")
+    
+    for model_type, model_path, label in (('detection', detection_model_path, 'Detection'),
+                                          ('holes', holes_model_path, 'Holes')):
+        if not model_path:
+            print(f"[yolo] ⚠️ No configurado modelo {label} en config.json")
+            continue
+        if yolo_detector.preload_model(model_type, model_path, inference_backend, warmup_resolution):
+            print(f"[yolo] ✓ Modelo {label} cargado: {model_path}")
         else:
-            print(f"[yolo] ⚠️ Archivo no encontrado: {holes_model_path}")
-    else:
-        print(f"[yolo] ⚠️ No configurado modelo Holes en config.json")
+            print(f"[yolo] ✗ Error cargando {label}: {model_path}")
+
+def start_yolo_preload():
+    """Marca los modelos configurados como pendientes y los carga en un hilo en segundo plano"""
+    vision_config = load_config().get('vision', {})
+    for model_type, key in (('detection', 'detection_model'), ('holes', 'holes_model')):
+        if vision_config.get(key):
+            yolo_detector.mark_model_pending(model_type, vision_config[key])
+    
+    thread = threading.Thread(target=initialize_yolo_models, daemon=True, name="YoloPreload")
+    thread.start()
+    return thread
+
+def start_model_hot_swap(previous_vision: dict, vision_config: dict, camera_config: dict) -> list:
+    """
+    Lanza el intercambio en caliente de los modelos cuyo path (o el backend o el
+    modo de inferencia) cambió. El modelo actual sigue atendiendo hasta que el nuevo
+    está cargado y calentado.
+    
+    Returns:
+        Lista de tipos de modelo que se están intercambiando
+    """
+    backend = vision_config.get('inference_backend', 'ultralytics')
+    reload_all = backend != previous_vision.get('inference_backend', 'ultralytics')
+    if vision_config.get('inference_mode') != previous_vision.get('inference_mode'):
+        yolo_detector.set_inference_mode(vision_config.get('inference_mode'))
+        reload_all = True
+    resolution = camera_config.get('preferred_resolution', {})
+    warmup_resolution = (resolution.get('width', yolo_detector.WARMUP_RESOLUTION[0]),
+                         resolution.get('height', yolo_detector.WARMUP_RESOLUTION[1]))
+    
+    swapping = []
+    for model_type, key in (('detection', 'detection_model'), ('holes', 'holes_model')):
+        model_path = vision_config.get(key)
+        if model_path and (reload_all or model_path != previous_vision.get(key)):
+            threading.Thread(target=yolo_detector.hot_swap_model,
+                             args=(model_type, model_path, backend, warmup_resolution),
+                             daemon=True, name=f"YoloSwap-{model_type}").start()
+            swapping.append(model_type)
+    
+    if swapping:
+        print(f"[yolo] 🔄 Intercambio en caliente iniciado: {swapping}")
+    return swapping
 
 # ============================================================
 # FUNCIÓN PRINCIPAL
 # ============================================================
+def _install_process_hooks():
+    """
+    Efectos de proceso del servidor: manejadores de señales, limpieza al salir y
+    listeners de config_store / analysis_jobs / health_monitor.
+
+    Se instalan desde main() y no al importar el módulo: el worker de inferencia
+    ('spawn') reimporta este script como __mp_main__ y no debe registrar nada.
+    """
+    signal.signal(signal.SIGINT, signal_handler)   # Ctrl+C
+    signal.signal(signal.SIGTERM, signal_handler)  # Terminación del sistema
+    atexit.register(cleanup_vision_server)
+    
+    config_store.add_listener(_on_config_change)
+    analysis_jobs.add_listener(_emit_analysis_result)
+    health_monitor.add_listener(_on_health_change)
+
 def main():
     """Función principal del servidor."""
     global chrome_pid
     
+    _install_process_hooks()
+    
     # Parsear argumentos
     parser = argparse.ArgumentParser(
         description="COMAU-VISION Web Server",
@@ -2698,6 +2880,12 @@ Ejemplos:
     except Exception as e:
         print(f"✗ Error inicializando MQTT: {e}")
     
+    # ════════════════════════════════════════════════════════════
+    # PASO 1.6.1: Monitor de salud (visión, MQTT, cámara)
+    # ════════════════════════════════════════════════════════════
+    print(f"\n🩺 Iniciando monitor de salud...")
+    health_monitor.start()
+    
     # ════════════════════════════════════════════════════════════
     # PASO 1.6.5: Inicializar gestión automática del servidor de visión
     # ════════════════════════════════════════════════════════════
@@ -2729,11 +2917,9 @@ Ejemplos:
                 
                 # Leer configuración del servidor de visión
                 try:
-                    with open('config.json', 'r', encoding='utf-8') as f:
-                        config = json.load(f)
-                        vision_config = config.get('vision', {})
-                        vision_server_path = vision_config.get('vision_server_path')
-                        vision_server_port = vision_config.get('vision_server_port', 8000)
+                    vision_config = config_store.get_section('vision')
+                    vision_server_path = vision_config.get('vision_server_path')
+                    vision_server_port = vision_config.get('vision_server_port', 8000)
                     print(f"[vision-manager] 📋 Configuración leída: ruta={vision_server_path}, puerto={vision_server_port}")
                 except Exception as e:
                     print(f"[vision-manager] ❌ Error leyendo configuración: {e}")
@@ -2793,6 +2979,8 @@ Ejemplos:
                         )
                         
                         print(f"[vision-manager] ✅ Servidor de visión iniciado con PID: {vision_server_process.pid}")
+                        # Proceso nuevo: la próxima sincronización envía la configuración completa
+                        config_sync.invalidate()
                         
                         # Esperar un poco para que se inicie
                         time.sleep(3)
@@ -2827,9 +3015,9 @@ Ejemplos:
     # (Se utiliza IP y puerto configurados para comunicarse con un servidor ya en ejecución)
     
     # ════════════════════════════════════════════════════════════
-    # PASO 1.7: Inicializar modelos YOLO (GLOBAL)
+    # PASO 1.7: Inicializar modelos YOLO (GLOBAL) en segundo plano
     # ════════════════════════════════════════════════════════════
-    initialize_yolo_models()
+    start_yolo_preload()
     
     # ════════════════════════════════════════════════════════════
     # PASO 2: Lanzar Chrome
@@ -2891,17 +3079,10 @@ Ejemplos:
 
 @socketio.on('AUTO_ANALYZE')
 def handle_auto_analyze():
-    print('[socketio] 📩 Evento AUTO_ANALYZE recibido desde frontend. Ejecutando server_test()...')
-    result = server_test()
-    if isinstance(result, dict):
-        result_to_log = dict(result)
-        result_to_log.pop('overlay_image', None)
-        print('[socketio] 📤 Respuesta de análisis para emitir (sin imagen):', result_to_log)
-        # Enviar full payload con imagen sólo al frontend
-        emit('SERVER_TEST_RESULT', result)
-    else:
-        print('[socketio] ❌ Respuesta inesperada:', result)
-        emit('SERVER_TEST_RESULT', { 'ok': False, 'error': 'Respuesta inesperada', 'data': str(result) })
+    print('[socketio] 📩 Evento AUTO_ANALYZE recibido desde frontend. Encolando análisis...')
+    # El resultado llega por SERVER_TEST_RESULT (solo a este cliente) cuando termina el trabajo;
+    # los disparos repetidos se unen al mismo
+    emit('ANALYSIS_JOB', analysis_jobs.submit(source='socketio', recipient=request.sid))
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -12,6 +12,10 @@ Para funcionalidades específicas del proyecto, usar aruco_manager.py
 """
 
 from typing import Optional, Tuple, Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import threading
+import time
 import numpy as np
 
 try:
@@ -51,12 +55,9 @@ def detect_aruco_by_id(image, target_id: int, dictionary_id: int, marker_bits: i
             print(f"[ArUcoDetector] ⚠️ Combinación marker_bits={marker_bits}, dictionary_id={dictionary_id} no soportada")
             return None
         
-        aruco_dict = cv2.aruco.getPredefinedDictionary(dict_mapping[dict_key])
-        aruco_params = cv2.aruco.DetectorParameters()
-        
-        # Crear detector con parámetros por defecto
-        detector = cv2.aruco.ArucoDetector(aruco_dict, aruco_params)
-        corners, ids, _ = detector.detectMarkers(image)
+        # Detector con parámetros por defecto (prestado del pool del proceso)
+        with _borrow_detector(marker_bits, dictionary_id) as detector:
+            corners, ids, _ = detector.detectMarkers(image)
         
         # Buscar el marcador objetivo
         if ids is not None:
@@ -127,11 +128,8 @@ def detect_all_arucos(image, dictionary_id: int, marker_bits: int, marker_size_m
             print(f"[ArUcoDetector] ⚠️ Combinación marker_bits={marker_bits}, dictionary_id={dictionary_id} no soportada")
             return None
         
-        aruco_dict = cv2.aruco.getPredefinedDictionary(dict_mapping[dict_key])
-        aruco_params = cv2.aruco.DetectorParameters()
-        
-        detector = cv2.aruco.ArucoDetector(aruco_dict, aruco_params)
-        corners, ids, _ = detector.detectMarkers(image)
+        with _borrow_detector(marker_bits, dictionary_id) as detector:
+            corners, ids, _ = detector.detectMarkers(image)
         
         if ids is None or len(ids) == 0:
             return None
@@ -167,6 +165,56 @@ def detect_all_arucos(image, dictionary_id: int, marker_bits: int, marker_size_m
         print(f"[ArUcoDetector] Error detectando todos los ArUcos: {e}")
         return None
 
+# ============================================================
+# CACHÉ DE DETECTORES
+# ============================================================
+
+# ArucoDetector no es seguro para uso concurrente: pool de detectores compartido por todo
+# el proceso, por (bits, diccionario, parámetros). Cada detección toma uno libre (o crea
+# uno si todos están en uso) y lo devuelve al terminar, sin importar el hilo.
+DETECTOR_POOL_MAX_IDLE = 8      # Detectores libres que se conservan por combinación
+_detector_pool: Dict[tuple, List[Any]] = {}
+_detector_pool_lock = threading.Lock()
+
+def _params_key(params: Optional[Dict[str, Any]]) -> tuple:
+    return tuple(sorted(params.items())) if params else ()
+
+def _create_detector(dict_key: Tuple[int, int], params: Optional[Dict[str, Any]]):
+    aruco_dict = cv2.aruco.getPredefinedDictionary(get_dictionary_mapping()[dict_key])
+    parameters = cv2.aruco.DetectorParameters()
+    for name, value in (params or {}).items():
+        setattr(parameters, name, value)
+    return cv2.aruco.ArucoDetector(aruco_dict, parameters)
+
+@contextmanager
+def _borrow_detector(marker_bits: int, dictionary_id: int, params: Optional[Dict[str, Any]] = None):
+    """
+    Presta un ArucoDetector del pool durante el bloque with.
+    Combinaciones no soportadas usan 4x4_50.
+    
+    Args:
+        params: Atributos de DetectorParameters a modificar (None = valores por defecto)
+    """
+    dict_key = (marker_bits, dictionary_id)
+    if dict_key not in get_dictionary_mapping():
+        print(f"[ArUcoDetector] ⚠️ Combinación marker_bits={marker_bits}, dictionary_id={dictionary_id} no soportada, usando 4x4_50")
+        dict_key = (4, 50)
+    
+    pool_key = dict_key + (_params_key(params),)
+    with _detector_pool_lock:
+        idle = _detector_pool.get(pool_key)
+        detector = idle.pop() if idle else None
+    if detector is None:
+        detector = _create_detector(dict_key, params)
+    
+    try:
+        yield detector
+    finally:
+        with _detector_pool_lock:
+            idle = _detector_pool.setdefault(pool_key, [])
+            if len(idle) < DETECTOR_POOL_MAX_IDLE:
+                idle.append(detector)
+
 # ============================================================
 # DETECCIÓN GENÉRICA CON CONFIGURACIÓN
 # ============================================================
@@ -189,37 +237,9 @@ def detect_arucos_with_config(image: np.ndarray, aruco_configs: List[Dict[str, A
     try:
         print(f"[ArUcoDetector] Detectando ArUcos en imagen {image.shape}")
         
-        # Configurar detector ArUco
-        dict_mapping = {
-            (4, 50): cv2.aruco.DICT_4X4_50,
-            (4, 100): cv2.aruco.DICT_4X4_100,
-            (4, 250): cv2.aruco.DICT_4X4_250,
-            (4, 1000): cv2.aruco.DICT_4X4_1000,
-            (5, 50): cv2.aruco.DICT_5X5_50,
-            (5, 100): cv2.aruco.DICT_5X5_100,
-            (5, 250): cv2.aruco.DICT_5X5_250,
-            (5, 1000): cv2.aruco.DICT_5X5_1000,
-            (6, 50): cv2.aruco.DICT_6X6_50,
-            (6, 100): cv2.aruco.DICT_6X6_100,
-            (6, 250): cv2.aruco.DICT_6X6_250,
-            (6, 1000): cv2.aruco.DICT_6X6_1000,
-            (7, 50): cv2.aruco.DICT_7X7_50,
-            (7, 100): cv2.aruco.DICT_7X7_100,
-            (7, 250): cv2.aruco.DICT_7X7_250,
-            (7, 1000): cv2.aruco.DICT_7X7_1000
-        }
-        
-        dict_key = (marker_bits, dictionary_id)
-        if dict_key not in dict_mapping:
-            print(f"[ArUcoDetector] ⚠️ Combinación marker_bits={marker_bits}, dictionary_id={dictionary_id} no soportada, usando 4x4_50")
-            dict_key = (4, 50)
-        
-        aruco_dict = cv2.aruco.getPredefinedDictionary(dict_mapping[dict_key])
-        parameters = cv2.aruco.DetectorParameters()
-        detector = cv2.aruco.ArucoDetector(aruco_dict, parameters)
-        
-        # Detectar marcadores
-        corners, ids, rejected = detector.detectMarkers(image)
+        # Detectar marcadores (detector prestado del pool del proceso)
+        with _borrow_detector(marker_bits, dictionary_id) as detector:
+            corners, ids, rejected = detector.detectMarkers(image)
         
         print(f"[ArUcoDetector] Resultado detección:")
         print(f"  - corners: {len(corners) if corners is not None else 0}")
@@ -292,6 +312,212 @@ def detect_arucos_with_config(image: np.ndarray, aruco_configs: List[Dict[str, A
             'error': str(e)
         }
 
+def detect_arucos_in_roi(image: np.ndarray, roi: Tuple[int, int, int, int],
+                        aruco_configs: List[Dict[str, Any]],
+                        dictionary_id: int, marker_bits: int) -> Dict[str, Any]:
+    """
+    Detecta ArUcos solo dentro de una región de la imagen.
+
+    Las coordenadas devueltas se expresan en el sistema de la imagen completa,
+    por lo que el resultado es intercambiable con el de detect_arucos_with_config().
+
+    Args:
+        image: Imagen de OpenCV (numpy array)
+        roi: Región (x1, y1, x2, y2) en píxeles; se recorta a los límites de la imagen
+        aruco_configs: Lista de configuraciones de ArUcos
+        dictionary_id: ID del diccionario ArUco (50, 100, 250, 1000)
+        marker_bits: Tamaño de matriz del marcador (4, 5, 6, 7)
+
+    Returns:
+        Diccionario con información de detección genérica (mismo formato que
+        detect_arucos_with_config) más la clave 'roi' con la región efectiva
+    """
+    h, w = image.shape[:2]
+    x1, y1, x2, y2 = roi
+    x1 = max(0, min(int(x1), w))
+    x2 = max(0, min(int(x2), w))
+    y1 = max(0, min(int(y1), h))
+    y2 = max(0, min(int(y2), h))
+
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return {
+            'detected_arucos': {},
+            'detected_ids': [],
+            'detection_status': {c.get('name', f"aruco_{c.get('id')}"): False for c in aruco_configs},
+            'aruco_configs': aruco_configs,
+            'roi': (x1, y1, x2, y2)
+        }
+
+    result = detect_arucos_with_config(image[y1:y2, x1:x2], aruco_configs, dictionary_id, marker_bits)
+
+    # Trasladar coordenadas del recorte a la imagen completa
+    for aruco_data in result.get('detected_arucos', {}).values():
+        cx, cy = aruco_data['center']
+        aruco_data['center'] = (cx + x1, cy + y1)
+        aruco_data['corners'] = [[c[0] + x1, c[1] + y1] for c in aruco_data['corners']]
+
+    result['roi'] = (x1, y1, x2, y2)
+    return result
+
+def get_corners_bounding_box(corners, margin_px: float = 0.0) -> Tuple[int, int, int, int]:
+    """
+    Calcula el rectángulo alineado a ejes que contiene las esquinas de un marcador.
+
+    Args:
+        corners: Lista de 4 esquinas [[x, y], ...]
+        margin_px: Margen adicional en píxeles a cada lado
+
+    Returns:
+        (x1, y1, x2, y2) en píxeles (sin recortar a la imagen)
+    """
+    pts = np.asarray(corners, dtype=float).reshape(-1, 2)
+    x1, y1 = pts.min(axis=0) - margin_px
+    x2, y2 = pts.max(axis=0) + margin_px
+    return (int(np.floor(x1)), int(np.floor(y1)), int(np.ceil(x2)), int(np.ceil(y2)))
+
+def compute_marker_geometry(corners, marker_size_mm: float, max_edge_deviation: float = 0.1) -> Dict[str, Any]:
+    """
+    Calcula la geometría de un marcador usando sus CUATRO bordes.
+
+    A diferencia del cálculo de detect_arucos_with_config (solo el borde esquina[0] → esquina[1]),
+    la escala es el promedio de los bordes válidos y el ángulo la media circular de las
+    cuatro direcciones (cada borde rotado a la orientación del primero). Los bordes cuya
+    longitud se aleja de la mediana más de max_edge_deviation se descartan como atípicos.
+
+    Args:
+        corners: Lista de 4 esquinas [[x, y], ...] en el orden de OpenCV
+        marker_size_mm: Tamaño real del marcador en mm
+        max_edge_deviation: Desviación relativa máxima respecto a la mediana (0.1 = 10%)
+
+    Returns:
+        Dict con {center, angle_rad, px_per_mm, edge_lengths_px, edges_used, edge_spread_pct}
+    """
+    pts = np.asarray(corners, dtype=float).reshape(4, 2)
+    edges = np.roll(pts, -1, axis=0) - pts
+    lengths = np.hypot(edges[:, 0], edges[:, 1])
+
+    median = float(np.median(lengths))
+    valid = np.abs(lengths - median) <= max_edge_deviation * median if median > 0 else np.ones(4, bool)
+    if not valid.any():
+        valid = np.ones(4, bool)
+
+    # Dirección de cada borde llevada a la del borde 0 (bordes consecutivos giran 90°)
+    angles = np.arctan2(edges[:, 1], edges[:, 0]) - np.arange(4) * (np.pi / 2)
+    angle_rad = float(np.arctan2(np.sin(angles[valid]).sum(), np.cos(angles[valid]).sum()))
+
+    mean_length = float(lengths[valid].mean())
+    return {
+        'center': (float(pts[:, 0].mean()), float(pts[:, 1].mean())),
+        'angle_rad': angle_rad,
+        'px_per_mm': mean_length / marker_size_mm if marker_size_mm else 0.0,
+        'edge_lengths_px': lengths.tolist(),
+        'edges_used': int(valid.sum()),
+        'edge_spread_pct': float((lengths.max() - lengths.min()) / mean_length * 100.0) if mean_length else 0.0
+    }
+
+# ============================================================
+# DETECCIÓN MULTI-DICCIONARIO EN PARALELO
+# ============================================================
+
+MULTI_DETECTION_MAX_WORKERS = 4
+_multi_executor: Optional[ThreadPoolExecutor] = None
+_multi_executor_lock = threading.Lock()
+
+def _get_multi_executor() -> ThreadPoolExecutor:
+    """Pool de hilos compartido para detecciones multi-diccionario (creado bajo demanda)"""
+    global _multi_executor
+    with _multi_executor_lock:
+        if _multi_executor is None:
+            _multi_executor = ThreadPoolExecutor(max_workers=MULTI_DETECTION_MAX_WORKERS,
+                                                 thread_name_prefix="aruco-detect")
+        return _multi_executor
+
+def group_marker_specs(marker_specs: List[Dict[str, Any]]) -> Dict[Tuple[int, int], List[Dict[str, Any]]]:
+    """
+    Agrupa especificaciones de marcadores por diccionario.
+
+    Args:
+        marker_specs: [{"id", "name", "size_mm", "color", "dictionary_id", "marker_bits"}]
+
+    Returns:
+        {(marker_bits, dictionary_id): [specs]}
+    """
+    groups: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+    for spec in marker_specs:
+        key = (int(spec.get('marker_bits', 4)), int(spec.get('dictionary_id', 50)))
+        groups.setdefault(key, []).append(spec)
+    return groups
+
+def detect_arucos_multi(image: np.ndarray, marker_specs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Detecta marcadores de varios diccionarios sobre la misma imagen.
+
+    Cada diccionario se escanea en un hilo del pool (OpenCV libera el GIL durante
+    detectMarkers), por lo que el tiempo total se mantiene cercano al de un único escaneo.
+    Con un solo diccionario se ejecuta directamente, sin pasar por el pool.
+
+    Args:
+        image: Imagen de OpenCV (idealmente en escala de grises, compartida entre hilos)
+        marker_specs: Configuraciones de ArUcos con su diccionario
+                      [{"id", "name", "size_mm", "color", "dictionary_id", "marker_bits"}]
+
+    Returns:
+        Resultado combinado con el formato de detect_arucos_with_config() más:
+        - 'dictionaries': {"<bits>x<bits>_<dict_id>": ids detectados}
+        - 'timing': {'wall_s', 'scans_s'}
+    """
+    start = time.time()
+    groups = group_marker_specs(marker_specs)
+    
+    if len(groups) <= 1:
+        (bits, dict_id), specs = next(iter(groups.items())) if groups else ((4, 50), [])
+        results = [((bits, dict_id), detect_arucos_with_config(image, specs, dict_id, bits), time.time() - start)]
+    else:
+        def _scan(key, specs):
+            t0 = time.time()
+            return key, detect_arucos_with_config(image, specs, key[1], key[0]), time.time() - t0
+        
+        executor = _get_multi_executor()
+        futures = [executor.submit(_scan, key, specs) for key, specs in groups.items()]
+        results = [f.result() for f in futures]
+    
+    detected_arucos: Dict[int, Dict[str, Any]] = {}
+    detected_ids: List[int] = []
+    detection_status: Dict[str, bool] = {}
+    dictionaries: Dict[str, List[int]] = {}
+    scans_s: Dict[str, float] = {}
+    errors = []
+    
+    for (bits, dict_id), result, elapsed in results:
+        dict_name = f"{bits}x{bits}_{dict_id}"
+        configured_ids = {spec.get('id') for spec in groups.get((bits, dict_id), [])}
+        dictionaries[dict_name] = list(result.get('detected_ids', []))
+        scans_s[dict_name] = elapsed
+        detection_status.update(result.get('detection_status', {}))
+        if 'error' in result:
+            errors.append(f"{dict_name}: {result['error']}")
+        
+        for aruco_id, aruco_data in result.get('detected_arucos', {}).items():
+            aruco_data['dictionary'] = (bits, dict_id)
+            # El mismo ID puede existir en varios diccionarios: prevalece el configurado
+            if aruco_id in detected_arucos and aruco_id not in configured_ids:
+                continue
+            detected_arucos[aruco_id] = aruco_data
+            if aruco_id not in detected_ids:
+                detected_ids.append(aruco_id)
+    
+    merged = {
+        'detected_arucos': detected_arucos,
+        'detected_ids': detected_ids,
+        'detection_status': detection_status,
+        'aruco_configs': marker_specs,
+        'dictionaries': dictionaries,
+        'timing': {'wall_s': time.time() - start, 'scans_s': scans_s}
+    }
+    if errors:
+        merged['error'] = '; '.join(errors)
+    return merged
+
 # ============================================================
 # UTILIDADES GENÉRICAS
 # ============================================================
@@ -0,0 +1,362 @@
+# local_vision_server.py - Servidor de visión de referencia (local / offline)
+"""
+Local Vision Server - COMAU-VISION
+==================================
+
+Implementación de referencia de la API descrita en Manuales/Vision Server.md,
+para probar server_test(), testRoutine y el dashboard sin el servidor de visión
+externo y medir la latencia de punta a punta en una notebook.
+
+Endpoints:
+- POST  /process/       imagen multipart ('file') → mismo esquema de respuesta que el servidor real
+- POST  /process_shm/   descriptor de frame en memoria compartida (src.vision.frame_transport)
+- GET   /config/        configuración completa
+- PATCH /config/        actualización parcial (merge profundo), devuelve la configuración completa
+- GET   /health/        estado del servicio
+- GET   /               página mínima de estado
+
+Procesamiento (modo real):
+- ArUcos base y tool con aruco_manager (diccionarios de config.json → aruco)
+- Junta y agujeros con yolo_detector (modelos de config.json → vision), solo sobre la
+  ROI de la junta si vision.roi_enabled (roi_inference)
+- Overlay con OverlayManager (marcos de los ArUcos y centro del troquel) + detecciones YOLO
+
+Trayectoria (aproximación de referencia): las muescas de lista_muescas_mm y el centro
+de la troqueladora están en mm respecto del ArUco base; los vectores
+"Muesca 1 -> Troqueladora", "Muesca k -> Muesca k-1" se expresan en los ejes del ArUco tool.
+
+Modo --fake: sin modelos ni detección. Respuesta determinista (ArUcos alineados,
+junta detectada, un agujero por muesca) con latencia simulada opcional.
+
+Uso:
+    python local_vision_server.py                 # puerto 8000, modelos de config.json
+    python local_vision_server.py --fake -p 8000  # respuesta determinista, sin modelos
+"""
+
+import argparse
+import base64
+import copy
+import json
+import math
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+from flask import Flask, jsonify, request
+
+from lib.overlay import OverlayManager
+from src import config_store
+from src.vision import aruco_manager, frame_transport, roi_inference, yolo_detector
+from src.vision.frame_context import FrameContext
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+DEFAULT_PORT = 8000
+OVERLAY_MAX_WIDTH = 960         # El overlay se reduce a este ancho antes de codificarlo en PNG
+HOLE_COLOR = (0, 0, 255)
+GASKET_COLOR = (0, 255, 0)
+TRAJECTORY_COLOR = (255, 0, 255)
+
+DEFAULT_VISION_CONFIG = {
+    'aruco_config': {'aruco_base_id': 23, 'aruco_base_size_mm': 70.0,
+                     'aruco_tool_id': 4, 'aruco_tool_size_mm': 50.0},
+    'troqueladora': {'x_mm': 0, 'y_mm': 0, 'diametro_mm': 10},
+    'roi_rectangulo': None,
+    'lista_muescas_mm': [],
+    'control_flags': {'usar_roi': False}
+}
+
+app = Flask(__name__)
+
+_vision_config = copy.deepcopy(DEFAULT_VISION_CONFIG)
+_config_path = None             # Archivo donde se persiste la configuración (None = solo memoria)
+_config_lock = threading.Lock()
+_process_lock = threading.Lock()   # Un procesamiento a la vez (modelos y OverlayManager compartidos)
+_fake_mode = False
+_fake_latency_s = 0.0
+_overlay_manager = None
+
+# ============================================================
+# CONFIGURACIÓN DEL SERVICIO
+# ============================================================
+
+def _deep_merge(target, patch):
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _deep_merge(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+
+def load_vision_config(path):
+    """Carga la configuración persistida (si existe) sobre los valores por defecto"""
+    global _config_path
+    _config_path = path
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            _deep_merge(_vision_config, json.load(f))
+        print(f"[local_vision] 📋 Configuración cargada desde {path}")
+
+
+def _save_vision_config():
+    if not _config_path:
+        return
+    try:
+        with open(_config_path, 'w', encoding='utf-8') as f:
+            json.dump(_vision_config, f, indent=2, ensure_ascii=False)
+    except Exception as e:
+        print(f"[local_vision] ⚠️ No se pudo guardar {_config_path}: {e}")
+
+
+def _load_app_config():
+    try:
+        return config_store.load()
+    except Exception:
+        return {}
+
+# ============================================================
+# TRAYECTORIA
+# ============================================================
+
+def compute_trajectory(muescas_mm, troqueladora_mm, base_angle_rad=0.0, tool_angle_rad=0.0):
+    """
+    Vectores de trayectoria en los ejes del ArUco tool.
+
+    Args:
+        muescas_mm: [{'x', 'y'}, ...] en mm respecto del ArUco base
+        troqueladora_mm: (x, y) del centro de la troqueladora en mm respecto del ArUco base
+        base_angle_rad / tool_angle_rad: Orientación de cada ArUco en la imagen
+
+    Returns:
+        [{'segmento': str, 'vector_mm': [x, y]}, ...]
+    """
+    delta = base_angle_rad - tool_angle_rad
+    cos_d, sin_d = math.cos(delta), math.sin(delta)
+    points = [('Troqueladora', troqueladora_mm)]
+    points += [(f"Muesca {i}", (float(m.get('x', 0)), float(m.get('y', 0)))) for i, m in enumerate(muescas_mm, start=1)]
+
+    vectors = []
+    for (to_name, (tx, ty)), (from_name, (fx, fy)) in zip(points, points[1:]):
+        dx, dy = tx - fx, ty - fy
+        vectors.append({
+            'segmento': f"{from_name} -> {to_name}",
+            'vector_mm': [round(dx * cos_d - dy * sin_d, 2), round(dx * sin_d + dy * cos_d, 2)]
+        })
+    return vectors
+
+
+def _mm_to_px(point_mm, pose, image_size):
+    """
+    Punto en mm del marco del ArUco base → píxeles del frame crudo (la pose puede estar
+    rectificada o sin distorsión: ver aruco_manager.pose_points_to_image)
+    """
+    angle, scale = float(pose['angle_rad']), float(pose['px_per_mm'])
+    x, y = point_mm[0] * scale, point_mm[1] * scale
+    point = (pose['center'][0] + x * math.cos(angle) - y * math.sin(angle),
+             pose['center'][1] + x * math.sin(angle) + y * math.cos(angle))
+    px, py = aruco_manager.pose_points_to_image([point], pose, image_size)[0]
+    return int(round(px)), int(round(py))
+
+# ============================================================
+# PROCESAMIENTO
+# ============================================================
+
+def _encode_overlay(image):
+    h, w = image.shape[:2]
+    if w > OVERLAY_MAX_WIDTH:
+        image = cv2.resize(image, (OVERLAY_MAX_WIDTH, int(h * OVERLAY_MAX_WIDTH / w)), interpolation=cv2.INTER_AREA)
+    _, buffer = cv2.imencode('.png', image)
+    return base64.b64encode(buffer.tobytes()).decode('ascii')
+
+
+def _response(overlay, vectors, junta, holes, base, tool, start):
+    return {
+        'status': 'success' if vectors else 'failure',
+        'junta_detectada': bool(junta),
+        'holes_detectados': int(holes),
+        'aruco_base_detectado': bool(base),
+        'aruco_tool_detectado': bool(tool),
+        'overlay_image': _encode_overlay(overlay),
+        'trajectory_vectors': vectors,
+        'processing_ms': round((time.time() - start) * 1000.0, 1)
+    }
+
+
+def process_fake(frame, config):
+    """Respuesta determinista: ArUcos alineados, junta detectada, un agujero por muesca"""
+    start = time.time()
+    if _fake_latency_s:
+        time.sleep(_fake_latency_s)
+    troq = config['troqueladora']
+    muescas = config.get('lista_muescas_mm') or []
+    vectors = compute_trajectory(muescas, (float(troq.get('x_mm', 0)), float(troq.get('y_mm', 0))))
+
+    overlay = frame.copy()
+    cv2.putText(overlay, f"FAKE - {len(vectors)} vectores", (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.5, TRAJECTORY_COLOR, 3)
+    return _response(overlay, vectors, True, len(muescas), True, True, start)
+
+
+def process_frame(frame, config):
+    """Procesamiento completo con los módulos de ArUco, YOLO y overlay del proyecto"""
+    global _overlay_manager
+    start = time.time()
+    aruco_cfg = config['aruco_config']
+    app_config = _load_app_config()
+    app_aruco = app_config.get('aruco', {})
+    base_app, tool_app = app_aruco.get('base', {}), app_aruco.get('tool', {})
+    aruco_config = {'base': dict(base_app, reference_id=aruco_cfg['aruco_base_id']),
+                    'tool': dict(tool_app, reference_id=aruco_cfg['aruco_tool_id'])}
+    ctx = FrameContext(frame)
+    troq = config['troqueladora']
+    troq_mm = (float(troq.get('x_mm', 0)), float(troq.get('y_mm', 0)))
+
+    if _overlay_manager is None:
+        _overlay_manager = OverlayManager()
+
+    # ArUcos + overlay de marcos y centro del troquel
+    rendered = aruco_manager.render_overlay_with_arucos(
+        _overlay_manager, ctx,
+        aruco_cfg['aruco_base_id'], aruco_cfg['aruco_tool_id'],
+        aruco_cfg['aruco_base_size_mm'], aruco_cfg['aruco_tool_size_mm'],
+        troq_mm[0], troq_mm[1], True, True, True,
+        aruco_config=aruco_config)
+    detection = rendered.get('detection_result') or {}
+    arucos = detection.get('detected_arucos', {})
+    base_pose = arucos.get(aruco_cfg['aruco_base_id']) if rendered.get('frame_detected') else None
+    tool_pose = arucos.get(aruco_cfg['aruco_tool_id']) if rendered.get('tool_detected') else None
+
+    overlay = frame
+    if rendered.get('has_objects'):
+        overlay, _ = _overlay_manager.render(frame, renderlist='aruco_overlay')
+    overlay = overlay.copy() if overlay is frame else overlay
+
+    # Junta y agujeros: solo sobre la ROI si vision.roi_enabled (frame completo si no hay ROI).
+    # La ROI se calcula con la misma detección de ArUcos del overlay.
+    roi_config = dict(app_config, aruco=aruco_config)
+    if rendered.get('frame_detected'):
+        ctx._memo(('aruco_detection',), lambda: detection)
+    gasket = roi_inference.infer_gasket_roi(ctx, config=roi_config) or {}
+    best = gasket.get('best')
+    if best is not None:
+        x1, y1, x2, y2 = best['bbox']
+        cv2.rectangle(overlay, (x1, y1), (x2, y2), GASKET_COLOR, 2)
+    holes = roi_inference.detect_holes_roi(ctx, config=roi_config)
+    for cx, cy in holes:
+        cv2.circle(overlay, (int(cx), int(cy)), 6, HOLE_COLOR, 2)
+
+    # Trayectoria (requiere el ArUco base)
+    vectors = []
+    if base_pose is not None:
+        muescas = config.get('lista_muescas_mm') or []
+        tool_angle = tool_pose['angle_rad'] if tool_pose is not None else base_pose['angle_rad']
+        vectors = compute_trajectory(muescas, troq_mm, base_pose['angle_rad'], tool_angle)
+        path = [troq_mm] + [(float(m.get('x', 0)), float(m.get('y', 0))) for m in muescas]
+        image_size = (frame.shape[1], frame.shape[0])
+        for a, b in zip(path, path[1:]):
+            cv2.arrowedLine(overlay, _mm_to_px(b, base_pose, image_size), _mm_to_px(a, base_pose, image_size),
+                            TRAJECTORY_COLOR, 2)
+
+    return _response(overlay, vectors, best is not None, len(holes), base_pose is not None, tool_pose is not None, start)
+
+
+def _process(frame):
+    with _config_lock:
+        config = copy.deepcopy(_vision_config)
+    with _process_lock:
+        return process_fake(frame, config) if _fake_mode else process_frame(frame, config)
+
+# ============================================================
+# ENDPOINTS
+# ============================================================
+
+@app.route('/process/', methods=['POST'])
+def api_process():
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'detail': "Falta el campo 'file'"}), 422
+    frame = cv2.imdecode(np.frombuffer(upload.read(), np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return jsonify({'detail': 'No se pudo decodificar la imagen'}), 400
+    return jsonify(_process(frame))
+
+
+@app.route('/process_shm/', methods=['POST'])
+def api_process_shm():
+    frame = frame_transport.read_frame(request.get_json(silent=True) or {})
+    if frame is None:
+        return jsonify({'detail': 'Frame no disponible en memoria compartida'}), 409
+    return jsonify(_process(frame))
+
+
+@app.route('/config/', methods=['GET'])
+def api_get_config():
+    with _config_lock:
+        return jsonify(_vision_config)
+
+
+@app.route('/config/', methods=['PATCH'])
+def api_patch_config():
+    patch = request.get_json(silent=True)
+    if not isinstance(patch, dict):
+        return jsonify({'detail': 'Se esperaba un objeto JSON'}), 422
+    with _config_lock:
+        _deep_merge(_vision_config, patch)
+        _save_vision_config()
+        return jsonify(_vision_config)
+
+
+@app.route('/health/', methods=['GET'])
+def api_health():
+    return jsonify({'status': 'ok', 'message': 'Servicio de Visión funcionando correctamente.'})
+
+
+@app.route('/', methods=['GET'])
+def index():
+    mode = 'fake' if _fake_mode else 'real'
+    return (f"<h1>Servidor de visión local</h1><p>Modo: {mode}</p>"
+            f"<p>POST /process/ · POST /process_shm/ · GET|PATCH /config/ · GET /health/</p>")
+
+# ============================================================
+# MAIN
+# ============================================================
+
+def _load_models():
+    vision_config = _load_app_config().get('vision', {})
+    backend = vision_config.get('inference_backend', 'ultralytics')
+    yolo_detector.set_inference_mode(vision_config.get('inference_mode'))
+    for model_type, key in (('detection', 'detection_model'), ('holes', 'holes_model')):
+        path = vision_config.get(key)
+        if path and not yolo_detector.load_model(model_type, path, backend):
+            print(f"[local_vision] ⚠️ Modelo {model_type} no disponible: {path}")
+
+
+def main():
+    global _fake_mode, _fake_latency_s
+    parser = argparse.ArgumentParser(description="Servidor de visión de referencia (local)")
+    parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--fake', action='store_true', help="Respuesta determinista sin modelos ni detección")
+    parser.add_argument('--fake-latency-ms', type=float, default=0.0, help="Latencia simulada en modo fake")
+    parser.add_argument('--config', help="Archivo donde persistir la configuración (p. ej. vision_config.json)")
+    args = parser.parse_args()
+
+    _fake_mode = args.fake
+    _fake_latency_s = args.fake_latency_ms / 1000.0
+    load_vision_config(args.config)
+    if not _fake_mode:
+        _load_models()
+
+    print(f"[local_vision] 🚀 Servidor de visión local en http://{args.host}:{args.port} "
+          f"(modo {'fake' if _fake_mode else 'real'})")
+    try:
+        app.run(host=args.host, port=args.port, threaded=True, debug=False, use_reloader=False)
+    finally:
+        frame_transport.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,8 @@ import time
 from typing import Optional, Dict, Any, Callable
 from enum import Enum
 
+from src import config_store
+
 try:
     import paho.mqtt.client as mqtt
     MQTT_AVAILABLE = True
@@ -121,29 +123,27 @@ class MQTTManager:
         Returns:
             Diccionario con la configuración MQTT
         """
-        try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                mqtt_config = config.get('mqtt', {})
-                
-                # Cargar configuración básica
-                self.broker_ip = mqtt_config.get('broker_ip')
-                self.broker_port = mqtt_config.get('broker_port', 1883)
-                
-                # Cargar topics desde la sección 'topics'
-                topics = mqtt_config.get('topics', {})
-                self.topic_commands = topics.get('commands', 'COMAU/commands')
-                self.topic_keyboard = topics.get('keyboard', 'COMAU/toRobot')
-                self.topic_responses = topics.get('responses', 'COMAU/memoryData')
-                self.connect_on_start = mqtt_config.get('connect_on_start', True)
-                
-                self.logger.info(f"Configuración MQTT cargada: {self.broker_ip}:{self.broker_port}")
-                self.logger.debug(f"Topics: commands={self.topic_commands}, keyboard={self.topic_keyboard}, responses={self.topic_responses}")
-                
-                return mqtt_config
-        except FileNotFoundError:
+        if not config_store.exists(self.config_path):
             self.logger.warning(f"Archivo de configuración {self.config_path} no encontrado")
             return {}
+        try:
+            mqtt_config = config_store.get_section('mqtt', path=self.config_path)
+            
+            # Cargar configuración básica
+            self.broker_ip = mqtt_config.get('broker_ip')
+            self.broker_port = mqtt_config.get('broker_port', 1883)
+            
+            # Cargar topics desde la sección 'topics'
+            topics = mqtt_config.get('topics', {})
+            self.topic_commands = topics.get('commands', 'COMAU/commands')
+            self.topic_keyboard = topics.get('keyboard', 'COMAU/toRobot')
+            self.topic_responses = topics.get('responses', 'COMAU/memoryData')
+            self.connect_on_start = mqtt_config.get('connect_on_start', True)
+            
+            self.logger.info(f"Configuración MQTT cargada: {self.broker_ip}:{self.broker_port}")
+            self.logger.debug(f"Topics: commands={self.topic_commands}, keyboard={self.topic_keyboard}, responses={self.topic_responses}")
+            
+            return mqtt_config
         except json.JSONDecodeError as e:
             self.logger.error(f"Error al decodificar JSON: {e}")
             return {}
@@ -167,15 +167,8 @@ class MQTTManager:
             True si se guardó correctamente, False en caso contrario
         """
         try:
-            # Cargar configuración existente
-            try:
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-            except FileNotFoundError:
-                config = {}
-            
-            # Actualizar sección MQTT
-            config['mqtt'] = {
+            # Actualizar sección MQTT (leer-modificar-escribir atómico)
+            mqtt_config = {
                 'broker_ip': broker_ip,
                 'broker_port': broker_port,
                 'topics': {
@@ -185,10 +178,7 @@ class MQTTManager:
                 },
                 'connect_on_start': connect_on_start
             }
-            
-            # Guardar
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
+            config_store.update_section('mqtt', mqtt_config, replace=True, path=self.config_path)
             
             # Actualizar variables internas
             self.broker_ip = broker_ip
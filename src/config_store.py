@@ -0,0 +1,257 @@
+# config_store.py - Configuración compartida (config.json) en memoria
+"""
+Config Store - COMAU-VISION
+===========================
+
+Única vía de lectura/escritura de config.json para todos los módulos:
+
+- Copia parseada en memoria: load() / get_section() no vuelven a parsear el JSON
+  mientras el archivo no cambie (se compara mtime y tamaño con os.stat).
+- Escrituras atómicas bajo lock: archivo temporal en el mismo directorio + os.replace,
+  así un lector nunca ve un config.json a medio escribir.
+- update() / update_section() hacen leer-modificar-escribir bajo el mismo lock, sin
+  pisar cambios de otros módulos.
+- Notificaciones: add_listener(callback(path, secciones_cambiadas)) se llama después de
+  cada escritura y cuando se detecta un cambio externo del archivo.
+
+Las lecturas devuelven copias: modificar el dict devuelto no altera la caché.
+"""
+
+import copy
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+CONFIG_FILE = 'config.json'
+REPLACE_RETRIES = 5             # Windows: os.replace falla si otro proceso tiene el archivo abierto
+REPLACE_RETRY_DELAY_S = 0.05
+
+_entries: Dict[str, Dict[str, Any]] = {}     # Ruta absoluta → {'data', 'stamp'}
+_lock = threading.RLock()
+_listeners: List[Callable[[str, List[str]], None]] = []
+_stats = {'reads': 0, 'parses': 0, 'writes': 0, 'external_changes': 0}
+
+# ============================================================
+# LISTENERS
+# ============================================================
+
+def add_listener(callback: Callable[[str, List[str]], None]) -> None:
+    """
+    Registra callback(path, secciones_cambiadas) para cada cambio de configuración.
+    Se llama desde el hilo que escribió o detectó el cambio: no debe bloquear.
+    """
+    with _lock:
+        if callback not in _listeners:
+            _listeners.append(callback)
+
+
+def _notify(path: str, sections: List[str]) -> None:
+    for callback in list(_listeners):
+        try:
+            callback(path, sections)
+        except Exception as e:
+            print(f"[config_store] ⚠️ Error en listener: {e}")
+
+
+def _changed_sections(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    return sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
+# ============================================================
+# LECTURA
+# ============================================================
+
+def _stamp(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def get_stamp(path: str = CONFIG_FILE) -> Optional[tuple]:
+    """
+    Marca de versión del archivo en disco: (st_mtime_ns, tamaño), la misma que usa la
+    caché de load(); None si no existe. Sirve como clave de caché para datos derivados.
+    """
+    return _stamp(os.path.abspath(path))
+
+
+def _current(path: str, pending: List[tuple]) -> Dict[str, Any]:
+    """
+    Copia en caché del archivo (se vuelve a parsear si cambió en disco). Requiere _lock.
+    Un cambio externo se agrega a pending como (path, secciones): quien llama notifica
+    con _notify_pending() después de soltar el lock.
+    """
+    key = os.path.abspath(path)
+    stamp = _stamp(key)
+    entry = _entries.get(key)
+    _stats['reads'] += 1
+    if entry is not None and entry['stamp'] == stamp:
+        return entry['data']
+
+    if stamp is None:
+        data = {}
+    else:
+        with open(key, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        _stats['parses'] += 1
+    _entries[key] = {'data': data, 'stamp': stamp}
+
+    if entry is not None:
+        sections = _changed_sections(entry['data'], data)
+        if sections:
+            _stats['external_changes'] += 1
+            print(f"[config_store] 🔄 {path} modificado externamente: {sections}")
+            pending.append((path, sections))
+    return data
+
+
+def _notify_pending(pending: List[tuple]) -> None:
+    for path, sections in pending:
+        _notify(path, sections)
+
+
+def load(path: str = CONFIG_FILE) -> Dict[str, Any]:
+    """
+    Configuración completa (copia).
+
+    Returns:
+        dict con el contenido de config.json ({} si el archivo no existe)
+
+    Raises:
+        json.JSONDecodeError: Si el archivo no es JSON válido
+    """
+    pending = []
+    with _lock:
+        data = copy.deepcopy(_current(path, pending))
+    _notify_pending(pending)
+    return data
+
+
+def get_section(section: str, default: Any = None, path: str = CONFIG_FILE) -> Any:
+    """Una sección de la configuración (copia); default (o {}) si no existe"""
+    pending = []
+    with _lock:
+        data = _current(path, pending)
+        if section not in data:
+            value = copy.deepcopy(default) if default is not None else {}
+        else:
+            value = copy.deepcopy(data[section])
+    _notify_pending(pending)
+    return value
+
+
+def exists(path: str = CONFIG_FILE) -> bool:
+    return os.path.exists(path)
+
+# ============================================================
+# ESCRITURA
+# ============================================================
+
+def _write_atomic(path: str, data: Dict[str, Any]) -> None:
+    key = os.path.abspath(path)
+    fd, tmp_path = tempfile.mkstemp(prefix='.config-', suffix='.tmp', dir=os.path.dirname(key))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            if os.path.exists(key):
+                os.chmod(tmp_path, stat.S_IMODE(os.stat(key).st_mode))   # mkstemp crea con 0600
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(REPLACE_RETRIES):
+            try:
+                os.replace(tmp_path, key)
+                break
+            except PermissionError:
+                if attempt == REPLACE_RETRIES - 1:
+                    raise
+                time.sleep(REPLACE_RETRY_DELAY_S)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    _entries[key] = {'data': copy.deepcopy(data), 'stamp': _stamp(key)}
+    _stats['writes'] += 1
+
+
+def save(config: Dict[str, Any], path: str = CONFIG_FILE) -> List[str]:
+    """
+    Reemplaza la configuración completa (escritura atómica).
+
+    Returns:
+        Secciones que cambiaron
+    """
+    pending = []
+    with _lock:
+        try:
+            old = _current(path, pending)
+        except json.JSONDecodeError:
+            old = {}
+        sections = _changed_sections(old, config)
+        _write_atomic(path, config)
+    _notify_pending(pending)
+    if sections:
+        _notify(path, sections)
+    return sections
+
+
+def update(mutator: Callable[[Dict[str, Any]], Any], path: str = CONFIG_FILE) -> List[str]:
+    """
+    Leer-modificar-escribir atómico: mutator recibe una copia de la configuración y la
+    modifica en el lugar. Solo se escribe si algo cambió.
+
+    Returns:
+        Secciones que cambiaron
+    """
+    pending = []
+    with _lock:
+        old = _current(path, pending)
+        config = copy.deepcopy(old)
+        mutator(config)
+        sections = _changed_sections(old, config)
+        if sections:
+            _write_atomic(path, config)
+    _notify_pending(pending)
+    if sections:
+        _notify(path, sections)
+    return sections
+
+
+def update_section(section: str, values: Dict[str, Any], replace: bool = False,
+                   path: str = CONFIG_FILE) -> List[str]:
+    """
+    Actualiza una sección: mezcla values en ella (replace=False) o la reemplaza entera.
+
+    Returns:
+        Secciones que cambiaron ([] o [section])
+    """
+    def mutate(config):
+        if replace or not isinstance(config.get(section), dict):
+            config[section] = copy.deepcopy(values)
+        else:
+            config[section].update(copy.deepcopy(values))
+    return update(mutate, path)
+
+
+def invalidate(path: Optional[str] = None) -> None:
+    """Olvida la copia en memoria (de un archivo o de todos)"""
+    with _lock:
+        if path is None:
+            _entries.clear()
+        else:
+            _entries.pop(os.path.abspath(path), None)
+
+
+def get_stats() -> Dict[str, Any]:
+    """Contadores: {'reads', 'parses', 'writes', 'external_changes', 'files'}"""
+    with _lock:
+        return dict(_stats, files=len(_entries))
@@ -0,0 +1,203 @@
+# analysis_jobs.py - Trabajos de análisis asíncronos (server_test) con coalescencia
+"""
+Analysis Jobs - COMAU-VISION
+============================
+
+Ejecuta server_test() (captura + codificación + ida y vuelta al servidor de
+visión) fuera de los handlers de Flask / Socket.IO:
+
+- submit() devuelve enseguida un job_id; el resultado llega a los listeners
+  registrados (p. ej. emisión del evento SERVER_TEST_RESULT a los 'recipients' del
+  trabajo: los clientes que lo dispararon, o a todos si el trabajo es 'broadcast')
+  o por consulta con get_job().
+- Un único hilo de análisis: nunca corren dos análisis en paralelo.
+- Coalescencia: un disparo que llega mientras hay un trabajo en cola o en curso se
+  une a ese trabajo (mismo job_id) en lugar de encolar otro análisis.
+
+Estados de un trabajo: 'queued' → 'running' → 'done' | 'error'
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+MAX_JOBS_HISTORY = 32       # Trabajos terminados que se conservan para consulta
+WAIT_TIMEOUT_S = 30         # Espera máxima por defecto de wait_job()
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='AnalysisJob')
+_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_futures: Dict[str, Future] = {}
+_active_job_id: Optional[str] = None
+_lock = threading.Lock()
+_listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+# ============================================================
+# LISTENERS
+# ============================================================
+
+def add_listener(callback: Callable[[Dict[str, Any]], None]) -> None:
+    """
+    Registra una función que recibe cada trabajo al terminar (ver get_job()).
+    Se llama desde el hilo de análisis: no debe bloquear.
+    """
+    with _lock:
+        if callback not in _listeners:
+            _listeners.append(callback)
+
+
+def _notify(job: Dict[str, Any]) -> None:
+    for callback in list(_listeners):
+        try:
+            callback(job)
+        except Exception as e:
+            print(f"[analysis_jobs] ⚠️ Error en listener: {e}")
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+def _run(job_id: str) -> Dict[str, Any]:
+    global _active_job_id
+    from src.vision.vision_manager import server_test
+
+    with _lock:
+        job = _jobs[job_id]
+        job['state'] = 'running'
+        job['started_at'] = time.time()
+    print(f"[analysis_jobs] ▶️ Análisis {job_id} iniciado (origen: {job['source']})")
+
+    try:
+        result = server_test()
+        if not isinstance(result, dict):
+            result = {'ok': False, 'error': 'Respuesta inesperada', 'data': str(result)}
+    except Exception as e:
+        result = {'ok': False, 'error': str(e), 'mensaje': 'Error en análisis'}
+
+    with _lock:
+        job['state'] = 'done' if result.get('ok') else 'error'
+        job['finished_at'] = time.time()
+        job['duration_s'] = round(job['finished_at'] - job['started_at'], 3)
+        job['result'] = result
+        if _active_job_id == job_id:
+            _active_job_id = None
+        _futures.pop(job_id, None)
+        snapshot = dict(job, recipients=list(job['recipients']))
+
+    print(f"[analysis_jobs] {'✅' if snapshot['state'] == 'done' else '❌'} Análisis {job_id} terminado "
+          f"en {snapshot['duration_s']}s ({snapshot['triggers']} disparos)")
+    _notify(snapshot)
+    return result
+
+
+def submit(source: str = 'api', recipient: Optional[str] = None, broadcast: bool = False) -> Dict[str, Any]:
+    """
+    Solicita un análisis.
+
+    Si ya hay uno en cola o en curso, el disparo se une a él.
+
+    Args:
+        source: Origen del disparo (para logs y estado)
+        recipient: Destinatario del resultado (p. ej. sid de Socket.IO); se acumula en
+                   job['recipients'] también si el disparo se une a un trabajo en curso
+        broadcast: El resultado debe llegar a todos los clientes (disparos sin cliente
+                   propio, p. ej. la rutina del robot); se acumula igual que recipient
+
+    Returns:
+        {'ok': True, 'job_id': str, 'state': str, 'coalesced': bool}
+    """
+    global _active_job_id
+    with _lock:
+        if _active_job_id is not None:
+            job = _jobs[_active_job_id]
+            job['triggers'] += 1
+            if recipient is not None and recipient not in job['recipients']:
+                job['recipients'].append(recipient)
+            job['broadcast'] = job['broadcast'] or broadcast
+            print(f"[analysis_jobs] 🔗 Disparo de {source} unido al análisis {job['job_id']} ({job['state']})")
+            return {'ok': True, 'job_id': job['job_id'], 'state': job['state'], 'coalesced': True}
+
+        job_id = uuid.uuid4().hex[:12]
+        _jobs[job_id] = {
+            'job_id': job_id,
+            'source': source,
+            'state': 'queued',
+            'triggers': 1,
+            'recipients': [recipient] if recipient is not None else [],
+            'broadcast': broadcast,
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'duration_s': None,
+            'result': None
+        }
+        while len(_jobs) > MAX_JOBS_HISTORY:
+            oldest = next(iter(_jobs))
+            if oldest in _futures:
+                break
+            _jobs.pop(oldest)
+        _active_job_id = job_id
+        _futures[job_id] = _executor.submit(_run, job_id)
+        return {'ok': True, 'job_id': job_id, 'state': 'queued', 'coalesced': False}
+
+
+def get_job(job_id: str, include_image: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Estado de un trabajo: {'job_id', 'source', 'state', 'triggers', 'recipients', 'broadcast',
+    'submitted_at', 'started_at', 'finished_at', 'duration_s', 'result'} o None si no existe.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job, recipients=list(job['recipients']))
+    if not include_image and job['result'] is not None:
+        job['result'] = {k: v for k, v in job['result'].items() if k != 'overlay_image'}
+    return job
+
+
+def list_jobs() -> List[Dict[str, Any]]:
+    """Trabajos recientes (del más nuevo al más viejo), sin imágenes"""
+    with _lock:
+        job_ids = list(reversed(_jobs))
+    return [job for job in (get_job(job_id, include_image=False) for job_id in job_ids) if job is not None]
+
+
+def wait_job(job_id: str, timeout: float = WAIT_TIMEOUT_S) -> Optional[Dict[str, Any]]:
+    """
+    Espera a que termine un trabajo.
+
+    Returns:
+        El trabajo (ver get_job()); si vence el timeout, en su estado actual
+    """
+    with _lock:
+        future = _futures.get(job_id)
+    if future is not None:
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            pass
+    return get_job(job_id)
+
+
+def run_analysis(source: str = 'api', timeout: float = WAIT_TIMEOUT_S,
+                 broadcast: bool = False) -> Dict[str, Any]:
+    """
+    submit() + wait_job(): resultado de server_test() pasando por la cola de análisis
+    (se une a un análisis en curso si lo hay). Con broadcast=True el resultado también
+    se emite a todos los clientes (ver submit()).
+    """
+    job = wait_job(submit(source, broadcast=broadcast)['job_id'], timeout)
+    if job is None or job['result'] is None:
+        return {'ok': False, 'error': 'Timeout esperando el análisis', 'mensaje': 'Análisis en curso'}
+    return job['result']
+
+
+def shutdown() -> None:
+    """Detiene el hilo de análisis (no espera el trabajo en curso)"""
+    _executor.shutdown(wait=False)
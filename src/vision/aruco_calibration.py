@@ -0,0 +1,468 @@
+# aruco_calibration.py - Calibración offline de ArUcos sobre conjuntos de imágenes
+"""
+Aruco Calibration - COMAU-VISION
+================================
+
+Calcula referencias robustas de los ArUcos Base y Tool a partir de un conjunto
+grabado de frames (directorio de imágenes o video), en lugar de un único frame
+en vivo.
+
+- La detección se reparte en un pool de procesos (cada worker lee sus propios frames)
+- Por marcador se agregan mediana de centro, ángulo, px_per_mm y esquinas, más su dispersión
+- Las mediciones son esquinas crudas (píxeles de la imagen original), el mismo espacio
+  en el que /api/aruco/save_config guarda la referencia
+- El resultado puede escribirse como bloque 'saved_reference' en config.json
+- start_batch_job() lanza la calibración en segundo plano como un proceso aparte
+  (python -m src.vision.aruco_calibration): los workers del pool nunca reimportan el
+  módulo principal del servidor
+
+Uso por línea de comandos (desde la raíz del proyecto):
+    python -m src.vision.aruco_calibration imagenes/ --save
+    python -m src.vision.aruco_calibration captura.mp4 --stride 5 --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from src import config_store
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    cv2 = None
+    OPENCV_AVAILABLE = False
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+CONFIG_FILE = "config.json"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+MIN_DETECTIONS = 3          # Detecciones mínimas por marcador para escribir la referencia
+FRAMES_PER_TASK = 16        # Frames por tarea enviada a cada worker
+MAX_JOBS_HISTORY = 10       # Trabajos en segundo plano conservados para consulta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_jobs_lock = threading.Lock()
+_jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+
+
+def _load_config(config_file: str = CONFIG_FILE) -> dict:
+    """Cargar configuración desde config.json"""
+    try:
+        return config_store.load(config_file)
+    except Exception as e:
+        print(f"[aruco_calib] Error cargando {config_file}: {e}")
+        return {}
+
+
+def _update_config(mutator, config_file: str = CONFIG_FILE) -> bool:
+    """Leer-modificar-escribir atómico de config.json (ver config_store.update)"""
+    try:
+        config_store.update(mutator, config_file)
+        return True
+    except Exception as e:
+        print(f"[aruco_calib] Error guardando {config_file}: {e}")
+        return False
+
+# ============================================================
+# ENUMERACIÓN DE FRAMES
+# ============================================================
+
+def _list_images(directory: str) -> List[str]:
+    """Imágenes del directorio ordenadas por nombre"""
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def _build_tasks(source: str, max_frames: Optional[int], stride: int) -> List[Dict[str, Any]]:
+    """
+    Divide la fuente en tareas para el pool.
+    - Directorio: listas de rutas
+    - Video: rangos de índices de frame (cada worker abre el video y se posiciona)
+    """
+    stride = max(1, int(stride))
+
+    if os.path.isdir(source):
+        paths = _list_images(source)[::stride]
+        if max_frames:
+            paths = paths[:max_frames]
+        return [{'kind': 'images', 'paths': paths[i:i + FRAMES_PER_TASK]}
+                for i in range(0, len(paths), FRAMES_PER_TASK)]
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise ValueError(f"No se pudo abrir la fuente: {source}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    indices = list(range(0, total, stride))
+    if max_frames:
+        indices = indices[:max_frames]
+    return [{'kind': 'video', 'source': source, 'indices': indices[i:i + FRAMES_PER_TASK]}
+            for i in range(0, len(indices), FRAMES_PER_TASK)]
+
+
+def _iter_task_frames(task: Dict[str, Any]):
+    """Genera (etiqueta, imagen en grises) para una tarea"""
+    if task['kind'] == 'images':
+        for path in task['paths']:
+            yield path, cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        return
+
+    cap = cv2.VideoCapture(task['source'])
+    try:
+        indices = task['indices']
+        cap.set(cv2.CAP_PROP_POS_FRAMES, indices[0])
+        position = indices[0]
+        for index in indices:
+            # Avanzar secuencialmente (grab) es más barato que reposicionar el video
+            while position < index:
+                cap.grab()
+                position += 1
+            ret, frame = cap.read()
+            position += 1
+            yield f"frame_{index}", cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if ret else None
+    finally:
+        cap.release()
+
+# ============================================================
+# WORKER
+# ============================================================
+
+def _process_task(task: Dict[str, Any], aruco_config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ejecuta la detección sobre los frames de una tarea (en un proceso del pool).
+    Returns: {'frames': int, 'unreadable': int, 'measurements': {'base': [...], 'tool': [...]}}
+    """
+    import io
+    import contextlib
+    from src.vision.aruco_manager import detect_arucos_from_config
+
+    measurements = {'base': [], 'tool': []}
+    frames = unreadable = 0
+
+    for _, gray in _iter_task_frames(task):
+        if gray is None:
+            unreadable += 1
+            continue
+        frames += 1
+
+        # La detección imprime por frame; silenciar en los workers.
+        # Esquinas crudas (sin undistort/rectificación/filtro): es el espacio de saved_reference
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = detect_arucos_from_config(gray, aruco_config, postprocess=False)
+
+        for name, id_key, flag in (('base', 'frame_aruco_id', 'frame_detected'),
+                                   ('tool', 'tool_aruco_id', 'tool_detected')):
+            if not result.get(flag):
+                continue
+            data = result['detected_arucos'][result[id_key]]
+            measurements[name].append({
+                'center': list(data['center']),
+                'angle_deg': float(np.degrees(data['angle_rad'])),
+                'px_per_mm': float(data['px_per_mm']),
+                'corners': [list(c) for c in data['corners']]
+            })
+
+    return {'frames': frames, 'unreadable': unreadable, 'measurements': measurements}
+
+# ============================================================
+# AGREGACIÓN
+# ============================================================
+
+def aggregate_measurements(measurements: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Estadísticos robustos de las mediciones de un marcador.
+    Returns: Dict con medianas y dispersión, o None si no hay mediciones
+    """
+    if not measurements:
+        return None
+
+    centers = np.array([m['center'] for m in measurements], dtype=float)
+    px_per_mm = np.array([m['px_per_mm'] for m in measurements], dtype=float)
+    corners = np.array([m['corners'] for m in measurements], dtype=float)
+
+    # Ángulos desenvueltos respecto a la primera medición para evitar el salto ±180°
+    angles = np.array([m['angle_deg'] for m in measurements], dtype=float)
+    angles = angles[0] + (angles - angles[0] + 180.0) % 360.0 - 180.0
+    angle_median = float(np.median(angles))
+
+    center_median = np.median(centers, axis=0)
+    center_dev = np.hypot(*(centers - center_median).T)
+
+    return {
+        'detections': len(measurements),
+        'center': [float(center_median[0]), float(center_median[1])],
+        'angle_deg': (angle_median + 180.0) % 360.0 - 180.0,
+        'px_per_mm': float(np.median(px_per_mm)),
+        'corners': np.median(corners, axis=0).tolist(),
+        'spread': {
+            'center_px_std': float(np.sqrt(np.mean(center_dev ** 2))),
+            'center_px_max': float(center_dev.max()),
+            'angle_deg_std': float(np.std(angles)),
+            'px_per_mm_std': float(np.std(px_per_mm)),
+            'px_per_mm_pct': float(np.std(px_per_mm) / np.median(px_per_mm) * 100.0)
+        }
+    }
+
+# ============================================================
+# CALIBRACIÓN
+# ============================================================
+
+def calibrate_batch(source: str, aruco_config: Optional[Dict[str, Any]] = None,
+                    workers: Optional[int] = None, max_frames: Optional[int] = None,
+                    stride: int = 1, save: bool = False,
+                    config_file: str = CONFIG_FILE) -> Dict[str, Any]:
+    """
+    Calibra los ArUcos Base y Tool sobre un directorio de imágenes o un video.
+
+    Args:
+        source: Directorio de imágenes o archivo de video
+        aruco_config: Sección 'aruco' de config.json (None = leer de config_file)
+        workers: Procesos del pool (None = número de CPUs)
+        max_frames: Máximo de frames a procesar (None = todos)
+        stride: Procesar 1 de cada N frames
+        save: Escribir el bloque 'saved_reference' de cada marcador en config_file
+        config_file: Ruta de config.json
+
+    Returns:
+        {'ok', 'frames_processed', 'frames_unreadable', 'markers': {base/tool: stats},
+         'elapsed_s', 'saved', 'error'/'mensaje' si falla}
+    """
+    if not OPENCV_AVAILABLE:
+        return {'ok': False, 'error': 'OpenCV no disponible', 'mensaje': 'OpenCV no disponible'}
+
+    start = time.time()
+    if aruco_config is None:
+        aruco_config = _load_config(config_file).get('aruco', {})
+
+    try:
+        tasks = _build_tasks(source, max_frames, stride)
+    except Exception as e:
+        return {'ok': False, 'error': str(e), 'mensaje': f'Fuente no válida: {source}'}
+
+    if not tasks:
+        return {'ok': False, 'error': 'Sin frames', 'mensaje': f'No se encontraron frames en {source}'}
+
+    workers = workers or os.cpu_count() or 1
+    print(f"[aruco_calib] 📂 {source}: {len(tasks)} tarea(s) en {workers} proceso(s)")
+
+    frames = unreadable = 0
+    measurements = {'base': [], 'tool': []}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for partial in executor.map(_process_task, tasks, [aruco_config] * len(tasks)):
+            frames += partial['frames']
+            unreadable += partial['unreadable']
+            for name in measurements:
+                measurements[name].extend(partial['measurements'][name])
+
+    markers = {name: aggregate_measurements(values) for name, values in measurements.items()}
+    elapsed = time.time() - start
+
+    for name, stats in markers.items():
+        if stats:
+            print(f"[aruco_calib] ✓ {name}: {stats['detections']}/{frames} detecciones, "
+                  f"px_per_mm={stats['px_per_mm']:.4f} (±{stats['spread']['px_per_mm_pct']:.2f}%), "
+                  f"ángulo={stats['angle_deg']:.2f}° (±{stats['spread']['angle_deg_std']:.2f}°)")
+        else:
+            print(f"[aruco_calib] ⚠️ {name}: sin detecciones")
+    print(f"[aruco_calib] ⏱️ {frames} frames en {elapsed:.2f}s")
+
+    result = {
+        'ok': True,
+        'source': source,
+        'frames_processed': frames,
+        'frames_unreadable': unreadable,
+        'markers': markers,
+        'elapsed_s': elapsed,
+        'saved': []
+    }
+
+    if save:
+        result['saved'] = save_calibration(markers, config_file)
+
+    return result
+
+
+def save_calibration(markers: Dict[str, Optional[Dict[str, Any]]], config_file: str = CONFIG_FILE) -> List[str]:
+    """
+    Escribe el bloque 'saved_reference' de cada marcador con suficientes detecciones.
+    Conserva el flag 'use_saved_reference' existente.
+
+    Returns: Lista de marcadores escritos ('base', 'tool')
+    """
+    timestamp = datetime.now().isoformat()
+    saved = []
+    for name, stats in markers.items():
+        if not stats or stats['detections'] < MIN_DETECTIONS:
+            print(f"[aruco_calib] ⚠️ {name}: detecciones insuficientes, referencia no escrita")
+            continue
+        saved.append(name)
+
+    def write_references(config):
+        aruco = config.setdefault('aruco', {})
+        for name in saved:
+            stats = markers[name]
+            marker = aruco.setdefault(name, {})
+            previous = marker.get('saved_reference') or {}
+            marker['saved_reference'] = {
+                'use_saved_reference': previous.get('use_saved_reference', False),
+                'px_per_mm': stats['px_per_mm'],
+                'angle_deg': stats['angle_deg'],
+                'timestamp': timestamp,
+                'center': stats['center'],
+                'corners': stats['corners'],
+                'calibration': {
+                    'method': 'batch',
+                    'detections': stats['detections'],
+                    'spread': stats['spread']
+                }
+            }
+
+    if saved and _update_config(write_references, config_file):
+        print(f"[aruco_calib] 💾 Referencia guardada en {config_file}: {', '.join(saved)}")
+        return saved
+    return []
+
+# ============================================================
+# TRABAJOS EN SEGUNDO PLANO
+# ============================================================
+
+def start_batch_job(source: str, workers: Optional[int] = None, max_frames: Optional[int] = None,
+                    stride: int = 1, save: bool = False, config_file: str = CONFIG_FILE,
+                    on_done: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Lanza calibrate_batch() en segundo plano, sin bloquear al llamador (p. ej. una request de Flask).
+
+    La calibración corre en un proceso aparte ejecutado como `python -m src.vision.aruco_calibration`:
+    ese módulo es el __main__ del proceso, así que los workers del pool (spawn en Windows)
+    reimportan solo este módulo y no el servidor que hizo la solicitud.
+
+    Args:
+        source, workers, max_frames, stride, save, config_file: ver calibrate_batch()
+        on_done: Callback con el trabajo terminado (p. ej. reiniciar estado si se guardó la referencia)
+
+    Returns:
+        {'ok': True, 'job_id': str} o {'ok': False, 'error', 'mensaje', 'job_id'} si ya hay una calibración en curso
+    """
+    with _jobs_lock:
+        running = next((job for job in _jobs.values() if job['state'] == 'running'), None)
+        if running is not None:
+            return {'ok': False, 'error': 'Calibración en curso', 'mensaje': 'Ya hay una calibración en curso',
+                    'job_id': running['job_id']}
+
+        job_id = uuid.uuid4().hex[:12]
+        _jobs[job_id] = {
+            'job_id': job_id,
+            'source': source,
+            'state': 'running',
+            'started_at': time.time(),
+            'finished_at': None,
+            'result': None
+        }
+        while len(_jobs) > MAX_JOBS_HISTORY:
+            _jobs.popitem(last=False)
+
+    args = [source, '--config', os.path.abspath(config_file), '--stride', str(int(stride))]
+    if workers:
+        args += ['--workers', str(int(workers))]
+    if max_frames:
+        args += ['--max-frames', str(int(max_frames))]
+    if save:
+        args.append('--save')
+
+    threading.Thread(target=_run_batch_job, args=(job_id, args, on_done),
+                     name=f"aruco-calib-{job_id}", daemon=True).start()
+    print(f"[aruco_calib] ▶️ Calibración {job_id} iniciada en segundo plano: {source}")
+    return {'ok': True, 'job_id': job_id}
+
+
+def _run_batch_job(job_id: str, args: List[str], on_done) -> None:
+    """Hilo de un trabajo: ejecuta el proceso de calibración y recoge su resultado"""
+    fd, result_file = tempfile.mkstemp(prefix='aruco_calib_', suffix='.json')
+    os.close(fd)
+    try:
+        completed = subprocess.run(
+            [sys.executable, '-m', 'src.vision.aruco_calibration'] + args + ['--result-file', result_file],
+            cwd=PROJECT_ROOT
+        )
+        with open(result_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        if content:
+            result = json.loads(content)
+        else:
+            result = {'ok': False, 'error': f'Código de salida {completed.returncode}',
+                      'mensaje': 'La calibración terminó sin resultado'}
+    except Exception as e:
+        result = {'ok': False, 'error': str(e), 'mensaje': 'Error ejecutando la calibración'}
+    finally:
+        try:
+            os.remove(result_file)
+        except OSError:
+            pass
+
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        job.update(state='done' if result.get('ok') else 'error', finished_at=time.time(), result=result)
+        job = dict(job)
+
+    print(f"[aruco_calib] {'✅' if job['state'] == 'done' else '❌'} Calibración {job_id} terminada ({job['state']})")
+    if on_done is not None:
+        try:
+            on_done(job)
+        except Exception as e:
+            print(f"[aruco_calib] ⚠️ Error en callback de calibración: {e}")
+
+
+def get_batch_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Estado de un trabajo: {'job_id', 'source', 'state', 'started_at', 'finished_at', 'result'} o None"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+# ============================================================
+# LÍNEA DE COMANDOS
+# ============================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Calibración offline de ArUcos Base/Tool")
+    parser.add_argument('source', help="Directorio de imágenes o archivo de video")
+    parser.add_argument('--config', default=CONFIG_FILE, help="Ruta de config.json")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos del pool")
+    parser.add_argument('--max-frames', type=int, default=None, help="Máximo de frames a procesar")
+    parser.add_argument('--stride', type=int, default=1, help="Procesar 1 de cada N frames")
+    parser.add_argument('--save', action='store_true', help="Escribir saved_reference en config.json")
+    parser.add_argument('--result-file', default=None, help="Escribir el resultado completo (JSON) en este archivo")
+    args = parser.parse_args(argv)
+
+    result = calibrate_batch(args.source, workers=args.workers, max_frames=args.max_frames,
+                             stride=args.stride, save=args.save, config_file=args.config)
+    if args.result_file:
+        with open(args.result_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+    print(json.dumps({k: v for k, v in result.items() if k != 'ok'}, indent=2, ensure_ascii=False))
+    return 0 if result.get('ok') else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -14,11 +14,18 @@ import numpy as np
 from typing import Dict, Any, Optional
 import sys
 import os
+import threading
+import time
 
 # Agregar lib al path para importar la librería genérica
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'lib'))
 
-from aruco import detect_arucos_with_config, get_available_dictionaries, get_available_marker_sizes
+from aruco import (detect_arucos_with_config, detect_arucos_in_roi, detect_arucos_multi,
+                   get_corners_bounding_box, compute_marker_geometry,
+                   get_available_dictionaries, get_available_marker_sizes)
+from src.vision.frame_context import get_gray, get_frame
+from src.vision.undistortion import distort_points, undistort_points
+from src.vision import rectification
 
 # ============================================================
 # CONFIGURACIÓN ESPECÍFICA DEL PROYECTO
@@ -33,6 +40,26 @@ OTHER_COLOR = (255, 255, 0)  # Cian para otros
 FRAME_TEMP_NAME = "base_frame_temp"
 TOOL_TEMP_NAME = "tool_frame_temp"
 
+# Referencia guardada: verificación periódica de deriva
+SAVED_REFERENCE_VERIFY_INTERVAL_S = 30.0   # Segundos entre verificaciones automáticas
+SAVED_REFERENCE_ROI_MARGIN = 0.5           # Margen de búsqueda (fracción del lado del marcador)
+SAVED_REFERENCE_TOLERANCE = {
+    'center_px': 8.0,    # Desplazamiento máximo del centro
+    'angle_deg': 1.5,    # Rotación máxima
+    'scale_pct': 2.0     # Variación máxima de px_per_mm (%)
+}
+
+# Estado de la referencia guardada (compartido entre requests)
+_saved_reference_lock = threading.Lock()
+_saved_reference_state = {
+    'last_verification': 0.0,
+    'drift_detected': False,
+    'last_check': None,
+    'fast_path_hits': 0,
+    'verifications': 0,
+    'full_detections': 0
+}
+
 def scale_detection_results(result: Dict[str, Any], scale_factor: float) -> Dict[str, Any]:
     """
     Escala las coordenadas de un resultado de detección de ArUcos.
@@ -66,19 +93,25 @@ def scale_detection_results(result: Dict[str, Any], scale_factor: float) -> Dict
 
 def detect_arucos_in_image(image: np.ndarray, frame_aruco_id: int, tool_aruco_id: int, 
                           frame_marker_size_mm: float = 70.0, tool_marker_size_mm: float = 50.0,
-                          dictionary_id: int = 50, marker_bits: int = 4, scale_factor: float = 1.0) -> Dict[str, Any]:
+                          dictionary_id: int = 50, marker_bits: int = 4, scale_factor: float = 1.0,
+                          tool_dictionary_id: Optional[int] = None, tool_marker_bits: Optional[int] = None) -> Dict[str, Any]:
     """
     Detectar ArUcos en imagen usando configuración específica del proyecto.
     
+    Si Frame y Tool usan diccionarios distintos, ambos se escanean en paralelo
+    sobre la misma imagen en grises (detect_arucos_multi).
+    
     Args:
-        image: Imagen en escala de grises
+        image: Imagen (BGR o escala de grises) o FrameContext (reutiliza su versión en grises)
         frame_aruco_id: ID del ArUco Frame
         tool_aruco_id: ID del ArUco Tool
         frame_marker_size_mm: Tamaño del marcador frame en mm
         tool_marker_size_mm: Tamaño del marcador tool en mm
-        dictionary_id: ID del diccionario ArUco
-        marker_bits: Tamaño de la matriz del marcador
+        dictionary_id: ID del diccionario ArUco (Frame, y Tool si no se indica otro)
+        marker_bits: Tamaño de la matriz del marcador (Frame, y Tool si no se indica otro)
         scale_factor: Factor de escala de la imagen (1.0 = 100%, 0.5 = 50%)
+        tool_dictionary_id: ID del diccionario del Tool (None = mismo que Frame)
+        tool_marker_bits: Tamaño de matriz del Tool (None = mismo que Frame)
         
     Returns:
         Diccionario con información de detección específica del proyecto.
@@ -104,8 +137,19 @@ def detect_arucos_in_image(image: np.ndarray, frame_aruco_id: int, tool_aruco_id
             }
         ]
         
-        # Usar librería genérica
-        result = detect_arucos_with_config(image, aruco_configs, dictionary_id, marker_bits)
+        if tool_dictionary_id is None:
+            tool_dictionary_id = dictionary_id
+        if tool_marker_bits is None:
+            tool_marker_bits = marker_bits
+        
+        # Usar librería genérica (sobre la versión en grises compartida)
+        if (tool_marker_bits, tool_dictionary_id) == (marker_bits, dictionary_id):
+            result = detect_arucos_with_config(get_gray(image), aruco_configs, dictionary_id, marker_bits)
+        else:
+            aruco_configs[0].update({'dictionary_id': dictionary_id, 'marker_bits': marker_bits})
+            aruco_configs[1].update({'dictionary_id': tool_dictionary_id, 'marker_bits': tool_marker_bits})
+            result = detect_arucos_multi(get_gray(image), aruco_configs)
+            print(f"[ArUcoManager] Detección multi-diccionario en {result['timing']['wall_s']:.3f}s")
         
         # Escalar coordenadas de vuelta a 100% si es necesario
         result = scale_detection_results(result, scale_factor)
@@ -401,6 +445,643 @@ def save_aruco_configuration(overlay_manager, cv2_frame, aruco_config):
         'objects_list': objects_to_save
     }
 
+# ============================================================
+# REFERENCIA GUARDADA (FAST PATH SIN DETECCIÓN)
+# ============================================================
+
+def detect_arucos_from_config(image: np.ndarray, aruco_config: Dict[str, Any], scale_factor: float = 1.0,
+                              postprocess: bool = True) -> Dict[str, Any]:
+    """
+    Detección completa de Frame y Tool usando los parámetros de config.json (sección 'aruco').
+
+    Args:
+        image: Imagen de la cámara o FrameContext
+        aruco_config: Sección 'aruco' de config.json
+        scale_factor: Factor de escala de la imagen (1.0 = 100%)
+        postprocess: False = esquinas crudas (píxeles de la imagen original, como
+                     saved_reference), sin undistort, rectificación ni filtro de pose
+
+    Returns:
+        Resultado con el mismo formato que detect_arucos_in_image()
+        (post-procesado según config: ver postprocess_detection)
+    """
+    base_config = aruco_config.get('base', {})
+    tool_config = aruco_config.get('tool', {})
+    result = detect_arucos_in_image(
+        image=image,
+        frame_aruco_id=base_config.get('reference_id', 0),
+        tool_aruco_id=tool_config.get('reference_id', 0),
+        frame_marker_size_mm=base_config.get('marker_size_mm', 70.0),
+        tool_marker_size_mm=tool_config.get('marker_size_mm', 50.0),
+        dictionary_id=base_config.get('dictionary_id', 50),
+        marker_bits=base_config.get('marker_bits', 4),
+        scale_factor=scale_factor,
+        tool_dictionary_id=tool_config.get('dictionary_id', base_config.get('dictionary_id', 50)),
+        tool_marker_bits=tool_config.get('marker_bits', base_config.get('marker_bits', 4))
+    )
+    if not postprocess:
+        return result
+    return postprocess_detection(result, image, aruco_config, scale_factor)
+
+def undistort_detection_result(detection_result: Dict[str, Any], image_size) -> Dict[str, Any]:
+    """
+    Corrige la distorsión de lente de las esquinas detectadas (solo puntos, sin remap
+    de la imagen) y recalcula centro, ángulo y px_per_mm sobre la geometría corregida.
+
+    Args:
+        detection_result: Resultado de detect_arucos_in_image() (coordenadas al 100%)
+        image_size: (width, height) de la imagen a resolución completa
+    """
+    for aruco_data in detection_result.get('detected_arucos', {}).values():
+        if aruco_data.get('undistorted'):
+            continue
+        _set_marker_corners(aruco_data, undistort_points(aruco_data['corners'], image_size))
+        aruco_data['undistorted'] = True
+
+    detection_result['undistorted'] = True
+    return detection_result
+
+def _set_marker_corners(aruco_data: Dict[str, Any], corners: np.ndarray) -> None:
+    """Reemplaza las esquinas de un marcador y recalcula centro, ángulo y px_per_mm (mismo criterio que la detección)"""
+    size_mm = (aruco_data.get('config') or {}).get('size_mm') or 42.0
+    edge = corners[1] - corners[0]
+    aruco_data['corners'] = corners.tolist()
+    aruco_data['center'] = (float(corners[:, 0].mean()), float(corners[:, 1].mean()))
+    aruco_data['angle_rad'] = float(np.arctan2(edge[1], edge[0]))
+    aruco_data['px_per_mm'] = float(np.linalg.norm(edge) / size_mm)
+
+def rectify_detection_result(detection_result: Dict[str, Any], image_size, aruco_config: Dict[str, Any],
+                             update_homography: bool = True) -> Dict[str, Any]:
+    """
+    Actualiza la homografía de rectificación con el ArUco base detectado (o la
+    referencia guardada) y lleva al plano rectificado la geometría de los marcadores
+    con correct_perspective habilitado.
+    Con update_homography=False se usa la homografía vigente sin modificarla.
+    """
+    detected_arucos = detection_result.get('detected_arucos', {})
+    if update_homography:
+        base_data = detected_arucos.get(detection_result.get('frame_aruco_id'))
+        base_corners = base_data['corners'] if base_data and detection_result.get('frame_detected') else None
+        if not rectification.prepare_from_config(aruco_config, image_size, base_corners,
+                                                 filter_params=get_pose_filter_params(aruco_config)):
+            return detection_result
+    elif rectification.get_homography() is None:
+        return detection_result
+
+    for name, id_key in (('base', 'frame_aruco_id'), ('tool', 'tool_aruco_id')):
+        aruco_data = detected_arucos.get(detection_result.get(id_key))
+        if aruco_data is None or aruco_data.get('rectified'):
+            continue
+        if not aruco_config.get(name, {}).get('correct_perspective', False):
+            continue
+        _set_marker_corners(aruco_data, rectification.rectify_points(aruco_data['corners']))
+        aruco_data['rectified'] = True
+
+    detection_result['rectified'] = True
+    return detection_result
+
+def pose_points_to_image(points, aruco_data: Dict[str, Any], image_size) -> np.ndarray:
+    """
+    Lleva puntos expresados en el espacio de la pose de un marcador (post-procesada:
+    rectificada y/o sin distorsión) a píxeles del frame crudo de la cámara, deshaciendo
+    las etapas que postprocess_detection() aplicó a ese marcador.
+
+    Args:
+        points: Puntos [[x, y], ...] en el espacio de aruco_data
+        aruco_data: Entrada de 'detected_arucos' (flags 'rectified' / 'undistorted')
+        image_size: (width, height) del frame a resolución completa
+
+    Returns:
+        Array Nx2 en píxeles del frame original
+    """
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if aruco_data.get('rectified'):
+        pts = rectification.unrectify_points(pts)
+    if aruco_data.get('undistorted'):
+        pts = distort_points(pts, image_size)
+    return pts
+
+def prepare_rectification(image, aruco_config: Dict[str, Any]) -> bool:
+    """
+    Deja lista la homografía de rectificación para el frame indicado.
+    Con referencia guardada habilitada, o si la homografía se actualizó hace menos de
+    aruco.rectification_refresh_s, no se ejecuta ninguna detección.
+
+    Returns:
+        True si la rectificación está habilitada y hay homografía vigente
+    """
+    if not rectification.is_rectification_enabled(aruco_config):
+        return False
+    h, w = get_frame(image).shape[:2]
+    if is_saved_reference_enabled(aruco_config):
+        return rectification.prepare_from_config(aruco_config, (w, h), use_saved_reference=True)
+    age_s = rectification.get_homography_age()
+    refresh_s = float(aruco_config.get('rectification_refresh_s', rectification.REFRESH_S))
+    if age_s is not None and age_s < refresh_s and rectification.get_rectification_status()['image_size'] == (w, h):
+        return True
+    detect_arucos_from_config(image, aruco_config)
+    return rectification.get_homography() is not None
+
+def postprocess_detection(detection_result: Dict[str, Any], image, aruco_config: Dict[str, Any],
+                          scale_factor: float = 1.0, update_state: bool = True) -> Dict[str, Any]:
+    """
+    Aplica las etapas opcionales configuradas en la sección 'aruco' de config.json:
+    - aruco.undistort: corrección de distorsión de las esquinas (camera_calibration.json)
+    - aruco.base/tool.correct_perspective: rectificación de perspectiva desde el ArUco base
+    - aruco.pose_filter.enabled: filtro temporal de pose
+
+    Con update_state=False solo se llevan las esquinas al mismo espacio que la detección
+    completa (homografía vigente, sin actualizarla ni alimentar el filtro de pose): para
+    mediciones que se comparan contra la referencia guardada.
+    """
+    h, w = get_frame(image).shape[:2]
+    image_size = (round(w / scale_factor), round(h / scale_factor))
+    if aruco_config.get('undistort', False):
+        undistort_detection_result(detection_result, image_size)
+    if rectification.is_rectification_enabled(aruco_config):
+        rectify_detection_result(detection_result, image_size, aruco_config, update_homography=update_state)
+    if update_state and is_pose_filter_enabled(aruco_config):
+        apply_pose_filter(detection_result, aruco_config)
+    return detection_result
+
+def _saved_reference_markers(aruco_config: Dict[str, Any]) -> list:
+    """
+    Devuelve [(nombre, config_marcador, saved_reference)] para Base y Tool.
+    Solo incluye marcadores con referencia guardada completa (esquinas y px_per_mm).
+    """
+    markers = []
+    for marker_name in ('base', 'tool'):
+        marker_config = aruco_config.get(marker_name, {})
+        saved_ref = marker_config.get('saved_reference') or {}
+        if saved_ref.get('corners') and saved_ref.get('px_per_mm'):
+            markers.append((marker_name, marker_config, saved_ref))
+    return markers
+
+def is_saved_reference_enabled(aruco_config: Dict[str, Any]) -> bool:
+    """
+    Verifica si la pose guardada puede usarse en lugar de la detección.
+
+    Requiere referencia guardada para Base y Tool, y que esté habilitada con el
+    flag global 'use_saved_reference' o con el flag de cada marcador.
+    """
+    markers = _saved_reference_markers(aruco_config)
+    if len(markers) < 2:
+        return False
+    if aruco_config.get('use_saved_reference', False):
+        return True
+    return all(saved_ref.get('use_saved_reference', False) for _, _, saved_ref in markers)
+
+def _aruco_data_from_saved_reference(marker_name: str, marker_config: Dict[str, Any], saved_ref: Dict[str, Any]) -> Dict[str, Any]:
+    """Construye una entrada de 'detected_arucos' a partir de la referencia guardada"""
+    corners = [[float(c[0]), float(c[1])] for c in saved_ref['corners']]
+    center = saved_ref.get('center') or np.mean(np.array(corners), axis=0).tolist()
+
+    angle_deg = saved_ref.get('angle_deg')
+    if angle_deg is None:
+        # Mismo criterio que la detección: ángulo del borde esquina[0] → esquina[1]
+        angle_deg = np.degrees(np.arctan2(corners[1][1] - corners[0][1], corners[1][0] - corners[0][0]))
+
+    is_base = marker_name == 'base'
+    return {
+        'center': (float(center[0]), float(center[1])),
+        'angle_rad': float(np.radians(angle_deg)),
+        'corners': corners,
+        'px_per_mm': float(saved_ref['px_per_mm']),
+        'config': {
+            'id': marker_config.get('reference_id', 0),
+            'name': 'frame' if is_base else 'tool',
+            'size_mm': marker_config.get('marker_size_mm', 70.0 if is_base else 50.0),
+            'color': FRAME_COLOR if is_base else TOOL_COLOR
+        }
+    }
+
+def build_detection_from_saved_reference(aruco_config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Construye un resultado de detección desde la pose guardada, sin procesar la imagen.
+
+    Args:
+        aruco_config: Sección 'aruco' de config.json
+
+    Returns:
+        Resultado con el mismo formato que detect_arucos_in_image()
+        (píxeles de la imagen original, como la referencia guardada)
+    """
+    frame_aruco_id = aruco_config.get('base', {}).get('reference_id', 0)
+    tool_aruco_id = aruco_config.get('tool', {}).get('reference_id', 0)
+
+    detected_arucos = {}
+    for marker_name, marker_config, saved_ref in _saved_reference_markers(aruco_config):
+        marker_id = marker_config.get('reference_id', 0)
+        detected_arucos[marker_id] = _aruco_data_from_saved_reference(marker_name, marker_config, saved_ref)
+
+    return {
+        'detected_arucos': detected_arucos,
+        'detected_ids': list(detected_arucos.keys()),
+        'frame_detected': frame_aruco_id in detected_arucos,
+        'tool_detected': tool_aruco_id in detected_arucos,
+        'frame_aruco_id': frame_aruco_id,
+        'tool_aruco_id': tool_aruco_id,
+        'source': 'saved_reference'
+    }
+
+def verify_saved_reference(image: np.ndarray, aruco_config: Dict[str, Any],
+                           tolerance: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Verificación económica de la pose guardada.
+
+    Busca cada marcador solo en la región de sus esquinas guardadas (más un margen)
+    y compara centro, ángulo y escala contra la referencia. La referencia está en
+    píxeles de la imagen original (como la guarda /api/aruco/save_config), así que
+    la medición se compara sin post-procesar: crudo contra crudo.
+
+    Args:
+        image: Imagen de la cámara o FrameContext
+        aruco_config: Sección 'aruco' de config.json
+        tolerance: Tolerancias opcionales {'center_px', 'angle_deg', 'scale_pct'}
+
+    Returns:
+        Dict con {'within_tolerance': bool, 'markers': {base/tool: deriva medida}, 'tolerance'}
+    """
+    tol = dict(SAVED_REFERENCE_TOLERANCE)
+    tol.update(aruco_config.get('saved_reference_tolerance') or {})
+    if tolerance:
+        tol.update(tolerance)
+
+    gray = get_gray(image)
+
+    checks = {}
+    within_tolerance = True
+
+    for marker_name, marker_config, saved_ref in _saved_reference_markers(aruco_config):
+        saved = _aruco_data_from_saved_reference(marker_name, marker_config, saved_ref)
+        marker_id = saved['config']['id']
+        side_px = saved['px_per_mm'] * saved['config']['size_mm']
+        roi = get_corners_bounding_box(saved['corners'], side_px * SAVED_REFERENCE_ROI_MARGIN)
+
+        result = detect_arucos_in_roi(
+            gray, roi, [saved['config']],
+            marker_config.get('dictionary_id', 50),
+            marker_config.get('marker_bits', 4)
+        )
+        measured = result.get('detected_arucos', {}).get(marker_id)
+
+        if measured is None:
+            checks[marker_name] = {'found': False, 'within_tolerance': False, 'roi': result.get('roi', roi)}
+            within_tolerance = False
+            continue
+
+        center_px = float(np.hypot(measured['center'][0] - saved['center'][0],
+                                   measured['center'][1] - saved['center'][1]))
+        angle_deg = float(abs((np.degrees(measured['angle_rad'] - saved['angle_rad']) + 180.0) % 360.0 - 180.0))
+        scale_pct = float(abs(measured['px_per_mm'] / saved['px_per_mm'] - 1.0) * 100.0)
+        marker_ok = (center_px <= tol['center_px'] and
+                     angle_deg <= tol['angle_deg'] and
+                     scale_pct <= tol['scale_pct'])
+
+        checks[marker_name] = {
+            'found': True,
+            'within_tolerance': marker_ok,
+            'center_px': center_px,
+            'angle_deg': angle_deg,
+            'scale_pct': scale_pct,
+            'roi': result.get('roi', roi)
+        }
+        within_tolerance = within_tolerance and marker_ok
+
+    return {
+        'within_tolerance': within_tolerance and len(checks) > 0,
+        'markers': checks,
+        'tolerance': tol,
+        'timestamp': time.time()
+    }
+
+def _postprocess_saved_reference(result: Dict[str, Any], image, aruco_config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Lleva la pose guardada (píxeles originales) al mismo espacio que la detección
+    completa: homografía desde la referencia guardada y luego undistort/rectificación
+    de las esquinas. No alimenta el filtro de pose (la referencia es constante).
+    """
+    prepare_rectification(image, aruco_config)
+    return postprocess_detection(result, image, aruco_config, update_state=False)
+
+def detect_arucos_with_saved_reference(image: np.ndarray, aruco_config: Dict[str, Any],
+                                       force_verify: bool = False) -> Dict[str, Any]:
+    """
+    Detección de Frame y Tool priorizando la pose guardada.
+
+    - Si la referencia guardada está habilitada, los marcos se construyen desde ella (costo cero).
+    - Cada SAVED_REFERENCE_VERIFY_INTERVAL_S (o con force_verify) se verifica solo la región guardada.
+    - Solo si la deriva supera la tolerancia se ejecuta la detección completa; con la deriva
+      confirmada se sigue directo a la detección completa (sin verificar) hasta que una
+      verificación periódica vuelva a pasar.
+
+    Args:
+        image: Imagen de la cámara o FrameContext
+        aruco_config: Sección 'aruco' de config.json
+        force_verify: Forzar la verificación de deriva en esta llamada
+
+    Returns:
+        Resultado con el formato de detect_arucos_in_image() más 'source'
+        ('saved_reference', 'saved_reference_verified', 'full_detection') y 'verification' si se verificó
+    """
+    if not is_saved_reference_enabled(aruco_config):
+        result = detect_arucos_from_config(image, aruco_config)
+        result['source'] = 'full_detection'
+        return result
+
+    interval = aruco_config.get('saved_reference_verify_interval_s', SAVED_REFERENCE_VERIFY_INTERVAL_S)
+    now = time.time()
+
+    with _saved_reference_lock:
+        periodic_due = interval is not None and interval >= 0 and now - _saved_reference_state['last_verification'] >= interval
+        needs_check = force_verify or periodic_due
+        drift_detected = _saved_reference_state['drift_detected']
+        if not needs_check:
+            _saved_reference_state['full_detections' if drift_detected else 'fast_path_hits'] += 1
+
+    if not needs_check and drift_detected:
+        # Deriva confirmada: detección completa directa hasta la próxima verificación
+        result = detect_arucos_from_config(image, aruco_config)
+        result['source'] = 'full_detection'
+        return result
+    if not needs_check:
+        return _postprocess_saved_reference(build_detection_from_saved_reference(aruco_config), image, aruco_config)
+
+    verification = verify_saved_reference(image, aruco_config)
+    drift = not verification['within_tolerance']
+
+    with _saved_reference_lock:
+        _saved_reference_state['last_verification'] = now
+        _saved_reference_state['verifications'] += 1
+        _saved_reference_state['drift_detected'] = drift
+        _saved_reference_state['last_check'] = verification
+        if drift:
+            _saved_reference_state['full_detections'] += 1
+
+    if not drift:
+        print(f"[ArUcoManager] ✓ Referencia guardada verificada (dentro de tolerancia)")
+        result = _postprocess_saved_reference(build_detection_from_saved_reference(aruco_config), image, aruco_config)
+        result['source'] = 'saved_reference_verified'
+        result['verification'] = verification
+        return result
+
+    print(f"[ArUcoManager] ⚠️ Deriva sobre la referencia guardada: {verification['markers']} - detección completa")
+    result = detect_arucos_from_config(image, aruco_config)
+    result['source'] = 'full_detection'
+    result['verification'] = verification
+    return result
+
+def get_saved_reference_status() -> Dict[str, Any]:
+    """Devuelve contadores y último resultado de verificación de la referencia guardada"""
+    with _saved_reference_lock:
+        return dict(_saved_reference_state)
+
+def reset_saved_reference_state() -> None:
+    """Fuerza una verificación en la próxima llamada (p. ej. tras guardar una nueva referencia)"""
+    with _saved_reference_lock:
+        _saved_reference_state['last_verification'] = 0.0
+        _saved_reference_state['drift_detected'] = False
+        _saved_reference_state['last_check'] = None
+
+# ============================================================
+# FILTRO TEMPORAL DE POSE
+# ============================================================
+
+# Parámetros por defecto (sobrescribibles desde config.json → aruco.pose_filter)
+POSE_FILTER_DEFAULTS = {
+    'enabled': False,
+    'alpha': 0.3,                   # Peso de la medición nueva en el suavizado exponencial
+    'max_center_jump_px': 15.0,     # Saltos mayores se consideran atípicos
+    'max_angle_jump_deg': 3.0,
+    'max_scale_jump_pct': 3.0,
+    'max_edge_spread_pct': 15.0,    # Diferencia máxima entre bordes del marcador (detección deformada)
+    'reset_after_rejections': 5,    # Atípicos consecutivos que indican un movimiento real → reiniciar
+    'min_samples': 5,               # Muestras para alcanzar confianza plena
+    'max_age_s': 10.0               # Sin actualizaciones en este tiempo → confianza 0
+}
+
+# Referencias de dispersión para la confianza (dispersión igual a la referencia → e^-1)
+POSE_CONFIDENCE_REFERENCE = {'center_px': 1.0, 'angle_deg': 0.5, 'scale_pct': 0.5}
+
+
+def _wrap_angle(angle_rad: float) -> float:
+    """Normaliza un ángulo a (-π, π]"""
+    return float((angle_rad + np.pi) % (2 * np.pi) - np.pi)
+
+
+class MarkerPoseFilter:
+    """
+    Suavizado exponencial de la pose de un marcador (centro, ángulo, px_per_mm)
+    con rechazo de atípicos y estimación de dispersión para la confianza.
+    """
+
+    def __init__(self, marker_id: int, params: Dict[str, Any]):
+        self.marker_id = marker_id
+        self.params = params
+        self.reset()
+
+    def reset(self) -> None:
+        """Descarta el estado acumulado"""
+        self.center = None
+        self.angle_rad = 0.0
+        self.px_per_mm = 0.0
+        self.var_center = 0.0     # px²
+        self.var_angle = 0.0      # grados²
+        self.var_scale = 0.0      # %²
+        self.samples = 0
+        self.rejected_streak = 0
+        self.rejected_total = 0
+        self.last_update = 0.0
+
+    def _init_from(self, geometry: Dict[str, Any]) -> None:
+        self.reset()
+        self.center = np.array(geometry['center'], dtype=float)
+        self.angle_rad = geometry['angle_rad']
+        self.px_per_mm = geometry['px_per_mm']
+        self.samples = 1
+        self.last_update = time.time()
+
+    def update(self, geometry: Dict[str, Any]) -> bool:
+        """
+        Incorpora una medición (salida de compute_marker_geometry).
+        Returns: True si se aceptó, False si se rechazó como atípica
+        """
+        p = self.params
+        if self.center is None:
+            self._init_from(geometry)
+            return True
+
+        d_center = float(np.hypot(*(np.array(geometry['center']) - self.center)))
+        d_angle = _wrap_angle(geometry['angle_rad'] - self.angle_rad)
+        d_scale_pct = (geometry['px_per_mm'] / self.px_per_mm - 1.0) * 100.0 if self.px_per_mm else 0.0
+
+        outlier = (d_center > p['max_center_jump_px'] or
+                   abs(np.degrees(d_angle)) > p['max_angle_jump_deg'] or
+                   abs(d_scale_pct) > p['max_scale_jump_pct'] or
+                   geometry.get('edge_spread_pct', 0.0) > p['max_edge_spread_pct'])
+
+        if outlier:
+            self.rejected_streak += 1
+            self.rejected_total += 1
+            if self.rejected_streak >= p['reset_after_rejections']:
+                # Atípicos persistentes: el marcador se movió realmente
+                print(f"[ArUcoManager] 🔄 Filtro de pose {self.marker_id} reiniciado tras {self.rejected_streak} atípicos")
+                self._init_from(geometry)
+            return False
+
+        a = p['alpha']
+        self.center = self.center + a * (np.array(geometry['center']) - self.center)
+        self.angle_rad = _wrap_angle(self.angle_rad + a * d_angle)
+        self.px_per_mm = self.px_per_mm + a * (geometry['px_per_mm'] - self.px_per_mm)
+        self.var_center = (1 - a) * self.var_center + a * d_center ** 2
+        self.var_angle = (1 - a) * self.var_angle + a * np.degrees(d_angle) ** 2
+        self.var_scale = (1 - a) * self.var_scale + a * d_scale_pct ** 2
+        self.samples += 1
+        self.rejected_streak = 0
+        self.last_update = time.time()
+        return True
+
+    def pose(self) -> Optional[Dict[str, Any]]:
+        """Pose filtrada con su confianza (0-1), o None si aún no hay mediciones"""
+        if self.center is None:
+            return None
+
+        std_center = float(np.sqrt(self.var_center))
+        std_angle = float(np.sqrt(self.var_angle))
+        std_scale = float(np.sqrt(self.var_scale))
+        ref = POSE_CONFIDENCE_REFERENCE
+
+        warmup = min(1.0, self.samples / max(1, self.params['min_samples']))
+        stability = float(np.exp(-(std_center / ref['center_px'] +
+                                   std_angle / ref['angle_deg'] +
+                                   std_scale / ref['scale_pct']) / 3.0))
+        age_s = time.time() - self.last_update
+        confidence = 0.0 if age_s > self.params['max_age_s'] else warmup * stability
+
+        return {
+            'marker_id': self.marker_id,
+            'center': (float(self.center[0]), float(self.center[1])),
+            'angle_rad': self.angle_rad,
+            'angle_deg': float(np.degrees(self.angle_rad)),
+            'px_per_mm': float(self.px_per_mm),
+            'confidence': round(confidence, 3),
+            'samples': self.samples,
+            'rejected_total': self.rejected_total,
+            'std_center_px': std_center,
+            'std_angle_deg': std_angle,
+            'std_scale_pct': std_scale,
+            'age_s': age_s
+        }
+
+
+# Filtros por ID de marcador (compartidos entre requests)
+_pose_filters: Dict[int, MarkerPoseFilter] = {}
+_pose_filters_lock = threading.Lock()
+
+
+def get_pose_filter_params(aruco_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Parámetros efectivos del filtro (defaults + config.json → aruco.pose_filter)"""
+    params = dict(POSE_FILTER_DEFAULTS)
+    params.update((aruco_config or {}).get('pose_filter') or {})
+    return params
+
+
+def is_pose_filter_enabled(aruco_config: Optional[Dict[str, Any]]) -> bool:
+    """Indica si el filtro temporal de pose está habilitado en la configuración"""
+    return bool(get_pose_filter_params(aruco_config).get('enabled'))
+
+
+def apply_pose_filter(detection_result: Dict[str, Any], aruco_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Alimenta el filtro de cada marcador Frame/Tool detectado y sustituye su pose
+    por la filtrada.
+
+    La geometría se mide con los cuatro bordes (compute_marker_geometry). En cada
+    entrada de 'detected_arucos' se reemplazan center/angle_rad/px_per_mm por los
+    valores filtrados y las esquinas se llevan a esa pose (ver _corners_for_pose), de
+    modo que contorno, ejes y bounding box coinciden con la pose filtrada; la medición
+    (incluidas las esquinas) se conserva en 'raw' y se añade 'pose_confidence'.
+    El resultado recibe además 'filtered_poses' {frame/tool: pose}.
+
+    Args:
+        detection_result: Resultado de detect_arucos_in_image()
+        aruco_config: Sección 'aruco' de config.json (parámetros del filtro)
+
+    Returns:
+        El mismo detection_result, modificado
+    """
+    params = get_pose_filter_params(aruco_config)
+    detected_arucos = detection_result.get('detected_arucos', {})
+    filtered_poses = {}
+
+    for name, id_key in (('frame', 'frame_aruco_id'), ('tool', 'tool_aruco_id')):
+        marker_id = detection_result.get(id_key)
+        aruco_data = detected_arucos.get(marker_id)
+        if aruco_data is None or not detection_result.get(f'{name}_detected'):
+            continue
+
+        size_mm = (aruco_data.get('config') or {}).get('size_mm')
+        if not size_mm:
+            continue
+        geometry = compute_marker_geometry(aruco_data['corners'], size_mm)
+
+        with _pose_filters_lock:
+            pose_filter = _pose_filters.get(marker_id)
+            if pose_filter is None:
+                pose_filter = _pose_filters[marker_id] = MarkerPoseFilter(marker_id, params)
+            pose_filter.params = params
+            accepted = pose_filter.update(geometry)
+            pose = pose_filter.pose()
+
+        pose['accepted'] = accepted
+        aruco_data['raw'] = {
+            'center': aruco_data['center'],
+            'angle_rad': aruco_data['angle_rad'],
+            'px_per_mm': aruco_data['px_per_mm'],
+            'corners': aruco_data['corners'],
+            'geometry': geometry
+        }
+        aruco_data['corners'] = _corners_for_pose(aruco_data['corners'], geometry, pose).tolist()
+        aruco_data['center'] = pose['center']
+        aruco_data['angle_rad'] = pose['angle_rad']
+        aruco_data['px_per_mm'] = pose['px_per_mm']
+        aruco_data['pose_confidence'] = pose['confidence']
+        filtered_poses[name] = pose
+
+    detection_result['filtered_poses'] = filtered_poses
+    return detection_result
+
+
+def _corners_for_pose(corners, geometry: Dict[str, Any], pose: Dict[str, Any]) -> np.ndarray:
+    """
+    Lleva las esquinas medidas a la pose filtrada con una semejanza (traslación, rotación
+    y escala de la medición a la pose): conservan la forma del contorno y su centro,
+    ángulo y escala son los filtrados.
+    """
+    pts = np.asarray(corners, dtype=np.float64).reshape(-1, 2)
+    scale = pose['px_per_mm'] / geometry['px_per_mm'] if geometry['px_per_mm'] else 1.0
+    d_angle = _wrap_angle(pose['angle_rad'] - geometry['angle_rad'])
+    rotation = scale * np.array([[np.cos(d_angle), -np.sin(d_angle)], [np.sin(d_angle), np.cos(d_angle)]])
+    return (pts - geometry['center']) @ rotation.T + pose['center']
+
+def get_filtered_pose(marker_id: int) -> Optional[Dict[str, Any]]:
+    """Última pose filtrada de un marcador (None si no hay filtro para ese ID)"""
+    with _pose_filters_lock:
+        pose_filter = _pose_filters.get(marker_id)
+        return pose_filter.pose() if pose_filter else None
+
+
+def get_pose_filter_status() -> Dict[int, Optional[Dict[str, Any]]]:
+    """Poses filtradas de todos los marcadores seguidos"""
+    with _pose_filters_lock:
+        return {marker_id: f.pose() for marker_id, f in _pose_filters.items()}
+
+
+def reset_pose_filters() -> None:
+    """Descarta el historial de todos los filtros (p. ej. tras cambiar marcadores o tamaños)"""
+    with _pose_filters_lock:
+        _pose_filters.clear()
+
 # ============================================================
 # FUNCIONES DE UTILIDAD ESPECÍFICAS
 # ============================================================
@@ -439,13 +1120,13 @@ def get_available_marker_sizes() -> Dict[int, str]:
 
 def render_overlay_with_arucos(overlay_manager, cv2_frame, frame_aruco_id, tool_aruco_id, 
                               frame_marker_size, tool_marker_size, center_x, center_y,
-                              show_frame, show_tool, show_center):
+                              show_frame, show_tool, show_center, aruco_config=None):
     """
     Renderizar overlay con ArUcos detectados - función principal para el endpoint /api/overlay/render
     
     Args:
         overlay_manager: Instancia global de OverlayManager
-        cv2_frame: Frame de la cámara
+        cv2_frame: Frame de la cámara o FrameContext
         frame_aruco_id: ID del ArUco Frame
         tool_aruco_id: ID del ArUco Tool
         frame_marker_size: Tamaño del marcador frame en mm
@@ -455,6 +1136,8 @@ def render_overlay_with_arucos(overlay_manager, cv2_frame, frame_aruco_id, tool_
         show_frame: Mostrar ArUco Frame
         show_tool: Mostrar ArUco Tool
         show_center: Mostrar centro del troquel
+        aruco_config: Sección 'aruco' de config.json (opcional). Si tiene la referencia
+                      guardada habilitada para los mismos IDs, se evita la detección completa
         
     Returns:
         Dict con resultado del renderizado
@@ -467,16 +1150,37 @@ def render_overlay_with_arucos(overlay_manager, cv2_frame, frame_aruco_id, tool_
         # Limpiar objetos existentes
         clear_aruco_objects(overlay_manager)
         
-        # Detectar ArUcos SIEMPRE (independiente de checkboxes)
-        detection_result = detect_arucos_in_image(
-            image=cv2_frame,
-            frame_aruco_id=frame_aruco_id,
-            tool_aruco_id=tool_aruco_id,
-            frame_marker_size_mm=frame_marker_size,
-            tool_marker_size_mm=tool_marker_size,
-            scale_factor=1.0  # Siempre 100% para overlays
+        # Usar la referencia guardada si está habilitada para los mismos IDs
+        use_saved = (
+            aruco_config is not None and
+            is_saved_reference_enabled(aruco_config) and
+            aruco_config.get('base', {}).get('reference_id') == frame_aruco_id and
+            aruco_config.get('tool', {}).get('reference_id') == tool_aruco_id
         )
         
+        if use_saved:
+            detection_result = detect_arucos_with_saved_reference(cv2_frame, aruco_config)
+            print(f"[ArUcoManager] Pose obtenida por: {detection_result.get('source')}")
+        else:
+            # Detectar ArUcos SIEMPRE (independiente de checkboxes)
+            # Los diccionarios de Base y Tool se toman de config.json si está disponible
+            base_config = (aruco_config or {}).get('base', {})
+            tool_config = (aruco_config or {}).get('tool', {})
+            detection_result = detect_arucos_in_image(
+                image=cv2_frame,
+                frame_aruco_id=frame_aruco_id,
+                tool_aruco_id=tool_aruco_id,
+                frame_marker_size_mm=frame_marker_size,
+                tool_marker_size_mm=tool_marker_size,
+                dictionary_id=base_config.get('dictionary_id', 50),
+                marker_bits=base_config.get('marker_bits', 4),
+                scale_factor=1.0,  # Siempre 100% para overlays
+                tool_dictionary_id=tool_config.get('dictionary_id'),
+                tool_marker_bits=tool_config.get('marker_bits')
+            )
+            if aruco_config is not None:
+                postprocess_detection(detection_result, cv2_frame, aruco_config)
+        
         # Crear marcos temporales si están detectados
         if detection_result and (is_frame_detected(detection_result) or is_tool_detected(detection_result)):
             create_temp_frames_from_arucos(overlay_manager, detection_result)
@@ -524,7 +1228,8 @@ def render_overlay_with_arucos(overlay_manager, cv2_frame, frame_aruco_id, tool_
             'overlay_objects': overlay_objects,
             'frame_detected': is_frame_detected(detection_result) if detection_result else False,
             'tool_detected': is_tool_detected(detection_result) if detection_result else False,
-            'has_objects': len(overlay_objects) > 0
+            'has_objects': len(overlay_objects) > 0,
+            'pose_source': detection_result.get('source', 'full_detection')
         }
         
     except Exception as e:
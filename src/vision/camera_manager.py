@@ -5,9 +5,10 @@ import re
 import sys
 import threading
 import time
-from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 
+from src import config_store
+
 # ============================================================
 # CONFIGURACIÓN GLOBAL
 # ============================================================
@@ -34,23 +35,12 @@ except ImportError:
 # ============================================================
 def load_config() -> dict:
     """Carga configuración desde config.json"""
-    if not Path(CONFIG_FILE).exists():
-        return {}
     try:
-        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return config_store.load(CONFIG_FILE)
     except Exception as e:
         print(f"[camera] Error cargando config: {e}")
         return {}
 
-def save_config(config: dict):
-    """Guarda configuración en config.json"""
-    try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        print(f"[camera] Error guardando config: {e}")
-
 # ============================================================
 # DETECCIÓN DE CÁMARAS (WINDOWS)
 # ============================================================
@@ -323,6 +313,23 @@ def disconnect_camera():
             _cam_resolution = None
             print("[camera] Cámara desconectada")
 
+def is_connected() -> bool:
+    """True si hay una cámara abierta (sin tomar el lock de captura)"""
+    cap = _cap
+    try:
+        return cap is not None and cap.isOpened()
+    except Exception:
+        return False
+
+def get_camera_info() -> Dict:
+    """Estado de la cámara actual: {'connected', 'vid', 'pid', 'resolution'}"""
+    return {
+        'connected': is_connected(),
+        'vid': _cam_vid,
+        'pid': _cam_pid,
+        'resolution': list(_cam_resolution) if _cam_resolution else None
+    }
+
 def get_frame() -> Optional[bytes]:
     """
     Captura un frame de la cámara y lo devuelve como JPEG para video en vivo.
@@ -375,6 +382,19 @@ def get_frame_raw():
                 print(f"[camera] Error capturando frame raw: {e}")
             return None
 
+def get_frame_context():
+    """
+    Captura un frame y lo envuelve en un FrameContext para compartir
+    conversiones (grises, JPEG, etc.) entre las etapas del análisis.
+    Returns: FrameContext o None
+    """
+    frame = get_frame_raw()
+    if frame is None:
+        return None
+    
+    from src.vision.frame_context import FrameContext
+    return FrameContext(frame)
+
 # ============================================================
 # CONECTAR A CÁMARA GUARDADA
 # ============================================================
@@ -412,19 +432,20 @@ def connectToCamera() -> Tuple[bool, str]:
 
 def save_camera_config(vid: str, pid: str, name: str, width: Optional[int] = None, height: Optional[int] = None):
     """Guarda configuración de cámara en config.json por VID:PID"""
-    config = load_config()
-    
-    config["camera"] = {
+    camera = {
         "vid": vid,
         "pid": pid,
         "name": name
     }
     
     if width and height:
-        config["camera"]["preferred_resolution"] = {
+        camera["preferred_resolution"] = {
             "width": width,
             "height": height
         }
     
-    save_config(config)
+    try:
+        config_store.update_section("camera", camera, replace=True, path=CONFIG_FILE)
+    except Exception as e:
+        print(f"[camera] Error guardando config: {e}")
     print(f"[camera] Configuración guardada: {name} (VID_{vid}&PID_{pid}) @ {width}x{height}")
@@ -0,0 +1,234 @@
+# config_sync.py - Sincronización de la configuración del servidor de visión
+"""
+Config Sync - COMAU-VISION
+==========================
+
+Mantiene la configuración del servidor de visión (PATCH /config/) al día con
+config.json, juntas.json y las muescas de la junta seleccionada:
+
+- Construye la configuración remota deseada completa (aruco_config, troqueladora,
+  roi_rectangulo, lista_muescas_mm).
+- La compara con el último estado aceptado por el servidor y envía UN solo PATCH
+  con las secciones que cambiaron; si no cambió nada, no hay llamada.
+- Si el PATCH falla, se reintenta en segundo plano con espera creciente
+  (reconstruyendo la configuración deseada en cada intento).
+
+invalidate() olvida el estado aceptado (p. ej. al reiniciar el servidor de
+visión): la próxima sincronización envía la configuración completa.
+"""
+
+import copy
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from src import config_store
+from src.vision import vision_client
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+CONFIG_FILE = 'config.json'
+RETRY_DELAYS_S = (2.0, 5.0, 10.0, 30.0)     # Esperas entre reintentos (la última se repite)
+PATCH_TIMEOUT_S = 5
+
+_acked: Dict[str, Any] = {}                 # Última configuración aceptada por el servidor, por sección
+_muescas: Optional[List[Dict[str, Any]]] = None
+_desired_cache: Optional[tuple] = None      # ((marca config, marca juntas, ruta), secciones)
+_lock = threading.RLock()                   # Estado en memoria (nunca se mantiene durante un PATCH)
+_patch_lock = threading.Lock()              # Un PATCH a la vez: el estado aceptado sigue el orden de envío
+_epoch = 0                                  # Se incrementa con invalidate()
+_retry_thread: Optional[threading.Thread] = None
+_stop_event = threading.Event()
+_stats = {'patches': 0, 'skipped': 0, 'failures': 0, 'retries': 0, 'last_sync': None, 'last_error': None}
+
+# ============================================================
+# CONFIGURACIÓN DESEADA
+# ============================================================
+
+def _file_sections(config_path: str) -> Dict[str, Any]:
+    """
+    Secciones derivadas de config.json y juntas.json, cacheadas por la marca
+    (st_mtime_ns, tamaño) de config_store: un cambio dentro de la resolución de mtime
+    del sistema de archivos no deja la caché vieja si cambia el tamaño.
+    """
+    global _desired_cache
+    from src.vision.vision_manager import build_aruco_payload, build_roi_payload
+
+    juntas_path = os.path.join(os.path.dirname(config_path), 'juntas.json')
+    key = (config_store.get_stamp(config_path), config_store.get_stamp(juntas_path), config_path)
+    if _desired_cache is not None and _desired_cache[0] == key:
+        return _desired_cache[1]
+
+    config = config_store.load(config_path)
+    sections = dict(build_aruco_payload(config), **build_roi_payload(config, config_path))
+    _desired_cache = (key, sections)
+    return sections
+
+
+def build_desired_config(config_path: str = CONFIG_FILE) -> Dict[str, Any]:
+    """Configuración remota completa que debería tener el servidor de visión"""
+    desired = copy.deepcopy(_file_sections(config_path))
+    with _lock:
+        if _muescas is not None:
+            desired['lista_muescas_mm'] = copy.deepcopy(_muescas)
+    return desired
+
+
+def set_muescas(lista_muescas_mm: List[Dict[str, Any]]) -> None:
+    """Muescas de la junta seleccionada (las envía el panel de control)"""
+    global _muescas
+    with _lock:
+        _muescas = copy.deepcopy(lista_muescas_mm)
+
+
+def diff_config(desired: Dict[str, Any]) -> Dict[str, Any]:
+    """Secciones de desired que difieren del último estado aceptado"""
+    with _lock:
+        return {key: value for key, value in desired.items() if _acked.get(key) != value}
+
+# ============================================================
+# SINCRONIZACIÓN
+# ============================================================
+
+def _push(desired: Dict[str, Any], default_port: int, force: bool = False) -> Dict[str, Any]:
+    """
+    Diferencia + PATCH + registro del estado aceptado. Los PATCH se serializan con
+    _patch_lock; _lock solo se toma para leer y actualizar el estado, así get_status()
+    y set_muescas() no esperan a la red.
+
+    Returns:
+        {'changes': secciones enviadas ({} si no había cambios), 'response', 'error'}
+    """
+    with _patch_lock:
+        with _lock:
+            changes = copy.deepcopy(desired) if force else diff_config(desired)
+            epoch = _epoch
+        if not changes:
+            return {'changes': {}, 'response': None, 'error': None}
+
+        print(f"[config_sync] 🔧 PATCH /config/ con {sorted(changes)}")
+        try:
+            response = vision_client.patch('/config/', json=changes, timeout=PATCH_TIMEOUT_S,
+                                           default_port=default_port)
+            error = None if response.status_code == 200 else f'Error del servidor: {response.status_code}'
+        except requests.exceptions.RequestException as e:
+            response, error = None, f'Error de conexión: {e}'
+
+        with _lock:
+            if error is None:
+                if epoch == _epoch:     # Sin invalidate() en el medio (p. ej. reinicio del servidor)
+                    _acked.update(copy.deepcopy(changes))
+                _stats['patches'] += 1
+                _stats['last_sync'] = time.time()
+                _stats['last_error'] = None
+            else:
+                _stats['failures'] += 1
+                _stats['last_error'] = error
+    return {'changes': changes, 'response': response, 'error': error}
+
+
+def sync(config_path: str = CONFIG_FILE, default_port: int = vision_client.DEFAULT_PORT,
+         force: bool = False) -> Dict[str, Any]:
+    """
+    Envía al servidor de visión lo que cambió desde la última sincronización aceptada.
+
+    Args:
+        config_path: Ruta a config.json
+        default_port: Puerto si config.json no lo define
+        force: Enviar la configuración completa aunque no haya cambios
+
+    Returns:
+        {'ok', 'mensaje', 'changed': [secciones enviadas], 'config': respuesta del servidor o estado aceptado}
+        Si falla: {'ok': False, 'error', 'mensaje', 'changed', 'retrying': True}
+    """
+    try:
+        desired = build_desired_config(config_path)
+    except Exception as e:
+        print(f"[config_sync] ❌ Error construyendo la configuración: {e}")
+        return {'ok': False, 'error': str(e), 'mensaje': 'No se pudo leer la configuración', 'changed': []}
+
+    result = _push(desired, default_port, force)
+    changes, error = result['changes'], result['error']
+    if not changes:
+        with _lock:
+            _stats['skipped'] += 1
+            acked = copy.deepcopy(_acked)
+        return {'ok': True, 'mensaje': 'Servidor de visión ya sincronizado', 'changed': [], 'config': acked}
+
+    if error is None:
+        print(f"[config_sync] ✅ Configuración aplicada en el servidor de visión")
+        try:
+            remote = result['response'].json()
+        except ValueError:
+            with _lock:
+                remote = copy.deepcopy(_acked)
+        return {'ok': True, 'mensaje': 'Configuración aplicada correctamente',
+                'changed': sorted(changes), 'config': remote}
+
+    print(f"[config_sync] ❌ {error}; reintentando en segundo plano")
+    _start_retry(config_path, default_port)
+    return {'ok': False, 'error': error, 'mensaje': 'No se pudo configurar el servidor de visión',
+            'changed': sorted(changes), 'retrying': True}
+
+
+def _retry_loop(config_path: str, default_port: int) -> None:
+    global _retry_thread
+    attempt = 0
+    while not _stop_event.wait(RETRY_DELAYS_S[min(attempt, len(RETRY_DELAYS_S) - 1)]):
+        attempt += 1
+        with _lock:
+            _stats['retries'] += 1
+        try:
+            desired = build_desired_config(config_path)
+        except Exception as e:
+            print(f"[config_sync] ⚠️ Reintento {attempt}: error leyendo configuración: {e}")
+            continue
+        result = _push(desired, default_port)
+        if not result['changes']:
+            break
+        if result['error'] is None:
+            print(f"[config_sync] ✅ Configuración aplicada en el reintento {attempt}")
+            break
+    with _lock:
+        _retry_thread = None
+
+
+def _start_retry(config_path: str, default_port: int) -> None:
+    global _retry_thread
+    with _lock:
+        if _retry_thread is not None and _retry_thread.is_alive():
+            return
+        _stop_event.clear()
+        _retry_thread = threading.Thread(target=_retry_loop, args=(config_path, default_port),
+                                         daemon=True, name='ConfigSyncRetry')
+        _retry_thread.start()
+
+
+def invalidate() -> None:
+    """Olvida el estado aceptado: la próxima sincronización envía todo"""
+    global _epoch
+    with _lock:
+        _acked.clear()
+        _epoch += 1
+
+
+def get_status() -> Dict[str, Any]:
+    """Estado de la sincronización: contadores, último error, secciones aceptadas y pendientes"""
+    with _lock:
+        status = dict(_stats)
+        status['acked_sections'] = sorted(_acked)
+        status['retrying'] = _retry_thread is not None and _retry_thread.is_alive()
+    try:
+        status['pending_sections'] = sorted(diff_config(build_desired_config()))
+    except Exception:
+        status['pending_sections'] = None
+    return status
+
+
+def stop() -> None:
+    """Detiene los reintentos en segundo plano"""
+    _stop_event.set()
@@ -0,0 +1,191 @@
+# frame_context.py - Contexto por frame con caché de representaciones derivadas
+"""
+Contexto compartido de un frame capturado para todo el camino de análisis.
+
+Un mismo frame pasa por varias etapas (detección ArUco, overlay, inferencia YOLO,
+envío al servidor de visión) y cada una necesitaba su propia conversión.
+FrameContext calcula cada representación derivada UNA sola vez, bajo demanda:
+
+- gray:            escala de grises
+- gray_bgr:        escala de grises en 3 canales (fondo de overlays)
+- downscaled(s):   versión reducida por factor de escala
+- pyramid(n):      nivel n de la pirámide gaussiana (pyrDown)
+- jpeg(q):         bytes JPEG a la calidad q
+- undistorted():   versión sin distorsión de lente (o solo una región)
+- rectified():     versión con perspectiva rectificada desde el ArUco base (o solo una región)
+
+Las representaciones devueltas se comparten entre etapas: NO modificarlas in-place
+(copiar antes de dibujar).
+"""
+
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    cv2 = None
+    OPENCV_AVAILABLE = False
+
+# ============================================================
+# ESTADO GLOBAL
+# ============================================================
+_seq_counter = itertools.count(1)
+_seq_lock = threading.Lock()
+
+
+def _next_seq() -> int:
+    """Devuelve el siguiente número de secuencia de frame (único en el proceso)"""
+    with _seq_lock:
+        return next(_seq_counter)
+
+
+# ============================================================
+# CONTEXTO DE FRAME
+# ============================================================
+class FrameContext:
+    """
+    Frame original más caché perezosa de sus representaciones derivadas.
+    Thread-safe: cada representación se calcula como máximo una vez.
+    """
+
+    def __init__(self, frame: np.ndarray, seq: Optional[int] = None, timestamp: Optional[float] = None):
+        """
+        Args:
+            frame: Imagen BGR de OpenCV
+            seq: Número de secuencia (si None se asigna uno nuevo)
+            timestamp: Momento de captura (si None se usa time.time())
+        """
+        self.frame = frame
+        self.seq = seq if seq is not None else _next_seq()
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self._cache: Dict[Any, Any] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def shape(self):
+        """Forma del frame original"""
+        return self.frame.shape
+
+    def _memo(self, key, compute: Callable[[], Any]):
+        """Obtiene una representación de la caché o la calcula una sola vez"""
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = compute()
+            return self._cache[key]
+
+    def cached_keys(self) -> list:
+        """Lista de representaciones ya calculadas (para diagnóstico)"""
+        with self._lock:
+            return list(self._cache.keys())
+
+    # --------------------------------------------------------
+    # Representaciones derivadas
+    # --------------------------------------------------------
+    @property
+    def gray(self) -> np.ndarray:
+        """Frame en escala de grises"""
+        def compute():
+            if self.frame.ndim == 2:
+                return self.frame
+            return cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+        return self._memo('gray', compute)
+
+    @property
+    def gray_bgr(self) -> np.ndarray:
+        """Escala de grises replicada en 3 canales (idéntico para BGR y RGB)"""
+        return self._memo('gray_bgr', lambda: cv2.cvtColor(self.gray, cv2.COLOR_GRAY2BGR))
+
+    def downscaled(self, scale: float, gray: bool = False) -> np.ndarray:
+        """
+        Versión reducida del frame.
+
+        Args:
+            scale: Factor de escala (0.5 = 50%)
+            gray: Reducir la versión en escala de grises en lugar de la color
+        """
+        source_key = 'gray' if gray else 'bgr'
+        if scale == 1.0:
+            return self.gray if gray else self.frame
+
+        def compute():
+            source = self.gray if gray else self.frame
+            return cv2.resize(source, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return self._memo(('downscaled', source_key, round(float(scale), 4)), compute)
+
+    def pyramid(self, level: int, gray: bool = False) -> np.ndarray:
+        """
+        Nivel de la pirámide gaussiana (cada nivel es la mitad del anterior).
+        Los niveles intermedios se reutilizan.
+        """
+        source_key = 'gray' if gray else 'bgr'
+        if level <= 0:
+            return self.gray if gray else self.frame
+        return self._memo(('pyramid', source_key, level),
+                          lambda: cv2.pyrDown(self.pyramid(level - 1, gray)))
+
+    def jpeg(self, quality: int = 90) -> bytes:
+        """Frame codificado como JPEG a la calidad indicada"""
+        def compute():
+            ok, buffer = cv2.imencode('.jpg', self.frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+            if not ok:
+                raise RuntimeError("Error codificando JPEG")
+            return buffer.tobytes()
+        return self._memo(('jpeg', int(quality)), compute)
+
+    def undistorted(self) -> np.ndarray:
+        """Frame sin distorsión de lente (mapas cacheados de camera_calibration.json)"""
+        from src.vision.undistortion import undistort_frame
+        return self._memo('undistorted', lambda: undistort_frame(self.frame))
+
+    def undistorted_roi(self, roi) -> np.ndarray:
+        """Región (x1, y1, x2, y2) de la imagen sin distorsión, sin corregir el frame completo"""
+        from src.vision.undistortion import undistort_roi
+        roi = tuple(int(v) for v in roi)
+        return self._memo(('undistorted_roi', roi), lambda: undistort_roi(self.frame, roi))
+
+    def rectified(self) -> np.ndarray:
+        """Frame rectificado con la homografía vigente (ver rectification.py)"""
+        from src.vision import rectification
+        version = rectification.get_rectification_status()['rebuilds']
+        return self._memo(('rectified', version), lambda: rectification.rectify_frame(self.frame))
+
+    def rectified_roi(self, roi) -> np.ndarray:
+        """Región (x1, y1, x2, y2) del frame rectificado, sin rectificar el frame completo"""
+        from src.vision import rectification
+        roi = tuple(int(v) for v in roi)
+        version = rectification.get_rectification_status()['rebuilds']
+        return self._memo(('rectified_roi', version, roi), lambda: rectification.rectify_roi(self.frame, roi))
+
+
+# ============================================================
+# FUNCIONES DE CONVENIENCIA
+# ============================================================
+def ensure_context(image) -> Optional[FrameContext]:
+    """Envuelve un numpy array en FrameContext (o devuelve el contexto recibido)"""
+    if image is None or isinstance(image, FrameContext):
+        return image
+    return FrameContext(image)
+
+
+def get_frame(image) -> Optional[np.ndarray]:
+    """Devuelve el frame original tanto de un numpy array como de un FrameContext"""
+    if isinstance(image, FrameContext):
+        return image.frame
+    return image
+
+
+def get_gray(image) -> Optional[np.ndarray]:
+    """Devuelve la versión en grises, reutilizando la del contexto si existe"""
+    if image is None:
+        return None
+    if isinstance(image, FrameContext):
+        return image.gray
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
@@ -0,0 +1,222 @@
+# frame_transport.py - Envío de frames al servidor de visión (memoria compartida o JPEG/HTTP)
+"""
+Frame Transport - COMAU-VISION
+==============================
+
+Cuando el servidor de visión corre en la misma máquina (vision_server_ip local),
+el frame crudo se escribe en un anillo de memoria compartida y por HTTP viaja
+solo un descriptor chico:
+
+    POST /process_shm/  {"shm_name", "shape", "dtype", "seq", "offset"}
+
+Se evita la codificación JPEG, la decodificación del lado del servidor y copiar
+varios MB por análisis. Para servidores remotos, o si el servidor no implementa
+/process_shm/ (404/405/501), se usa el camino de siempre: JPEG multipart a /process/.
+Si el servidor no pudo leer el frame de la memoria compartida (409: slot reescrito o
+segmento inaccesible) ese frame se reenvía por JPEG; varios 409 seguidos desactivan
+el transporte por memoria compartida como un 404.
+
+Formato de cada slot del anillo:
+    [0:8]   número de secuencia (int64) del frame escrito
+    [8:...] píxeles del frame (C-contiguo)
+
+El lector (read_frame) comprueba la secuencia antes y después de copiar: si el
+slot se reescribió mientras tanto, descarta la lectura.
+
+Configuración (config.json → vision.shm_transport): true/false (default true)
+"""
+
+import itertools
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+import requests
+
+from src.vision import vision_client
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+RING_SLOTS = 3                          # Frames en vuelo antes de reutilizar un slot
+HEADER_BYTES = 8                        # Número de secuencia al inicio de cada slot
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+UNSUPPORTED_RETRY_S = 60.0              # Tras un 404/405/501 en /process_shm/, reintentar después de esto
+MAX_SHM_CONFLICTS = 3                   # 409 seguidos de /process_shm/ que se tratan como no soportado
+DEFAULT_TIMEOUT_S = 5
+
+_ring: List[shared_memory.SharedMemory] = []
+_ring_slot_bytes = 0
+_ring_lock = threading.Lock()
+_seq = itertools.count(1)
+
+_shm_unsupported_until = 0.0
+_shm_conflicts = 0                      # 409 seguidos de /process_shm/
+_stats = {'shm': 0, 'jpeg': 0, 'shm_fallbacks': 0, 'shm_conflicts': 0}
+_stats_lock = threading.Lock()
+
+# Segmentos abiertos por el lector (servidor de visión local), por nombre
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+_attached_lock = threading.Lock()
+
+# ============================================================
+# ANILLO (ESCRITOR)
+# ============================================================
+
+def _ensure_ring(nbytes: int) -> None:
+    """Crea (o agranda) los slots del anillo para frames de nbytes"""
+    global _ring, _ring_slot_bytes
+    if _ring and _ring_slot_bytes >= nbytes + HEADER_BYTES:
+        return
+    _close_ring()
+    _ring_slot_bytes = nbytes + HEADER_BYTES
+    _ring = [shared_memory.SharedMemory(create=True, size=_ring_slot_bytes) for _ in range(RING_SLOTS)]
+    print(f"[frame_transport] 🧠 Anillo de {RING_SLOTS} slots de {_ring_slot_bytes / 1e6:.1f} MB creado")
+
+
+def _close_ring() -> None:
+    global _ring
+    for slot in _ring:
+        try:
+            slot.close()
+            slot.unlink()
+        except Exception:
+            pass
+    _ring = []
+
+
+def write_frame(frame: np.ndarray) -> Dict[str, Any]:
+    """
+    Copia el frame al siguiente slot del anillo.
+
+    Returns:
+        Descriptor {'shm_name', 'shape', 'dtype', 'seq', 'offset'} para el lector
+    """
+    frame = np.ascontiguousarray(frame)
+    with _ring_lock:
+        _ensure_ring(frame.nbytes)
+        seq = next(_seq)
+        slot = _ring[seq % RING_SLOTS]
+        header = np.ndarray((1,), dtype=np.int64, buffer=slot.buf)
+        header[0] = 0   # Slot en escritura: el lector rechaza la secuencia 0
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=slot.buf, offset=HEADER_BYTES)[...] = frame
+        header[0] = seq
+    return {'shm_name': slot.name, 'shape': list(frame.shape), 'dtype': frame.dtype.str,
+            'seq': seq, 'offset': HEADER_BYTES}
+
+
+def close() -> None:
+    """Libera el anillo y los segmentos abiertos como lector"""
+    with _ring_lock:
+        _close_ring()
+    with _attached_lock:
+        for segment in _attached.values():
+            segment.close()
+        _attached.clear()
+
+# ============================================================
+# LECTOR
+# ============================================================
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    for slot in list(_ring):
+        if slot.name == name:
+            return slot   # Lector y escritor en el mismo proceso
+    with _attached_lock:
+        segment = _attached.get(name)
+        if segment is None:
+            try:
+                segment = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                # Python < 3.13: el resource_tracker borraría el segmento del escritor al salir
+                from multiprocessing import resource_tracker
+                segment = shared_memory.SharedMemory(name=name)
+                resource_tracker.unregister(segment._name, 'shared_memory')
+            _attached[name] = segment
+        return segment
+
+
+def read_frame(descriptor: Dict[str, Any]) -> Optional[np.ndarray]:
+    """
+    Copia el frame descrito por write_frame() (lado del servidor de visión).
+
+    Returns:
+        Copia del frame, o None si el slot ya fue reescrito o el segmento no existe
+    """
+    try:
+        segment = _attach(descriptor['shm_name'])
+        seq = int(descriptor['seq'])
+        header = np.ndarray((1,), dtype=np.int64, buffer=segment.buf)
+        if int(header[0]) != seq:
+            return None
+        frame = np.ndarray(tuple(descriptor['shape']), dtype=np.dtype(descriptor['dtype']),
+                           buffer=segment.buf, offset=int(descriptor.get('offset', HEADER_BYTES))).copy()
+        return frame if int(header[0]) == seq else None
+    except (FileNotFoundError, KeyError, ValueError, TypeError) as e:
+        print(f"[frame_transport] ⚠️ Descriptor de frame inválido: {e}")
+        return None
+
+# ============================================================
+# ENVÍO AL SERVIDOR DE VISIÓN
+# ============================================================
+
+def is_local_server() -> bool:
+    """True si el servidor de visión configurado corre en esta máquina"""
+    return urlparse(vision_client.get_base_url()).hostname in LOCAL_HOSTS
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def send_frame(frame: np.ndarray, encode_jpeg: Callable[[], bytes], use_shm: bool = True,
+               timeout: float = DEFAULT_TIMEOUT_S) -> requests.Response:
+    """
+    Envía un frame a procesar: memoria compartida si el servidor es local, si no JPEG/HTTP.
+
+    Args:
+        frame: Frame BGR a procesar
+        encode_jpeg: Devuelve los bytes JPEG del frame (solo se llama si hace falta)
+        use_shm: Permite el transporte por memoria compartida (vision.shm_transport)
+        timeout: Timeout de la llamada HTTP
+
+    Returns:
+        requests.Response de /process_shm/ o /process/ (mismo esquema de respuesta)
+    """
+    global _shm_unsupported_until, _shm_conflicts
+    if use_shm and time.time() >= _shm_unsupported_until and is_local_server():
+        response = vision_client.post('/process_shm/', json=write_frame(frame), timeout=timeout)
+        if response.status_code == 409:
+            # El servidor no pudo leer este frame de la memoria compartida: reenviarlo por JPEG
+            _shm_conflicts += 1
+            _count('shm_conflicts')
+            if _shm_conflicts >= MAX_SHM_CONFLICTS:
+                print(f"[frame_transport] ⚠️ {_shm_conflicts} frames sin leer en memoria compartida (409), usando JPEG")
+                _shm_unsupported_until = time.time() + UNSUPPORTED_RETRY_S
+                _shm_conflicts = 0
+                _count('shm_fallbacks')
+        elif response.status_code not in (404, 405, 501):
+            _shm_conflicts = 0
+            _count('shm')
+            return response
+        else:
+            print(f"[frame_transport] ⚠️ El servidor no soporta /process_shm/ ({response.status_code}), usando JPEG")
+            _shm_unsupported_until = time.time() + UNSUPPORTED_RETRY_S
+            _count('shm_fallbacks')
+
+    files = {"file": ("capture.jpg", encode_jpeg(), "image/jpeg")}
+    response = vision_client.post('/process/', files=files, timeout=timeout)
+    _count('jpeg')
+    return response
+
+
+def get_stats() -> Dict[str, Any]:
+    """Envíos por transporte: {'shm', 'jpeg', 'shm_fallbacks', 'shm_conflicts', 'ring_slot_mb'}"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['ring_slot_mb'] = round(_ring_slot_bytes / 1e6, 2)
+    return stats
@@ -0,0 +1,195 @@
+# health_monitor.py - Estado de salud de servidor de visión, MQTT y cámara
+"""
+Health Monitor - COMAU-VISION
+=============================
+
+Un único hilo en segundo plano sondea los componentes con su propio ritmo y
+guarda el último estado:
+
+- vision: GET / al servidor de visión (vision_client, conexión keep-alive)
+- mqtt:   estado de la máquina de estados del MQTTManager (en memoria)
+- camera: cámara abierta en camera_manager (en memoria)
+
+Los endpoints de estado devuelven el valor cacheado al instante (get_status()),
+sin importar cuántas pestañas estén abiertas. Cuando el estado de un componente
+cambia, se notifica a los listeners registrados (p. ej. emisión Socket.IO).
+
+Cada estado: {'ok', 'status' (icono: success | error | waiting | default), ...,
+'timestamp', 'changed_at'}
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from src.vision import camera_manager, vision_client
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+PROBE_INTERVALS_S = {
+    'vision': 2.0,      # HTTP al servidor de visión
+    'mqtt': 0.5,        # Lectura de estado en memoria
+    'camera': 2.0       # Lectura de estado en memoria
+}
+VISION_TIMEOUT_S = 2
+TICK_S = 0.25
+
+MQTT_ICON_MAP = {
+    'disconnected': 'default',
+    'connecting': 'waiting',
+    'connected': 'success',
+    'error': 'error',
+    'stopping': 'waiting'
+}
+
+_status: Dict[str, Dict[str, Any]] = {}
+_next_probe: Dict[str, float] = {}
+_lock = threading.Lock()
+_listeners: List[Callable[[str, Dict[str, Any], Optional[Dict[str, Any]]], None]] = []
+_thread: Optional[threading.Thread] = None
+_stop_event = threading.Event()
+
+# ============================================================
+# SONDAS
+# ============================================================
+
+def probe_vision() -> Dict[str, Any]:
+    """Estado del servidor de visión (mismo esquema que /api/vision_icon_status)"""
+    vision_server_url = vision_client.get_base_url()
+    try:
+        response = vision_client.get('/', timeout=VISION_TIMEOUT_S)
+        if response.status_code == 200:
+            return {'ok': True, 'status': 'success', 'server_status': 'online',
+                    'message': 'Servidor de visión funcionando correctamente',
+                    'vision_server_url': vision_server_url, 'response_code': response.status_code}
+        return {'ok': False, 'status': 'error', 'server_status': 'error',
+                'message': f'Servidor de visión responde con código {response.status_code}',
+                'vision_server_url': vision_server_url, 'response_code': response.status_code}
+    except requests.exceptions.ConnectTimeout:
+        message = 'Timeout conectando al servidor de visión'
+    except requests.exceptions.ConnectionError:
+        message = 'No se puede conectar al servidor de visión'
+    except Exception as e:
+        message = f'Error verificando servidor de visión: {e}'
+    return {'ok': False, 'status': 'error', 'server_status': 'offline',
+            'message': message, 'vision_server_url': vision_server_url}
+
+
+def probe_mqtt() -> Dict[str, Any]:
+    """Estado del MQTTManager (mismo esquema que /api/mqtt_icon_status)"""
+    from mqtt_manager import get_mqtt_manager
+
+    manager = get_mqtt_manager()
+    state = manager.state.value
+    icon = MQTT_ICON_MAP.get(state, 'default')
+    return {'ok': True, 'status': icon, 'icon': icon, 'connected': manager.connected, 'state': state}
+
+
+def probe_camera() -> Dict[str, Any]:
+    """Estado de la cámara: success si está abierta, default si no"""
+    info = camera_manager.get_camera_info()
+    return dict(info, ok=True, status='success' if info['connected'] else 'default')
+
+
+PROBES: Dict[str, Callable[[], Dict[str, Any]]] = {
+    'vision': probe_vision,
+    'mqtt': probe_mqtt,
+    'camera': probe_camera
+}
+
+# ============================================================
+# LISTENERS
+# ============================================================
+
+def add_listener(callback: Callable[[str, Dict[str, Any], Optional[Dict[str, Any]]], None]) -> None:
+    """
+    Registra callback(componente, estado_nuevo, estado_anterior) para cada cambio de estado.
+    Se llama desde el hilo del monitor: no debe bloquear.
+    """
+    with _lock:
+        if callback not in _listeners:
+            _listeners.append(callback)
+
+
+def _notify(component: str, status: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> None:
+    for callback in list(_listeners):
+        try:
+            callback(component, status, previous)
+        except Exception as e:
+            print(f"[health_monitor] ⚠️ Error en listener: {e}")
+
+# ============================================================
+# MONITOR
+# ============================================================
+
+def _signature(status: Dict[str, Any]) -> tuple:
+    """Campos que definen un cambio de estado (sin timestamps)"""
+    return tuple(sorted((k, str(v)) for k, v in status.items() if k not in ('timestamp', 'changed_at')))
+
+
+def refresh(component: str) -> Dict[str, Any]:
+    """Sondea un componente ahora, actualiza la caché y notifica si cambió"""
+    try:
+        status = PROBES[component]()
+    except Exception as e:
+        status = {'ok': False, 'status': 'error', 'error': str(e)}
+
+    now = time.time()
+    with _lock:
+        previous = _status.get(component)
+        changed = previous is None or _signature(previous) != _signature(status)
+        status['timestamp'] = now
+        status['changed_at'] = now if changed else previous['changed_at']
+        _status[component] = status
+        _next_probe[component] = now + PROBE_INTERVALS_S[component]
+
+    if changed:
+        old = previous['status'] if previous else None
+        print(f"[health_monitor] 🔄 {component}: {old} → {status['status']}")
+        _notify(component, dict(status), previous)
+    return dict(status)
+
+
+def _monitor_loop() -> None:
+    while not _stop_event.is_set():
+        now = time.time()
+        for component in PROBES:
+            if _stop_event.is_set():
+                break
+            if _next_probe.get(component, 0.0) <= now:
+                refresh(component)
+        _stop_event.wait(TICK_S)
+
+
+def start() -> None:
+    """Inicia el hilo del monitor (idempotente)"""
+    global _thread
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        _stop_event.clear()
+        _thread = threading.Thread(target=_monitor_loop, daemon=True, name='HealthMonitor')
+        _thread.start()
+    print("[health_monitor] ✅ Monitor de salud iniciado")
+
+
+def stop() -> None:
+    """Detiene el hilo del monitor"""
+    _stop_event.set()
+
+
+def get_status(component: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Último estado cacheado de un componente (o de todos si component es None).
+    Si el monitor todavía no lo sondeó, lo sondea en el momento.
+    """
+    if component is None:
+        return {name: get_status(name) for name in PROBES}
+    with _lock:
+        status = _status.get(component)
+    if status is None:
+        return refresh(component) if component in PROBES else None
+    return dict(status)
@@ -0,0 +1,489 @@
+# inference_worker.py - Proceso dedicado de inferencia YOLO
+"""
+Inference Worker - COMAU-VISION
+===============================
+
+Ejecuta la inferencia YOLO en un proceso separado que es dueño de los modelos,
+para que el forward pass no compita por el GIL con Flask, el streaming y los
+callbacks de MQTT.
+
+- Cola de peticiones ACOTADA: si está llena, la petición se rechaza enseguida
+  (backpressure) en lugar de acumular frames viejos.
+- Los frames grandes viajan por memoria compartida (un slot por petición en vuelo);
+  los recortes chicos se envían directamente por la cola.
+- Cada petición lleva un deadline: el worker descarta las que vencieron antes de
+  empezar y quien espera deja de esperar al vencer.
+- Las máscaras de segmentación vuelven binarizadas y empaquetadas en bits (32 veces
+  menos que el float32 original) y se desempaquetan en el proceso principal.
+- El proceso se lanza con 'spawn': el hijo reimporta el script principal como
+  __mp_main__, así que ese script no debe tener efectos al importarse
+  (illinois-server.py instala señales y listeners desde main()).
+- Métricas: profundidad de cola, rechazos, vencidas, tiempos de espera e inferencia.
+
+yolo_detector delega en este worker cuando está activo (set_inference_worker), por
+lo que infer_gasket(), detect_holes(), etc. no cambian para quien las usa.
+
+Configuración (config.json → vision.inference_worker):
+    {"enabled": true, "queue_size": 4, "deadline_s": 10.0}
+"""
+
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+DEFAULT_QUEUE_SIZE = 4              # Peticiones en vuelo como máximo
+DEFAULT_DEADLINE_S = 10.0           # Deadline por defecto de cada petición
+SLOT_BYTES = 1920 * 1080 * 3        # Tamaño de cada slot de memoria compartida (un frame BGR Full HD)
+INLINE_MAX_BYTES = 256 * 1024       # Imágenes más chicas viajan por la cola (recortes)
+SUBMIT_TIMEOUT_S = 0.05             # Espera máxima por un lugar en la cola antes de rechazar
+READY_TIMEOUT_S = 120.0             # Espera máxima a que el worker cargue los modelos
+START_TIMEOUT_S = 30.0              # Espera máxima a que arranque un worker sin modelos
+MASK_THRESHOLD = 0.5                # Binarización de máscaras antes de empaquetarlas
+METRICS_ALPHA = 0.1                 # Suavizado exponencial de los tiempos medios
+
+_READY = '__ready__'
+
+# ============================================================
+# PROCESO WORKER
+# ============================================================
+
+def _read_image(ref, slots: List[shared_memory.SharedMemory]) -> np.ndarray:
+    """Reconstruye una imagen desde su referencia ('inline', array) o ('shm', slot, shape, dtype)"""
+    if ref[0] == 'inline':
+        return ref[1]
+    _, slot, shape, dtype = ref
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=slots[slot].buf)
+
+
+def _pack_prediction(prediction: Optional[dict]) -> Optional[dict]:
+    """Binariza y empaqueta en bits las máscaras de una predicción (lado del worker)"""
+    if prediction is None or prediction.get('masks') is None:
+        return prediction
+    masks = prediction['masks']
+    return dict(prediction, masks=('packbits', np.packbits(masks > MASK_THRESHOLD, axis=-1), masks.shape))
+
+
+def _unpack_prediction(prediction: Optional[dict]) -> Optional[dict]:
+    """Reconstruye las máscaras (N, h, w) float32 con valores 0/1 (lado del proceso principal)"""
+    if prediction is None or not isinstance(prediction.get('masks'), tuple):
+        return prediction
+    _, packed, shape = prediction['masks']
+    masks = np.unpackbits(packed, axis=-1, count=shape[-1]).astype(np.float32).reshape(shape)
+    return dict(prediction, masks=masks)
+
+
+def _worker_main(slot_names: List[str], requests_q, results_q, model_specs: Dict[str, Tuple[str, str]]) -> None:
+    """
+    Bucle del proceso worker: carga los modelos y atiende peticiones hasta recibir None.
+
+    Cada respuesta es (request_id, status, payload, timing) con status en
+    'ok', 'error' o 'expired'.
+    """
+    from src.vision import yolo_detector
+
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    # La caché de resultados vive en el proceso principal (cada frame llega una sola vez)
+    yolo_detector.configure_result_cache(enabled=False)
+
+    def models_info():
+        return {model_type: {'path': yolo_detector.get_model_path(model_type),
+                             'backend': yolo_detector.get_model_backend(model_type),
+                             'mode': yolo_detector.get_model_mode(model_type)}
+                for model_type in ('detection', 'holes') if yolo_detector.is_model_loaded(model_type)}
+
+    for model_type, (path, backend) in model_specs.items():
+        yolo_detector.load_model(model_type, path, backend)
+    results_q.put((_READY, 'ok', models_info(), {}))
+
+    def handle(request):
+        request_id, op, args, deadline = request
+        started = time.time()
+        if started > deadline:
+            results_q.put((request_id, 'expired', None, {'started': started}))
+            return
+
+        try:
+            if op == 'predict':
+                model_type, ref, conf = args
+                image = _read_image(ref, slots)
+                payload = _pack_prediction(yolo_detector._predict(model_type, image, conf))
+                del image
+            elif op == 'predict_batch':
+                model_type, refs, conf = args
+                payload = [_pack_prediction(p) for p in
+                           yolo_detector._predict_batch(model_type, [_read_image(r, slots) for r in refs], conf)]
+            elif op == 'load':
+                model_type, path, backend, mode = args
+                yolo_detector.set_inference_mode(mode)
+                payload = {'ok': yolo_detector.load_model(model_type, path, backend), 'models': models_info()}
+            elif op == 'swap':
+                model_type, path, backend, resolution, mode = args
+                payload = dict(yolo_detector._swap_in(model_type, path, backend, resolution, mode),
+                               models=models_info())
+            else:
+                raise ValueError(f"operación desconocida: {op}")
+            results_q.put((request_id, 'ok', payload, {'started': started, 'finished': time.time()}))
+        except Exception as e:
+            results_q.put((request_id, 'error', str(e), {'started': started, 'finished': time.time()}))
+
+    try:
+        while True:
+            request = requests_q.get()
+            if request is None:
+                break
+            if request[1] in ('load', 'swap'):
+                # Las cargas corren en paralelo: la inferencia sigue con el modelo actual
+                threading.Thread(target=handle, args=(request,), daemon=True).start()
+            else:
+                handle(request)
+    finally:
+        for slot in slots:
+            slot.close()
+
+# ============================================================
+# CLIENTE (PROCESO PRINCIPAL)
+# ============================================================
+
+class InferenceWorker:
+    """Lado del proceso principal: cola acotada, slots de memoria compartida y despacho de resultados"""
+
+    def __init__(self, model_specs: Dict[str, Tuple[str, str]], queue_size: int = DEFAULT_QUEUE_SIZE,
+                 deadline_s: float = DEFAULT_DEADLINE_S, slot_bytes: int = SLOT_BYTES):
+        self.model_specs = dict(model_specs)
+        self.queue_size = max(1, int(queue_size))
+        self.deadline_s = float(deadline_s)
+        self.slot_bytes = int(slot_bytes)
+
+        self._ctx = mp.get_context('spawn')
+        self._process = None
+        self._requests_q = None
+        self._results_q = None
+        self._slots: List[shared_memory.SharedMemory] = []
+        self._free_slots: queue.Queue = queue.Queue()
+        self._pending: Dict[int, Tuple[Future, Optional[int], float]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._dispatcher = None
+        self._running = False
+        self._ready = threading.Event()
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._metrics = {
+            'submitted': 0, 'completed': 0, 'rejected': 0, 'expired': 0,
+            'timeouts': 0, 'errors': 0, 'max_queue_depth': 0,
+            'avg_wait_ms': 0.0, 'avg_infer_ms': 0.0, 'avg_total_ms': 0.0
+        }
+
+    # ----------------------------------------------------------
+    # Ciclo de vida
+    # ----------------------------------------------------------
+    def start(self, wait_ready: bool = True) -> bool:
+        """Crea los slots, lanza el proceso y el hilo de despacho"""
+        self._slots = [shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+                       for _ in range(self.queue_size)]
+        for i in range(self.queue_size):
+            self._free_slots.put(i)
+
+        self._requests_q = self._ctx.Queue(maxsize=self.queue_size)
+        self._results_q = self._ctx.Queue()
+        self._process = self._ctx.Process(
+            target=_worker_main,
+            args=([slot.name for slot in self._slots], self._requests_q, self._results_q, self.model_specs),
+            name='yolo-inference', daemon=True
+        )
+        self._process.start()
+        self._running = True
+
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='yolo-inference-results', daemon=True)
+        self._dispatcher.start()
+        print(f"[inference] 🚀 Worker de inferencia iniciado (PID {self._process.pid}, cola {self.queue_size})")
+
+        timeout = READY_TIMEOUT_S if self.model_specs else START_TIMEOUT_S
+        if wait_ready and not self._ready.wait(timeout):
+            print(f"[inference] ⚠️ El worker no quedó listo en {timeout:.0f}s")
+            return False
+        return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Detiene el worker, falla las peticiones pendientes y libera la memoria compartida"""
+        if not self._running:
+            return
+        self._running = False
+        try:
+            self._requests_q.put(None, timeout=1.0)
+        except queue.Full:
+            pass
+        if self._process is not None:
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout)
+        self._fail_pending('worker detenido')
+
+        for slot in self._slots:
+            slot.close()
+            slot.unlink()
+        self._slots = []
+        print("[inference] ⏹️ Worker de inferencia detenido")
+
+    def is_alive(self) -> bool:
+        return self._running and self._process is not None and self._process.is_alive()
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set() and self.is_alive()
+
+    # ----------------------------------------------------------
+    # Despacho de resultados
+    # ----------------------------------------------------------
+    def _dispatch_loop(self) -> None:
+        while self._running:
+            try:
+                request_id, status, payload, timing = self._results_q.get(timeout=0.5)
+            except queue.Empty:
+                if self._running and self._process is not None and not self._process.is_alive():
+                    print(f"[inference] ❌ Worker terminado inesperadamente (exit {self._process.exitcode})")
+                    self._running = False
+                    self._fail_pending('worker terminado')
+                continue
+            except (EOFError, OSError):
+                break
+
+            if request_id == _READY:
+                self._models = payload
+                self._ready.set()
+                print(f"[inference] ✓ Worker listo, modelos: {list(payload) or 'ninguno'}")
+                continue
+
+            with self._lock:
+                entry = self._pending.pop(request_id, None)
+            if entry is None:
+                continue
+            future, slot, submitted = entry
+            if slot is not None:
+                self._free_slots.put(slot)
+            self._record(status, submitted, timing)
+
+            if status == 'ok':
+                future.set_result(payload)
+            elif status == 'expired':
+                future.set_exception(TimeoutError('deadline vencido antes de procesar'))
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    def _fail_pending(self, reason: str) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future, slot, _ in pending.values():
+            if slot is not None:
+                self._free_slots.put(slot)
+            if not future.done():
+                future.set_exception(RuntimeError(reason))
+
+    def _record(self, status: str, submitted: float, timing: Dict[str, float]) -> None:
+        now = time.time()
+        with self._lock:
+            m = self._metrics
+            if status == 'expired':
+                m['expired'] += 1
+                return
+            m['completed' if status == 'ok' else 'errors'] += 1
+            started = timing.get('started', submitted)
+            finished = timing.get('finished', now)
+            for key, value in (('avg_wait_ms', started - submitted),
+                               ('avg_infer_ms', finished - started),
+                               ('avg_total_ms', now - submitted)):
+                m[key] += METRICS_ALPHA * (value * 1000.0 - m[key])
+
+    # ----------------------------------------------------------
+    # Envío de peticiones
+    # ----------------------------------------------------------
+    def _image_ref(self, image: np.ndarray, slots_taken: List[int]):
+        """
+        Referencia transportable de una imagen: memoria compartida si es grande, inline si
+        es chica. Cada petición ocupa como máximo un slot; el resto de un lote viaja inline.
+        """
+        image = np.ascontiguousarray(image)
+        if slots_taken or image.nbytes <= INLINE_MAX_BYTES or image.nbytes > self.slot_bytes:
+            return ('inline', image)
+        slot = self._free_slots.get(timeout=SUBMIT_TIMEOUT_S)
+        slots_taken.append(slot)
+        np.ndarray(image.shape, dtype=image.dtype, buffer=self._slots[slot].buf)[...] = image
+        return ('shm', slot, image.shape, image.dtype.str)
+
+    def submit(self, op: str, args: tuple, deadline_s: Optional[float] = None) -> Optional[Future]:
+        """
+        Encola una petición. Devuelve un Future, o None si se rechazó por cola llena
+        (backpressure) o porque el worker no está activo.
+        """
+        if not self.is_alive():
+            return None
+
+        deadline = time.time() + (self.deadline_s if deadline_s is None else deadline_s)
+        request_id = next(self._ids)
+        slots_taken: List[int] = []
+        future: Future = Future()
+
+        try:
+            if op == 'predict':
+                model_type, image, conf = args
+                args = (model_type, self._image_ref(image, slots_taken), conf)
+            elif op == 'predict_batch':
+                model_type, images, conf = args
+                args = (model_type, [self._image_ref(image, slots_taken) for image in images], conf)
+
+            with self._lock:
+                self._pending[request_id] = (future, slots_taken[0] if slots_taken else None, time.time())
+            self._requests_q.put((request_id, op, args, deadline), timeout=SUBMIT_TIMEOUT_S)
+        except (queue.Empty, queue.Full):
+            with self._lock:
+                self._pending.pop(request_id, None)
+                self._metrics['rejected'] += 1
+            for slot in slots_taken:
+                self._free_slots.put(slot)
+            return None
+
+        with self._lock:
+            self._metrics['submitted'] += 1
+            self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'], len(self._pending))
+        return future
+
+    def call(self, op: str, args: tuple, deadline_s: Optional[float] = None):
+        """Envía una petición y espera el resultado hasta el deadline. Returns: resultado o None"""
+        deadline_s = self.deadline_s if deadline_s is None else deadline_s
+        future = self.submit(op, args, deadline_s)
+        if future is None:
+            print(f"[inference] ⚠️ Petición {op} rechazada (cola llena o worker inactivo)")
+            return None
+        try:
+            return future.result(timeout=deadline_s)
+        except FutureTimeoutError:
+            with self._lock:
+                self._metrics['timeouts'] += 1
+            print(f"[inference] ⚠️ Petición {op} sin respuesta en {deadline_s:.1f}s")
+        except Exception as e:
+            print(f"[inference] ⚠️ Petición {op} falló: {e}")
+        return None
+
+    # ----------------------------------------------------------
+    # API usada por yolo_detector
+    # ----------------------------------------------------------
+    def predict(self, model_type: str, frame: np.ndarray, conf_threshold: float,
+                deadline_s: Optional[float] = None) -> Optional[dict]:
+        return _unpack_prediction(self.call('predict', (model_type, frame, conf_threshold), deadline_s))
+
+    def predict_batch(self, model_type: str, images: List[np.ndarray], conf_threshold: float,
+                      deadline_s: Optional[float] = None) -> Optional[List[dict]]:
+        predictions = self.call('predict_batch', (model_type, list(images), conf_threshold), deadline_s)
+        return None if predictions is None else [_unpack_prediction(p) for p in predictions]
+
+    def load_model(self, model_type: str, model_path: str, backend: Optional[str] = None) -> bool:
+        """Carga (o recarga) un modelo dentro del worker con el modo de inferencia vigente"""
+        from src.vision import yolo_detector
+
+        mode = yolo_detector.get_inference_mode()
+        result = self.call('load', (model_type, model_path, backend, mode), READY_TIMEOUT_S)
+        if not result:
+            return False
+        self._models = result['models']
+        return bool(result['ok'])
+
+    def hot_swap_model(self, model_type: str, model_path: str, backend: Optional[str],
+                       resolution: Tuple[int, int]) -> Dict[str, Any]:
+        """Intercambio en caliente dentro del worker (ver yolo_detector.hot_swap_model)"""
+        from src.vision import yolo_detector
+
+        mode = yolo_detector.get_inference_mode()
+        result = self.call('swap', (model_type, model_path, backend, tuple(resolution), mode), READY_TIMEOUT_S)
+        if not result:
+            return {'ok': False, 'error': 'Sin respuesta del worker de inferencia'}
+        self._models = result.pop('models')
+        return result
+
+    def is_model_loaded(self, model_type: str) -> bool:
+        return self.is_ready() and model_type in self._models
+
+    def get_model_path(self, model_type: str) -> Optional[str]:
+        return self._models.get(model_type, {}).get('path')
+
+    def get_model_backend(self, model_type: str) -> Optional[str]:
+        return self._models.get(model_type, {}).get('backend')
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Métricas de la cola y del worker"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['queue_depth'] = len(self._pending)
+        metrics.update({
+            'queue_size': self.queue_size,
+            'free_slots': self._free_slots.qsize(),
+            'alive': self.is_alive(),
+            'ready': self.is_ready(),
+            'pid': self._process.pid if self._process is not None else None,
+            'models': dict(self._models)
+        })
+        for key in ('avg_wait_ms', 'avg_infer_ms', 'avg_total_ms'):
+            metrics[key] = round(metrics[key], 2)
+        return metrics
+
+# ============================================================
+# INSTANCIA GLOBAL
+# ============================================================
+_worker: Optional[InferenceWorker] = None
+
+
+def start_worker(model_specs: Dict[str, Tuple[str, str]], queue_size: int = DEFAULT_QUEUE_SIZE,
+                 deadline_s: float = DEFAULT_DEADLINE_S, wait_ready: bool = True) -> bool:
+    """
+    Lanza el worker de inferencia y conecta yolo_detector a él.
+
+    Args:
+        model_specs: {'detection': (path, backend), 'holes': (path, backend)}
+        queue_size: Peticiones en vuelo como máximo
+        deadline_s: Deadline por defecto de cada petición
+        wait_ready: Esperar a que el worker esté listo (las peticiones enviadas antes
+                    quedan en cola hasta entonces)
+
+    Returns:
+        True si el worker quedó listo (o se lanzó, con wait_ready=False)
+    """
+    global _worker
+    from src.vision import yolo_detector
+
+    stop_worker()
+    _worker = InferenceWorker(model_specs, queue_size, deadline_s)
+    ready = _worker.start(wait_ready)
+    yolo_detector.set_inference_worker(_worker)
+    return ready
+
+
+def stop_worker() -> None:
+    """Detiene el worker y devuelve la inferencia al proceso principal"""
+    global _worker
+    from src.vision import yolo_detector
+
+    if _worker is None:
+        return
+    yolo_detector.set_inference_worker(None)
+    _worker.stop()
+    _worker = None
+
+
+def get_worker() -> Optional[InferenceWorker]:
+    return _worker
+
+
+def get_worker_metrics() -> Dict[str, Any]:
+    """Métricas del worker ({'enabled': False} si no está activo)"""
+    if _worker is None:
+        return {'enabled': False}
+    return dict(_worker.get_metrics(), enabled=True)
@@ -0,0 +1,342 @@
+# rectification.py - Rectificación de perspectiva a partir del ArUco base
+"""
+Rectification - COMAU-VISION
+============================
+
+Corrige la inclinación de la cámara respecto al plano de trabajo usando el
+ArUco base: su contorno detectado (o el de la referencia guardada) debe ser un
+cuadrado, y la homografía que lo lleva a un cuadrado perfecto rectifica todo el plano.
+
+- La homografía conserva centro, orientación y tamaño medio del marcador, de modo
+  que la imagen rectificada se superpone a la original y px_per_mm es uniforme.
+- Las esquinas detectadas del ArUco base se suavizan (mismo criterio que el filtro
+  de pose, config.json → aruco.pose_filter) antes de calcular la homografía: el ruido
+  subpíxel de una detección no se amplifica hasta los bordes del frame.
+- Los mapas de remap se calculan una vez y solo se reconstruyen cuando la homografía
+  cambia más que la tolerancia, medida sobre las esquinas del marcador (espacio del
+  marcador, no esquinas del frame). Se construyen fuera del lock.
+- Con aruco.undistort la homografía se calcula sobre esquinas sin distorsión; los mapas
+  componen ambas transformaciones (rectificado → sin distorsión → original), así que
+  rectify_frame()/rectify_roi() reciben siempre el frame crudo de la cámara.
+- Se puede rectificar el frame completo, solo una región (p. ej. la ROI de la junta)
+  o solo un conjunto de puntos.
+
+Configuración (config.json):
+- aruco.base.correct_perspective: habilita la rectificación
+- aruco.tool.correct_perspective: rectifica también la geometría del Tool
+- aruco.rectification_tolerance_px: tolerancia de reconstrucción de mapas
+- aruco.rectification_refresh_s: antigüedad máxima de la homografía antes de volver a
+  detectar el ArUco base para un análisis
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    cv2 = None
+    OPENCV_AVAILABLE = False
+
+from src.vision.undistortion import get_undistort_maps, undistort_points
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+REBUILD_TOLERANCE_PX = 1.0   # Desplazamiento máximo (px, en el marcador) antes de reconstruir los mapas
+REFRESH_S = 5.0              # Antigüedad de la homografía que no requiere volver a detectar
+CORNER_FILTER_DEFAULTS = {'alpha': 0.3, 'max_center_jump_px': 15.0, 'reset_after_rejections': 5}
+
+_lock = threading.Lock()
+_state: Dict[str, Any] = {
+    'homography': None,      # Homografía vigente (imagen original → rectificada)
+    'image_size': None,      # (width, height) de los mapas
+    'maps': None,            # (map1, map2) para cv2.remap
+    'source': None,          # 'detection' o 'saved_reference'
+    'undistort': False,      # La homografía está en espacio sin distorsión (mapas compuestos)
+    'built_at': 0.0,
+    'updated_at': 0.0,       # Última actualización (aunque no haya reconstrucción)
+    'rebuilds': 0,
+    'updates': 0,
+    'corners': None,         # Esquinas filtradas del ArUco base (detección)
+    'rejected_streak': 0
+}
+
+# ============================================================
+# HOMOGRAFÍA
+# ============================================================
+
+def compute_marker_homography(corners) -> np.ndarray:
+    """
+    Homografía que transforma el contorno del marcador en un cuadrado perfecto.
+
+    El cuadrado destino conserva el centro, el ángulo medio de los cuatro bordes
+    y la longitud media de borde del marcador detectado.
+
+    Args:
+        corners: 4 esquinas [[x, y], ...] en orden de OpenCV
+
+    Returns:
+        Matriz 3x3 (float64)
+    """
+    src = np.asarray(corners, dtype=np.float64).reshape(4, 2)
+    edges = np.roll(src, -1, axis=0) - src
+    side = float(np.hypot(edges[:, 0], edges[:, 1]).mean())
+
+    # Ángulo medio: cada borde rotado a la orientación del primero
+    angles = np.arctan2(edges[:, 1], edges[:, 0]) - np.arange(4) * (np.pi / 2)
+    angle = np.arctan2(np.sin(angles).sum(), np.cos(angles).sum())
+
+    # Cuadrado canónico (mismo orden de esquinas) rotado y trasladado al centro
+    half = side / 2.0
+    square = np.array([[-half, -half], [half, -half], [half, half], [-half, half]])
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    dst = square @ rotation.T + src.mean(axis=0)
+
+    return cv2.getPerspectiveTransform(src.astype(np.float32), dst.astype(np.float32))
+
+
+def homography_displacement(h1: np.ndarray, h2: np.ndarray, points) -> float:
+    """Desplazamiento máximo (px) entre dos homografías evaluado en los puntos indicados"""
+    probe = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+    p1 = cv2.perspectiveTransform(probe, h1).reshape(-1, 2)
+    p2 = cv2.perspectiveTransform(probe, h2).reshape(-1, 2)
+    return float(np.hypot(*(p1 - p2).T).max())
+
+
+def filter_corners(corners, params: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """
+    Suavizado exponencial de las esquinas detectadas del ArUco base.
+
+    Un salto mayor que max_center_jump_px se descarta como atípico; tras
+    reset_after_rejections atípicos seguidos se asume que el marcador se movió.
+
+    Args:
+        corners: 4 esquinas detectadas
+        params: alpha, max_center_jump_px, reset_after_rejections (aruco.pose_filter)
+
+    Returns:
+        Esquinas filtradas (4x2)
+    """
+    p = dict(CORNER_FILTER_DEFAULTS, **(params or {}))
+    corners = np.asarray(corners, dtype=np.float64).reshape(4, 2)
+    with _lock:
+        current = _state['corners']
+        if current is None:
+            _state['corners'] = corners
+        elif float(np.hypot(*(corners - current).T).max()) > p['max_center_jump_px']:
+            _state['rejected_streak'] += 1
+            if _state['rejected_streak'] >= p['reset_after_rejections']:
+                _state['corners'], _state['rejected_streak'] = corners, 0
+        else:
+            _state['corners'] = current + p['alpha'] * (corners - current)
+            _state['rejected_streak'] = 0
+        return _state['corners'].copy()
+
+
+def _build_maps(homography: np.ndarray, image_size: Tuple[int, int],
+                undistort: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mapas de remap: para cada píxel rectificado, su posición en la imagen original.
+    Con undistort la homografía está en espacio sin distorsión: esa posición se busca
+    en los mapas de corrección (sin distorsión → original), de modo que el remap
+    parte del frame crudo.
+    """
+    w, h = image_size
+    inverse = np.linalg.inv(homography)
+    xs, ys = np.meshgrid(np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+    grid = np.stack([xs, ys], axis=-1).reshape(-1, 1, 2)
+    source = cv2.perspectiveTransform(grid, inverse).reshape(h, w, 2)
+    map_x, map_y = source[..., 0], source[..., 1]
+    undistort_maps = get_undistort_maps(w, h) if undistort else None
+    if undistort_maps is not None:
+        raw_x, raw_y = cv2.convertMaps(undistort_maps[0], undistort_maps[1], cv2.CV_32FC1)
+        map_x, map_y = (cv2.remap(raw, map_x, map_y, cv2.INTER_LINEAR,
+                                  borderMode=cv2.BORDER_CONSTANT, borderValue=-1)
+                        for raw in (raw_x, raw_y))
+    return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+# ============================================================
+# ESTADO / CACHÉ
+# ============================================================
+
+def update_homography(homography: np.ndarray, image_size: Tuple[int, int],
+                      tolerance_px: float = REBUILD_TOLERANCE_PX, source: str = 'detection',
+                      probe_points=None, undistort: bool = False) -> bool:
+    """
+    Registra una nueva homografía. Los mapas solo se reconstruyen si cambia la
+    resolución, el espacio de la homografía (undistort) o la homografía se desplaza
+    más de tolerance_px en probe_points (las esquinas del marcador; None = centro del frame).
+
+    Returns:
+        True si se reconstruyeron los mapas
+    """
+    image_size = (int(image_size[0]), int(image_size[1]))
+    if probe_points is None:
+        probe_points = [[image_size[0] / 2, image_size[1] / 2]]
+    with _lock:
+        _state['updates'] += 1
+        _state['updated_at'] = time.time()
+        current = _state['homography']
+        if (current is not None and _state['image_size'] == image_size and
+                _state['undistort'] == undistort and
+                homography_displacement(current, homography, probe_points) <= tolerance_px):
+            return False
+
+    # Mapas a resolución completa: se calculan sin tomar el lock
+    start = time.time()
+    maps = _build_maps(homography, image_size, undistort)
+    with _lock:
+        _state['maps'] = maps
+        _state['homography'] = homography
+        _state['image_size'] = image_size
+        _state['source'] = source
+        _state['undistort'] = undistort
+        _state['built_at'] = time.time()
+        _state['rebuilds'] += 1
+    print(f"[rectify] 🗺️ Mapas de rectificación reconstruidos ({source}, "
+          f"{image_size[0]}x{image_size[1]}) en {time.time() - start:.3f}s")
+    return True
+
+
+def get_homography_age() -> Optional[float]:
+    """Segundos desde la última actualización de la homografía (None si no hay)"""
+    with _lock:
+        if _state['homography'] is None:
+            return None
+        return time.time() - _state['updated_at']
+
+
+def get_homography() -> Optional[np.ndarray]:
+    """Homografía vigente (None si aún no se estableció)"""
+    with _lock:
+        return _state['homography']
+
+
+def get_rectification_status() -> Dict[str, Any]:
+    """Estado de la caché de rectificación (para diagnóstico)"""
+    with _lock:
+        homography = _state['homography']
+        return {
+            'ready': homography is not None,
+            'source': _state['source'],
+            'undistort': _state['undistort'],
+            'image_size': _state['image_size'],
+            'homography': homography.tolist() if homography is not None else None,
+            'built_at': _state['built_at'],
+            'updated_at': _state['updated_at'],
+            'rebuilds': _state['rebuilds'],
+            'updates': _state['updates']
+        }
+
+
+def reset_rectification() -> None:
+    """Descarta homografía y mapas (p. ej. tras guardar una nueva configuración)"""
+    with _lock:
+        _state.update({'homography': None, 'image_size': None, 'maps': None, 'source': None,
+                       'undistort': False, 'corners': None, 'rejected_streak': 0})
+
+# ============================================================
+# CONFIGURACIÓN DEL PROYECTO
+# ============================================================
+
+def is_rectification_enabled(aruco_config: Optional[Dict[str, Any]]) -> bool:
+    """La rectificación se habilita con aruco.base.correct_perspective"""
+    return bool((aruco_config or {}).get('base', {}).get('correct_perspective', False))
+
+
+def prepare_from_config(aruco_config: Dict[str, Any], image_size: Tuple[int, int],
+                        base_corners=None, use_saved_reference: bool = False,
+                        filter_params: Optional[Dict[str, Any]] = None) -> bool:
+    """
+    Actualiza la homografía desde el ArUco base.
+
+    La referencia guardada está en píxeles de la imagen original: con aruco.undistort
+    se corrige antes de calcular la homografía (mismo espacio que base_corners).
+
+    Args:
+        aruco_config: Sección 'aruco' de config.json
+        image_size: (width, height) del frame
+        base_corners: Esquinas detectadas del ArUco base, ya post-procesadas
+                      (None = usar referencia guardada)
+        use_saved_reference: Priorizar las esquinas de la referencia guardada
+        filter_params: Parámetros del suavizado de esquinas detectadas (aruco.pose_filter)
+
+    Returns:
+        True si hay una homografía vigente tras la actualización
+    """
+    saved_corners = (aruco_config.get('base', {}).get('saved_reference') or {}).get('corners')
+    if use_saved_reference and saved_corners:
+        corners, source = saved_corners, 'saved_reference'
+    elif base_corners is not None:
+        corners, source = filter_corners(base_corners, filter_params), 'detection'
+    elif saved_corners:
+        corners, source = saved_corners, 'saved_reference'
+    else:
+        return get_homography() is not None
+
+    undistort = bool(aruco_config.get('undistort', False))
+    if source == 'saved_reference' and undistort:
+        corners = undistort_points(corners, image_size)
+
+    tolerance = float(aruco_config.get('rectification_tolerance_px', REBUILD_TOLERANCE_PX))
+    update_homography(compute_marker_homography(corners), image_size, tolerance, source,
+                      probe_points=corners, undistort=undistort)
+    return True
+
+# ============================================================
+# APLICACIÓN
+# ============================================================
+
+def rectify_points(points) -> np.ndarray:
+    """
+    Transforma puntos [[x, y], ...] al plano rectificado (sin homografía: sin cambios).
+    Con aruco.undistort los puntos deben estar ya sin distorsión (ver postprocess_detection).
+    """
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+    homography = get_homography()
+    if homography is None or len(pts) == 0:
+        return pts.reshape(-1, 2)
+    return cv2.perspectiveTransform(pts, homography).reshape(-1, 2)
+
+
+def unrectify_points(points) -> np.ndarray:
+    """Inversa de rectify_points(): del plano rectificado al espacio de la homografía"""
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+    homography = get_homography()
+    if homography is None or len(pts) == 0:
+        return pts.reshape(-1, 2)
+    return cv2.perspectiveTransform(pts, np.linalg.inv(homography)).reshape(-1, 2)
+
+
+def rectify_frame(frame: np.ndarray) -> np.ndarray:
+    """
+    Frame crudo de la cámara rectificado con los mapas cacheados (sin homografía: sin cambios).
+    Con aruco.undistort los mapas incluyen la corrección de distorsión.
+    """
+    with _lock:
+        maps, size = _state['maps'], _state['image_size']
+    if maps is None or frame is None or (frame.shape[1], frame.shape[0]) != size:
+        return frame
+    return cv2.remap(frame, maps[0], maps[1], cv2.INTER_LINEAR)
+
+
+def rectify_roi(frame: np.ndarray, roi: Tuple[int, int, int, int]) -> np.ndarray:
+    """
+    Solo la región (x1, y1, x2, y2) de la imagen rectificada: se remapea la
+    submatriz de los mapas, con costo proporcional al área de la región.
+    """
+    h, w = frame.shape[:2]
+    x1, y1, x2, y2 = roi
+    x1, x2 = max(0, int(x1)), min(w, int(x2))
+    y1, y2 = max(0, int(y1)), min(h, int(y2))
+
+    with _lock:
+        maps, size = _state['maps'], _state['image_size']
+    if maps is None or (w, h) != size:
+        return frame[y1:y2, x1:x2]
+    return cv2.remap(frame, maps[0][y1:y2, x1:x2], maps[1][y1:y2, x1:x2], cv2.INTER_LINEAR)
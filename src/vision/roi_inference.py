@@ -0,0 +1,264 @@
+# roi_inference.py - Inferencia YOLO restringida a la ROI de la junta
+"""
+ROI Inference - COMAU-VISION
+============================
+
+Calcula la ROI en píxeles a partir de la pose del ArUco base y de las dimensiones
+de la junta seleccionada, recorta el frame y ejecuta YOLO solo sobre el recorte, a
+resolución nativa. Los resultados se devuelven en coordenadas del frame completo.
+
+La pose puede estar post-procesada (aruco.undistort / correct_perspective): la ROI se
+calcula en ese espacio y se lleva de vuelta al frame crudo antes de recortar, así que
+la ROI y todos los resultados están en píxeles del frame original de la cámara.
+
+Menos píxeles: inferencia más rápida y menos falsos positivos fuera de la zona de trabajo.
+
+ROI (config.json → vision, mismo criterio que configure_roi_vision_server):
+- roi_enabled: habilita la inferencia sobre la ROI
+- roi_offset_x_mm / roi_offset_y_mm: centro de la ROI en el marco del ArUco base
+- roi_zoom_x_percent / roi_zoom_y_percent: tamaño de la ROI respecto de la junta
+- roi_margin_px: margen adicional alrededor de la ROI (opcional)
+
+Sin ROI habilitada o sin ArUco base se usa el frame completo (resultado con 'roi': None).
+"""
+
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src import config_store
+from src.vision import yolo_detector
+from src.vision.aruco_manager import detect_arucos_with_saved_reference, pose_points_to_image
+from src.vision.frame_context import FrameContext, ensure_context
+from src.vision.vision_manager import get_roi_rectangle_mm, get_selected_junta_dimensions_mm
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+DEFAULT_MARGIN_PX = 16      # Margen alrededor de la ROI (px) para no cortar bordes de la junta
+MIN_ROI_SIZE_PX = 32        # ROI más chica que esto: se usa el frame completo
+
+# ============================================================
+# CÁLCULO DE LA ROI
+# ============================================================
+
+def roi_mm_to_pixels(roi_mm: Dict[str, float], base_pose: Dict[str, Any], frame_shape,
+                     margin_px: int = DEFAULT_MARGIN_PX) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Lleva un rectángulo en mm del marco del ArUco base a una ROI (x1, y1, x2, y2) en píxeles.
+
+    El rectángulo se rota con el marcador (mismo criterio que los marcos del
+    OverlayManager); sus esquinas se llevan del espacio de la pose al frame crudo
+    (ver aruco_manager.pose_points_to_image) y la ROI es su bounding box alineado a
+    los ejes, recortado al frame.
+
+    Args:
+        roi_mm: {'x_mm', 'y_mm', 'width_mm', 'height_mm', 'rotation' (grados)}
+        base_pose: Datos del ArUco base ('center', 'angle_rad', 'px_per_mm')
+        frame_shape: Forma del frame
+        margin_px: Margen adicional en píxeles
+
+    Returns:
+        (x1, y1, x2, y2) en píxeles del frame original, o None si la ROI queda fuera
+        del frame o es demasiado chica
+    """
+    h, w = frame_shape[:2]
+    px_per_mm = float(base_pose['px_per_mm'])
+    angle = float(base_pose['angle_rad']) + np.radians(roi_mm.get('rotation', 0) or 0)
+    cos_a, sin_a = np.cos(angle), np.sin(angle)
+
+    # Centro de la ROI: offset en mm rotado con el marco base
+    ox = float(roi_mm.get('x_mm', 0)) * px_per_mm
+    oy = float(roi_mm.get('y_mm', 0)) * px_per_mm
+    cx = base_pose['center'][0] + ox * cos_a - oy * sin_a
+    cy = base_pose['center'][1] + ox * sin_a + oy * cos_a
+
+    # Esquinas del rectángulo rotado, en el espacio de la pose y luego en el frame crudo
+    half_w = float(roi_mm['width_mm']) * px_per_mm / 2.0
+    half_h = float(roi_mm['height_mm']) * px_per_mm / 2.0
+    local = np.array([[-half_w, -half_h], [half_w, -half_h], [half_w, half_h], [-half_w, half_h]])
+    rotation = np.array([[cos_a, -sin_a], [sin_a, cos_a]])
+    corners = pose_points_to_image(local @ rotation.T + (cx, cy), base_pose, (w, h))
+
+    (min_x, min_y), (max_x, max_y) = corners.min(axis=0) - margin_px, corners.max(axis=0) + margin_px
+    x1, y1 = max(0, int(np.floor(min_x))), max(0, int(np.floor(min_y)))
+    x2, y2 = min(w, int(np.ceil(max_x))), min(h, int(np.ceil(max_y)))
+    if x2 - x1 < MIN_ROI_SIZE_PX or y2 - y1 < MIN_ROI_SIZE_PX:
+        return None
+    return x1, y1, x2, y2
+
+
+def compute_inference_roi(frame, config: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    ROI de inferencia para un frame a partir del ArUco base y la junta seleccionada.
+
+    Si se recibe un FrameContext, la detección del ArUco y la ROI quedan cacheadas en él.
+
+    Args:
+        frame: Frame de OpenCV o FrameContext
+        config: config.json completo (None = leerlo)
+
+    Returns:
+        {'roi': (x1, y1, x2, y2), 'roi_mm': dict, 'base': pose del ArUco base,
+         'source': origen de la pose} o None si la ROI está deshabilitada o no hay ArUco base
+    """
+    ctx = ensure_context(frame)
+    if ctx is None:
+        return None
+    config = config if config is not None else config_store.load()
+    return ctx._memo(('inference_roi', _roi_config_key(config)), lambda: _compute_inference_roi(ctx, config))
+
+
+def _roi_config_key(config: Dict[str, Any]) -> tuple:
+    """Parte de la configuración que define la ROI (clave de caché en el FrameContext)"""
+    vision_config = config.get('vision', {})
+    base_config = config.get('aruco', {}).get('base', {})
+    roi_items = tuple(sorted((k, repr(v)) for k, v in vision_config.items() if k.startswith('roi_')))
+    return roi_items + (('base_id', base_config.get('reference_id')),)
+
+
+def _compute_inference_roi(ctx: FrameContext, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    vision_config = config.get('vision', {})
+    if not vision_config.get('roi_enabled', False):
+        return None
+
+    detection = ctx._memo(('aruco_detection',),
+                          lambda: detect_arucos_with_saved_reference(ctx, config.get('aruco', {})))
+    base_pose = detection.get('detected_arucos', {}).get(detection.get('frame_aruco_id'))
+    if not detection.get('frame_detected') or base_pose is None:
+        print("[roi] ⚠️ ArUco base no detectado, inferencia sobre el frame completo")
+        return None
+
+    roi_mm = get_roi_rectangle_mm(vision_config, get_selected_junta_dimensions_mm())
+    roi = roi_mm_to_pixels(roi_mm, base_pose, ctx.shape,
+                           int(vision_config.get('roi_margin_px', DEFAULT_MARGIN_PX)))
+    if roi is None:
+        print(f"[roi] ⚠️ ROI fuera del frame ({roi_mm}), inferencia sobre el frame completo")
+        return None
+
+    return {'roi': roi, 'roi_mm': roi_mm, 'base': base_pose, 'source': detection.get('source')}
+
+# ============================================================
+# MAPEO DE RESULTADOS AL FRAME
+# ============================================================
+
+def _shift_obb(obb: Dict[str, Any], ox: int, oy: int) -> Dict[str, Any]:
+    x1, y1, x2, y2 = obb['bbox']
+    return dict(obb,
+                center=(obb['center'][0] + ox, obb['center'][1] + oy),
+                points=obb['points'] + np.array([ox, oy], dtype=obb['points'].dtype),
+                bbox=(x1 + ox, y1 + oy, x2 + ox, y2 + oy))
+
+
+def _paste_mask(det: Dict[str, Any], roi: Tuple[int, int, int, int], frame_shape) -> Optional[np.ndarray]:
+    """Máscara del recorte pegada en una máscara del tamaño del frame"""
+    mask = yolo_detector.detection_mask(det)
+    if mask is None:
+        return None
+    x1, y1, x2, y2 = roi
+    full_mask = np.zeros(frame_shape[:2], dtype=np.uint8)
+    full_mask[y1:y2, x1:x2] = mask
+    return full_mask
+
+
+def _shift_gasket_result(result: Dict[str, Any], roi: Tuple[int, int, int, int], frame_shape) -> Dict[str, Any]:
+    """Lleva el resultado de infer_gasket() sobre el recorte a coordenadas del frame (máscaras bajo demanda)"""
+    x1, y1, x2, y2 = roi
+    detections = []
+    for det in result['detections']:
+        bx1, by1, bx2, by2 = det['bbox']
+        has_mask = det.get('mask') is not None or det.get('_mask_loader') is not None
+        detections.append(dict(det,
+                               bbox=(bx1 + x1, by1 + y1, bx2 + x1, by2 + y1),
+                               obb=_shift_obb(det['obb'], x1, y1) if det['obb'] is not None else None,
+                               mask=None,
+                               _mask_loader=partial(_paste_mask, det, roi, frame_shape) if has_mask else None))
+
+    return dict(result, detections=detections, best=detections[0] if detections else None,
+                frame_shape=tuple(frame_shape[:2]))
+
+# ============================================================
+# INFERENCIA SOBRE LA ROI
+# ============================================================
+
+def infer_gasket_roi(frame, conf_threshold: float = 0.5,
+                     config: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    infer_gasket() restringido a la ROI de la junta.
+
+    Returns:
+        Resultado de infer_gasket() en coordenadas del frame (máscaras del tamaño del
+        frame vía yolo_detector.detection_mask()) más 'roi': (x1, y1, x2, y2) o None
+        si se usó el frame completo
+    """
+    ctx = ensure_context(frame)
+    if ctx is None:
+        return None
+
+    roi_info = compute_inference_roi(ctx, config)
+    if roi_info is None:
+        result = yolo_detector.infer_gasket(ctx, conf_threshold)
+        return dict(result, roi=None) if result is not None else None
+
+    def run():
+        x1, y1, x2, y2 = roi_info['roi']
+        result = yolo_detector.infer_gasket(ctx.frame[y1:y2, x1:x2], conf_threshold)
+        if result is None:
+            return None
+        return dict(_shift_gasket_result(result, roi_info['roi'], ctx.shape), roi=roi_info['roi'])
+
+    return ctx._memo(('yolo_gasket_roi', float(conf_threshold), roi_info['roi']), run)
+
+
+def detect_holes_roi(frame, conf_threshold: float = 0.5,
+                     config: Optional[Dict[str, Any]] = None) -> List[Tuple[int, int]]:
+    """detect_holes() restringido a la ROI de la junta. Returns: centros en coordenadas del frame"""
+    ctx = ensure_context(frame)
+    if ctx is None:
+        return []
+
+    roi_info = compute_inference_roi(ctx, config)
+    if roi_info is None:
+        return yolo_detector.detect_holes(ctx, conf_threshold)
+
+    x1, y1, x2, y2 = roi_info['roi']
+    centers = yolo_detector.detect_holes(ctx.frame[y1:y2, x1:x2], conf_threshold)
+    return [(cx + x1, cy + y1) for cx, cy in centers]
+
+
+def detect_holes_bboxes_roi(frame, conf_threshold: float = 0.5,
+                            config: Optional[Dict[str, Any]] = None) -> List[dict]:
+    """detect_holes_bboxes() restringido a la ROI de la junta. Returns: bboxes en coordenadas del frame"""
+    ctx = ensure_context(frame)
+    if ctx is None:
+        return []
+
+    roi_info = compute_inference_roi(ctx, config)
+    if roi_info is None:
+        return yolo_detector.detect_holes_bboxes(ctx, conf_threshold)
+
+    x1, y1, x2, y2 = roi_info['roi']
+    detections = yolo_detector.detect_holes_bboxes(ctx.frame[y1:y2, x1:x2], conf_threshold)
+    return [{'bbox': (bx1 + x1, by1 + y1, bx2 + x1, by2 + y1)}
+            for bx1, by1, bx2, by2 in (d['bbox'] for d in detections)]
+
+
+def detect_holes_tiled_roi(frame, conf_threshold: float = 0.5,
+                           config: Optional[Dict[str, Any]] = None, **tiling) -> List[dict]:
+    """
+    detect_holes_tiled() recorriendo solo la ROI de la junta (frame completo si no hay ROI).
+
+    Args:
+        tiling: tile_size, overlap, iou_threshold, batch_size (ver yolo_detector.detect_holes_tiled)
+
+    Returns:
+        [{'bbox': (x1, y1, x2, y2) en el frame, 'confidence': float}, ...]
+    """
+    ctx = ensure_context(frame)
+    if ctx is None:
+        return []
+
+    roi_info = compute_inference_roi(ctx, config)
+    region = roi_info['roi'] if roi_info is not None else None
+    return yolo_detector.detect_holes_tiled(ctx, conf_threshold, region, **tiling)
@@ -0,0 +1,237 @@
+# undistortion.py - Corrección de distorsión de lente con mapas cacheados
+"""
+Undistortion - COMAU-VISION
+===========================
+
+Corrección de distorsión de lente a partir de camera_calibration.json.
+
+Los mapas de initUndistortRectifyMap se calculan UNA vez por resolución y se
+reutilizan; aplicar la corrección es luego un cv2.remap. Tres modos de uso:
+
+- undistort_frame(frame):        frame completo
+- undistort_roi(frame, roi):     solo una región del resultado (remap de la submatriz de mapas)
+- undistort_points(points, ...): solo un conjunto de puntos (cv2.undistortPoints), sin tocar la imagen
+
+distort_points() es la inversa de undistort_points() (imagen corregida → original): lleva
+geometría calculada sin distorsión de vuelta al frame crudo de la cámara.
+
+Se conserva la matriz de cámara original como matriz de salida, de modo que la
+escala en píxeles de la imagen corregida coincide con la de la original.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    cv2 = None
+    OPENCV_AVAILABLE = False
+
+# ============================================================
+# ESTADO GLOBAL
+# ============================================================
+CALIBRATION_FILE = "camera_calibration.json"
+
+_lock = threading.Lock()
+_calibration: Optional[Dict[str, object]] = None
+_maps: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]] = {}
+_calibration_missing_logged = False
+
+# ============================================================
+# CALIBRACIÓN
+# ============================================================
+
+def load_calibration(calibration_file: str = CALIBRATION_FILE) -> Optional[Dict[str, object]]:
+    """
+    Carga la calibración de la cámara (una sola vez).
+    Returns: {'camera_matrix', 'dist_coeffs', 'resolution'} o None si no existe
+    """
+    global _calibration, _calibration_missing_logged
+    with _lock:
+        if _calibration is not None:
+            return _calibration
+
+        if not os.path.exists(calibration_file):
+            if not _calibration_missing_logged:
+                print(f"[undistort] ⚠️ {calibration_file} no encontrado, corrección deshabilitada")
+                _calibration_missing_logged = True
+            return None
+
+        try:
+            with open(calibration_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            _calibration = {
+                'camera_matrix': np.array(data['camera_matrix'], dtype=np.float64),
+                'dist_coeffs': np.array(data['distortion_coefficients'], dtype=np.float64).reshape(1, -1),
+                'resolution': tuple(data.get('resolution') or ())
+            }
+            print(f"[undistort] ✓ Calibración cargada ({calibration_file}, "
+                  f"error de reproyección {data.get('reprojection_error', '-')})")
+        except Exception as e:
+            print(f"[undistort] ❌ Error cargando {calibration_file}: {e}")
+            return None
+        return _calibration
+
+
+def reload_calibration() -> None:
+    """Descarta la calibración y los mapas cacheados (p. ej. tras recalibrar la cámara)"""
+    global _calibration, _calibration_missing_logged
+    with _lock:
+        _calibration = None
+        _calibration_missing_logged = False
+        _maps.clear()
+
+
+def is_calibration_available() -> bool:
+    """Indica si hay calibración de cámara disponible"""
+    return OPENCV_AVAILABLE and load_calibration() is not None
+
+
+def get_camera_matrix(width: int, height: int) -> Optional[np.ndarray]:
+    """
+    Matriz de cámara escalada a la resolución indicada.
+    La calibración se hizo a una resolución concreta; para otras resoluciones
+    (mismo sensor) se escalan focales y punto principal.
+    """
+    calibration = load_calibration()
+    if calibration is None:
+        return None
+
+    camera_matrix = calibration['camera_matrix'].copy()
+    resolution = calibration['resolution']
+    if len(resolution) == 2 and tuple(resolution) != (width, height):
+        sx = width / float(resolution[0])
+        sy = height / float(resolution[1])
+        camera_matrix[0, 0] *= sx
+        camera_matrix[0, 2] *= sx
+        camera_matrix[1, 1] *= sy
+        camera_matrix[1, 2] *= sy
+    return camera_matrix
+
+# ============================================================
+# MAPAS DE CORRECCIÓN
+# ============================================================
+
+def get_undistort_maps(width: int, height: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Mapas de remap para la resolución indicada (calculados una vez y cacheados).
+    Returns: (map1, map2) en formato CV_16SC2, o None sin calibración
+    """
+    key = (int(width), int(height))
+    maps = _maps.get(key)
+    if maps is not None:
+        return maps
+
+    camera_matrix = get_camera_matrix(*key)
+    if camera_matrix is None:
+        return None
+
+    with _lock:
+        maps = _maps.get(key)
+        if maps is None:
+            maps = cv2.initUndistortRectifyMap(
+                camera_matrix, _calibration['dist_coeffs'], None,
+                camera_matrix, key, cv2.CV_16SC2
+            )
+            _maps[key] = maps
+            print(f"[undistort] 🗺️ Mapas de corrección calculados para {key[0]}x{key[1]}")
+    return maps
+
+# ============================================================
+# APLICACIÓN
+# ============================================================
+
+def undistort_frame(frame: np.ndarray, interpolation: int = None) -> np.ndarray:
+    """
+    Frame completo sin distorsión (remap con mapas cacheados).
+    Sin calibración devuelve el frame original.
+    """
+    if not OPENCV_AVAILABLE or frame is None:
+        return frame
+
+    h, w = frame.shape[:2]
+    maps = get_undistort_maps(w, h)
+    if maps is None:
+        return frame
+    return cv2.remap(frame, maps[0], maps[1],
+                     cv2.INTER_LINEAR if interpolation is None else interpolation)
+
+
+def undistort_roi(frame: np.ndarray, roi: Tuple[int, int, int, int], interpolation: int = None) -> np.ndarray:
+    """
+    Solo la región (x1, y1, x2, y2) de la imagen corregida.
+
+    Se remapea la submatriz de los mapas: el costo es proporcional al área de la
+    región, no al frame completo. Las coordenadas del resultado son las de la
+    imagen corregida desplazadas por (x1, y1).
+    """
+    if not OPENCV_AVAILABLE or frame is None:
+        return frame
+
+    h, w = frame.shape[:2]
+    x1, y1, x2, y2 = roi
+    x1, x2 = max(0, int(x1)), min(w, int(x2))
+    y1, y2 = max(0, int(y1)), min(h, int(y2))
+
+    maps = get_undistort_maps(w, h)
+    if maps is None:
+        return frame[y1:y2, x1:x2]
+    return cv2.remap(frame, maps[0][y1:y2, x1:x2], maps[1][y1:y2, x1:x2],
+                     cv2.INTER_LINEAR if interpolation is None else interpolation)
+
+
+def undistort_points(points, image_size: Tuple[int, int]) -> np.ndarray:
+    """
+    Corrige un conjunto de puntos en píxeles, sin procesar la imagen.
+
+    Args:
+        points: Puntos [[x, y], ...] en la imagen original
+        image_size: (width, height) de la imagen de la que provienen
+
+    Returns:
+        Array Nx2 con los puntos en la imagen corregida (iguales si no hay calibración)
+    """
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+    if not OPENCV_AVAILABLE or len(pts) == 0:
+        return pts.reshape(-1, 2)
+
+    camera_matrix = get_camera_matrix(int(image_size[0]), int(image_size[1]))
+    if camera_matrix is None:
+        return pts.reshape(-1, 2)
+
+    corrected = cv2.undistortPoints(pts, camera_matrix, _calibration['dist_coeffs'], P=camera_matrix)
+    return corrected.reshape(-1, 2)
+
+
+def distort_points(points, image_size: Tuple[int, int]) -> np.ndarray:
+    """
+    Inversa de undistort_points(): lleva puntos de la imagen corregida a la imagen
+    original (con distorsión), reproyectándolos con el modelo de la cámara.
+
+    Args:
+        points: Puntos [[x, y], ...] en la imagen corregida
+        image_size: (width, height) de la imagen
+
+    Returns:
+        Array Nx2 con los puntos en la imagen original (iguales si no hay calibración)
+    """
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if not OPENCV_AVAILABLE or len(pts) == 0:
+        return pts
+
+    camera_matrix = get_camera_matrix(int(image_size[0]), int(image_size[1]))
+    if camera_matrix is None:
+        return pts
+
+    # Coordenadas normalizadas (z = 1) proyectadas con distorsión, sin rotación ni traslación
+    normalized = (pts - camera_matrix[:2, 2]) / np.diag(camera_matrix)[:2]
+    object_points = np.column_stack([normalized, np.ones(len(pts))]).reshape(-1, 1, 3)
+    distorted, _ = cv2.projectPoints(object_points, np.zeros(3), np.zeros(3),
+                                     camera_matrix, _calibration['dist_coeffs'])
+    return distorted.reshape(-1, 2)
@@ -0,0 +1,148 @@
+# vision_client.py - Cliente HTTP compartido para el servidor de visión
+"""
+Vision Client - COMAU-VISION
+============================
+
+Un único requests.Session con pool de conexiones keep-alive para todas las
+llamadas al servidor de visión (análisis, configuración, estado). Cada llamada
+reutiliza una conexión TCP abierta en lugar de abrir una nueva.
+
+- Endpoint: IP y puerto de config.json → vision desde config_store (copia en
+  memoria, se vuelve a parsear solo cuando el archivo cambia).
+- Tiempos por llamada: cantidad, errores, último, medio y máximo (ms) por método y ruta.
+
+Las funciones devuelven el requests.Response y propagan las excepciones de
+requests, igual que requests.get/post/patch.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src import config_store
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+CONFIG_FILE = 'config.json'
+DEFAULT_IP = '127.0.0.1'
+DEFAULT_PORT = 8000
+DEFAULT_TIMEOUT_S = 5
+POOL_SIZE = 4               # Conexiones keep-alive simultáneas al servidor
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+_timings: Dict[str, Dict[str, Any]] = {}
+_timings_lock = threading.Lock()
+
+# ============================================================
+# SESIÓN Y ENDPOINT
+# ============================================================
+
+def get_session() -> requests.Session:
+    """Sesión compartida (se crea en la primera llamada)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def _read_endpoint() -> Tuple[str, Optional[int]]:
+    try:
+        vision_config = config_store.get_section('vision', path=CONFIG_FILE)
+    except Exception as e:
+        print(f"[vision_client] ⚠️ No se pudo leer {CONFIG_FILE}, usando {DEFAULT_IP}: {e}")
+        vision_config = {}
+    return vision_config.get('vision_server_ip', DEFAULT_IP), vision_config.get('vision_server_port')
+
+
+def get_base_url(default_port: int = DEFAULT_PORT) -> str:
+    """
+    URL base del servidor de visión (http://ip:puerto).
+
+    Args:
+        default_port: Puerto a usar si config.json no define vision_server_port
+    """
+    ip, port = _read_endpoint()
+    return f"http://{ip}:{port or default_port}"
+
+
+def invalidate_endpoint() -> None:
+    """Fuerza releer IP y puerto de disco en la próxima llamada"""
+    config_store.invalidate(CONFIG_FILE)
+
+# ============================================================
+# LLAMADAS
+# ============================================================
+
+def _record(key: str, elapsed_ms: float, error: bool) -> None:
+    with _timings_lock:
+        stats = _timings.setdefault(key, {'count': 0, 'errors': 0, 'last_ms': 0.0, 'avg_ms': 0.0, 'max_ms': 0.0})
+        stats['count'] += 1
+        stats['errors'] += int(error)
+        stats['last_ms'] = round(elapsed_ms, 2)
+        stats['avg_ms'] = round(stats['avg_ms'] + (elapsed_ms - stats['avg_ms']) / stats['count'], 2)
+        stats['max_ms'] = round(max(stats['max_ms'], elapsed_ms), 2)
+
+
+def request(method: str, path: str, timeout: float = DEFAULT_TIMEOUT_S,
+            default_port: int = DEFAULT_PORT, **kwargs) -> requests.Response:
+    """
+    Llamada HTTP al servidor de visión con la sesión compartida.
+
+    Args:
+        method: 'GET', 'POST', 'PATCH', ...
+        path: Ruta del servidor (p. ej. '/process/')
+        timeout: Timeout en segundos
+        default_port: Puerto si config.json no lo define
+        kwargs: Argumentos de requests (json, files, headers, ...)
+
+    Returns:
+        requests.Response (las excepciones de requests se propagan)
+    """
+    url = get_base_url(default_port) + path
+    key = f"{method.upper()} {path}"
+    start = time.perf_counter()
+    try:
+        response = get_session().request(method, url, timeout=timeout, **kwargs)
+    except requests.exceptions.RequestException:
+        _record(key, (time.perf_counter() - start) * 1000.0, error=True)
+        raise
+    _record(key, (time.perf_counter() - start) * 1000.0, error=response.status_code >= 400)
+    return response
+
+
+def get(path: str, **kwargs) -> requests.Response:
+    return request('GET', path, **kwargs)
+
+
+def post(path: str, **kwargs) -> requests.Response:
+    return request('POST', path, **kwargs)
+
+
+def patch(path: str, **kwargs) -> requests.Response:
+    return request('PATCH', path, **kwargs)
+
+
+def get_timings() -> Dict[str, Dict[str, Any]]:
+    """Tiempos por llamada: {'METODO /ruta': {'count', 'errors', 'last_ms', 'avg_ms', 'max_ms'}}"""
+    with _timings_lock:
+        return {key: dict(stats) for key, stats in _timings.items()}
+
+
+def close() -> None:
+    """Cierra las conexiones del pool (se recrea en la próxima llamada)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -10,26 +10,106 @@ Maneja la carga y guardado de configuraciones desde/hacia config.json.
 import os
 import json
 
+import requests
+
+from src import config_store
+from src.vision import frame_transport, vision_client
+
 
 def _load_config():
     """Cargar configuración desde config.json"""
     try:
-        with open('config.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return config_store.load()
     except Exception as e:
         print(f"[vision_manager] Error cargando config.json: {e}")
         return {}
 
 
-def _save_config(config):
-    """Guardar configuración en config.json"""
+# Dimensiones por defecto de la junta (mm) si no hay una junta parametrizada seleccionada
+DEFAULT_JUNTA_DIMENSIONS_MM = (200, 150)
+
+
+def get_selected_junta_dimensions_mm(config_path='config.json'):
+    """
+    Ancho y alto (mm) de la junta seleccionada en juntas.json.
+    
+    Se busca juntas.json junto a config.json o en el directorio actual. Las
+    dimensiones salen de parametros_proporcionales (ancho/alto_junta_px) y px_mm,
+    igual que parametrosManager.get_valor en el frontend.
+    
+    Returns:
+        tuple: (width_mm, height_mm); DEFAULT_JUNTA_DIMENSIONS_MM si no hay datos
+    """
+    width_base_mm, height_base_mm = DEFAULT_JUNTA_DIMENSIONS_MM
+    
     try:
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
-        return True
+        # Buscar juntas.json en el mismo directorio que config.json o en el directorio actual
+        juntas_path = None
+        if os.path.dirname(config_path):
+            juntas_path = os.path.join(os.path.dirname(config_path), 'juntas.json')
+        else:
+            juntas_path = 'juntas.json'
+        
+        if not os.path.exists(juntas_path):
+            # Intentar en el directorio actual
+            juntas_path = os.path.join(os.getcwd(), 'juntas.json')
+        
+        if os.path.exists(juntas_path):
+            with open(juntas_path, 'r', encoding='utf-8') as f:
+                juntas_db = json.load(f)
+            
+            selected_id = juntas_db.get('selected_id')
+            if selected_id is not None:
+                juntas = juntas_db.get('juntas', [])
+                junta = next((j for j in juntas if j.get('id') == selected_id), None)
+                
+                if junta:
+                    # Verificar si la junta está parametrizada
+                    if junta.get('parametrizado') and junta.get('parametros_proporcionales'):
+                        px_mm = junta.get('px_mm', 1.0)
+                        parametros = junta.get('parametros_proporcionales', {})
+                        
+                        # Obtener ancho y alto desde parametros_proporcionales
+                        ancho_junta_px = parametros.get('ancho_junta_px')
+                        alto_junta_px = parametros.get('alto_junta_px')
+                        
+                        if ancho_junta_px is not None and alto_junta_px is not None:
+                            # Calcular dimensiones en mm (igual que parametrosManager.get_valor)
+                            width_base_mm = ancho_junta_px / px_mm
+                            height_base_mm = alto_junta_px / px_mm
+                            print(f"[vision_manager] 📐 Dimensiones obtenidas de junta seleccionada ({junta.get('nombre', 'Unknown')}): {width_base_mm:.1f}mm x {height_base_mm:.1f}mm")
+                        else:
+                            print(f"[vision_manager] ⚠️ Junta parametrizada pero no tiene ancho_junta_px/alto_junta_px, usando valores por defecto")
+                    else:
+                        print(f"[vision_manager] ⚠️ Junta no parametrizada, usando valores por defecto")
     except Exception as e:
-        print(f"[vision_manager] Error guardando config.json: {e}")
-        return False
+        print(f"[vision_manager] ⚠️ No se pudo obtener junta seleccionada, usando valores por defecto: {e}")
+    
+    return width_base_mm, height_base_mm
+
+
+def get_roi_rectangle_mm(vision_config, junta_dimensions_mm):
+    """
+    Rectángulo ROI en mm relativo al ArUco base (formato 'roi_rectangulo' del servidor de visión).
+    
+    Args:
+        vision_config (dict): Sección 'vision' de config.json (roi_offset_*_mm, roi_zoom_*_percent)
+        junta_dimensions_mm (tuple): (ancho, alto) de la junta en mm
+    
+    Returns:
+        dict: {'x_mm', 'y_mm', 'width_mm', 'height_mm', 'rotation'}
+    """
+    width_base_mm, height_base_mm = junta_dimensions_mm
+    roi_zoom_x_percent = vision_config.get('roi_zoom_x_percent', 100)
+    roi_zoom_y_percent = vision_config.get('roi_zoom_y_percent', 100)
+    
+    return {
+        'x_mm': vision_config.get('roi_offset_x_mm', 0),
+        'y_mm': vision_config.get('roi_offset_y_mm', 0),
+        'width_mm': int((roi_zoom_x_percent * width_base_mm) / 100),
+        'height_mm': int((roi_zoom_y_percent * height_base_mm) / 100),
+        'rotation': 0
+    }
 
 
 def server_test():
@@ -46,36 +126,40 @@ def server_test():
         # Importar dependencias
         import cv2
         import base64
-        import requests
         import numpy as np
         from src.vision import camera_manager
         
         # Capturar frame del streaming
         print("[vision_manager] 📸 Capturando frame del streaming...")
-        image = camera_manager.get_frame_raw()
+        frame_ctx = camera_manager.get_frame_context()
         
-        if image is None:
+        if frame_ctx is None:
             return {
                 'ok': False,
                 'error': 'Error capturando imagen',
                 'mensaje': 'No se pudo capturar el frame'
             }
         
-        # Convertir imagen a bytes para envío
-        _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])
-        image_bytes = buffer.tobytes()
+        config = _load_config()
         
-        # Enviar imagen al servidor de procesamiento
-        print("[vision_manager] 📤 Enviando imagen al servidor de procesamiento...")
-        cfg = _load_config().get('vision', {})
-        vision_ip = cfg.get('vision_server_ip', '127.0.0.1')
-        vision_port = cfg.get('vision_server_port', 8000)
-        url = f"http://{vision_ip}:{vision_port}/process/"
+        # Con aruco.base.correct_perspective se envía el frame rectificado (mapas cacheados).
+        # El JPEG solo se codifica si el servidor es remoto (codificación cacheada en el contexto).
+        from src.vision.aruco_manager import prepare_rectification
+        if prepare_rectification(frame_ctx, config.get('aruco', {})):
+            print("[vision_manager] 📐 Enviando frame con perspectiva rectificada")
+            frame_to_send = frame_ctx.rectified()
+            encode_jpeg = lambda: cv2.imencode('.jpg', frame_to_send, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+        else:
+            frame_to_send = frame_ctx.frame
+            encode_jpeg = lambda: frame_ctx.jpeg(90)
         
-        files = {"file": ("capture.jpg", image_bytes, "image/jpeg")}
+        # Enviar imagen al servidor de procesamiento: memoria compartida si es local, si no JPEG/HTTP
+        print("[vision_manager] 📤 Enviando imagen al servidor de procesamiento...")
         
         try:
-            response = requests.post(url, files=files, timeout=5)
+            response = frame_transport.send_frame(frame_to_send, encode_jpeg,
+                                                  use_shm=config.get('vision', {}).get('shm_transport', True),
+                                                  timeout=5)
             
             if response.status_code == 200:
                 data = response.json()
@@ -131,90 +215,74 @@ def server_test():
         }
 
 
+def build_aruco_payload(config):
+    """
+    Secciones 'aruco_config' y 'troqueladora' de la configuración del servidor de visión.
+    
+    Args:
+        config (dict): config.json completo
+    
+    Returns:
+        dict: {'aruco_config': {...}, 'troqueladora': {...}}
+    """
+    aruco_config = config.get('aruco', {})
+    base_config = aruco_config.get('base', {})
+    tool_config = aruco_config.get('tool', {})
+    
+    return {
+        'aruco_config': {
+            'aruco_base_id': base_config.get('reference_id', 0),
+            'aruco_base_size_mm': base_config.get('marker_size_mm', 70.0),
+            'aruco_tool_id': tool_config.get('reference_id', 0),
+            'aruco_tool_size_mm': tool_config.get('marker_size_mm', 50.0)
+        },
+        'troqueladora': {
+            'x_mm': int(round(base_config.get('troqueladora_center_x_mm', 0))),
+            'y_mm': int(round(base_config.get('troqueladora_center_y_mm', 0))),
+            'diametro_mm': 10  # Diámetro por defecto del círculo del centro del troquel
+        }
+    }
+
+
+def build_roi_payload(config, config_path='config.json'):
+    """
+    Sección 'roi_rectangulo' de la configuración del servidor de visión
+    (dimensiones de la junta seleccionada en juntas.json con el zoom de config.json).
+    
+    Returns:
+        dict: {'roi_rectangulo': {'x_mm', 'y_mm', 'width_mm', 'height_mm', 'rotation'}}
+    """
+    junta_dimensions_mm = get_selected_junta_dimensions_mm(config_path)
+    return {'roi_rectangulo': get_roi_rectangle_mm(config.get('vision', {}), junta_dimensions_mm)}
+
+
 def configure_vision_server(lista_muescas_mm=None, roi_rectangulo=None, vision_server_port=8000):
     """
-    Configura variables específicas en el servidor de visión usando PATCH /config/
+    Configura muescas en el servidor de visión (vía config_sync: un único PATCH /config/
+    con todo lo que cambió desde la última configuración aceptada).
     
     Args:
         lista_muescas_mm (list): Lista de muescas en formato [{"x": int, "y": int}, ...]
-        roi_rectangulo (dict): Configuración ROI en formato {"x_mm": int, "y_mm": int, ...}
-        vision_server_port (int): Puerto del servidor de visión (default: 8000)
+        roi_rectangulo (dict): Ignorado: la ROI se deriva de config.json y juntas.json
+                               (mismo cálculo que el frontend)
+        vision_server_port (int): Puerto si config.json no lo define (default: 8000)
     
     Returns:
-        dict: Resultado de la configuración
+        dict: Resultado de la configuración (ver config_sync.sync)
     """
-    try:
-        print("[vision_manager] 🔧 Configurando servidor de visión...")
-        
-        import requests
-        
-        # Construir payload para PATCH
-        payload = {}
-        
-        if lista_muescas_mm is not None:
-            payload["lista_muescas_mm"] = lista_muescas_mm
-            print(f"[vision_manager] 📍 Configurando {len(lista_muescas_mm)} muescas")
-        
-        if roi_rectangulo is not None:
-            payload["roi_rectangulo"] = roi_rectangulo
-            print(f"[vision_manager] 📐 Configurando ROI: {roi_rectangulo}")
-        
-        if not payload:
-            return {
-                'ok': False,
-                'error': 'No se proporcionaron datos para configurar',
-                'mensaje': 'Debe especificar lista_muescas_mm o roi_rectangulo'
-            }
-        
-        # Enviar configuración al servidor
-        cfg = _load_config().get('vision', {})
-        vision_ip = cfg.get('vision_server_ip', '127.0.0.1')
-        vision_port = cfg.get('vision_server_port', vision_server_port)
-        url = f"http://{vision_ip}:{vision_port}/config/"
-        
-        try:
-            response = requests.patch(
-                url, 
-                json=payload, 
-                headers={'Content-Type': 'application/json'},
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                config_data = response.json()
-                print(f"[vision_manager] ✅ Configuración aplicada exitosamente")
-                
-                return {
-                    'ok': True,
-                    'mensaje': 'Configuración aplicada correctamente',
-                    'config': config_data
-                }
-                
-            else:
-                print(f"[vision_manager] ❌ Error del servidor: {response.status_code}")
-                return {
-                    'ok': False,
-                    'error': f'Error del servidor: {response.status_code}',
-                    'mensaje': 'Error aplicando configuración'
-                }
-                
-        except requests.exceptions.RequestException as e:
-            print(f"[vision_manager] ❌ Error de conexión: {e}")
-            return {
-                'ok': False,
-                'error': f'Error de conexión: {str(e)}',
-                'mensaje': 'No se pudo conectar al servidor de visión'
-            }
-
-    except Exception as e:
-        print(f"[vision_manager] ❌ Error en configure_vision_server: {e}")
-        import traceback
-        traceback.print_exc()
+    from src.vision import config_sync
+    
+    if lista_muescas_mm is None and roi_rectangulo is None:
         return {
             'ok': False,
-            'error': str(e),
-            'mensaje': 'Error en configuración'
+            'error': 'No se proporcionaron datos para configurar',
+            'mensaje': 'Debe especificar lista_muescas_mm o roi_rectangulo'
         }
+    
+    if lista_muescas_mm is not None:
+        print(f"[vision_manager] 📍 Configurando {len(lista_muescas_mm)} muescas")
+        config_sync.set_muescas(lista_muescas_mm)
+    return config_sync.sync(default_port=vision_server_port)
 
 
 def get_vision_server_config(vision_server_port=8000):
@@ -222,7 +290,7 @@ def get_vision_server_config(vision_server_port=8000):
     Obtiene la configuración actual del servidor de visión usando GET /config/
     
     Args:
-        vision_server_port (int): Puerto del servidor de visión (default: 8000)
+        vision_server_port (int): Puerto si config.json no lo define (default: 8000)
     
     Returns:
         dict: Configuración del servidor
@@ -230,15 +298,8 @@ def get_vision_server_config(vision_server_port=8000):
     try:
         print("[vision_manager] 📥 Obteniendo configuración del servidor de visión...")
         
-        import requests
-        
-        cfg = _load_config().get('vision', {})
-        vision_ip = cfg.get('vision_server_ip', '127.0.0.1')
-        vision_port = cfg.get('vision_server_port', vision_server_port)
-        url = f"http://{vision_ip}:{vision_port}/config/"
-        
         try:
-            response = requests.get(url, timeout=5)
+            response = vision_client.get('/config/', timeout=5, default_port=vision_server_port)
             
             if response.status_code == 200:
                 config_data = response.json()
@@ -279,283 +340,45 @@ def get_vision_server_config(vision_server_port=8000):
 
 def configure_aruco_vision_server(config_path='config.json', vision_server_port=8000):
     """
-    Configura los parámetros de ArUcos en el servidor de visión usando PATCH /config/
-    Lee los datos desde config.json y los envía al servidor de visión.
+    Sincroniza ArUcos y troqueladora (y el resto de la configuración) con el servidor de
+    visión. Solo se envía un PATCH /config/ si algo cambió (ver config_sync.sync).
     
     Args:
         config_path (str): Ruta al archivo config.json (default: 'config.json')
-        vision_server_port (int): Puerto del servidor de visión (default: 8000)
+        vision_server_port (int): Puerto si config.json no lo define (default: 8000)
     
     Returns:
         dict: Resultado de la configuración
     """
-    try:
-        print("[vision_manager] 🔧 Configurando ArUcos en servidor de visión...")
-        
-        import requests
-        import json
-        import os
-        
-        # Cargar configuración desde config.json
-        if not os.path.exists(config_path):
-            return {
-                'ok': False,
-                'error': f'Archivo de configuración no encontrado: {config_path}',
-                'mensaje': 'No se pudo leer la configuración'
-            }
-        
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        
-        aruco_config = config.get('aruco', {})
-        base_config = aruco_config.get('base', {})
-        tool_config = aruco_config.get('tool', {})
-        
-        # Construir payload para PATCH con la estructura que espera el servidor de visión
-        troqueladora_x = int(round(base_config.get('troqueladora_center_x_mm', 0)))
-        troqueladora_y = int(round(base_config.get('troqueladora_center_y_mm', 0)))
-        
-        payload = {
-            'aruco_config': {
-                'aruco_base_id': base_config.get('reference_id', 0),
-                'aruco_base_size_mm': base_config.get('marker_size_mm', 70.0),
-                'aruco_tool_id': tool_config.get('reference_id', 0),
-                'aruco_tool_size_mm': tool_config.get('marker_size_mm', 50.0)
-            },
-            'troqueladora': {
-                'x_mm': troqueladora_x,
-                'y_mm': troqueladora_y,
-                'diametro_mm': 10  # Diámetro por defecto del círculo del centro del troquel
-            }
-        }
-        
-        print(f"[vision_manager] 📋 Configuración ArUcos a enviar:")
-        print(f"  - Base ArUco ID: {payload['aruco_config']['aruco_base_id']}")
-        print(f"  - Tamaño Base: {payload['aruco_config']['aruco_base_size_mm']}mm")
-        print(f"  - Tool ArUco ID: {payload['aruco_config']['aruco_tool_id']}")
-        print(f"  - Tamaño Tool: {payload['aruco_config']['aruco_tool_size_mm']}mm")
-        print(f"  - Centro Troqueladora: ({payload['troqueladora']['x_mm']}, {payload['troqueladora']['y_mm']})mm")
-        print(f"  - Diámetro Troqueladora: {payload['troqueladora']['diametro_mm']}mm")
-        
-        # Enviar configuración al servidor
-        cfg = _load_config().get('vision', {})
-        vision_ip = cfg.get('vision_server_ip', '127.0.0.1')
-        vision_port = cfg.get('vision_server_port', vision_server_port)
-        url = f"http://{vision_ip}:{vision_port}/config/"
-        
-        try:
-            response = requests.patch(
-                url,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                config_data = response.json()
-                print(f"[vision_manager] ✅ Configuración de ArUcos aplicada exitosamente")
-                print(f"[vision_manager] 📥 Respuesta del servidor:")
-                print(f"  - Status: {response.status_code}")
-                print(f"  - Respuesta completa: {config_data}")
-                print(f"  - Configuración ArUcos recibida:")
-                if 'aruco_config' in config_data:
-                    aruco_resp = config_data['aruco_config']
-                    print(f"    - Base ID: {aruco_resp.get('aruco_base_id', 'N/A')}")
-                    print(f"    - Tamaño Base: {aruco_resp.get('aruco_base_size_mm', 'N/A')}mm")
-                    print(f"    - Tool ID: {aruco_resp.get('aruco_tool_id', 'N/A')}")
-                    print(f"    - Tamaño Tool: {aruco_resp.get('aruco_tool_size_mm', 'N/A')}mm")
-                
-                if 'troqueladora' in config_data:
-                    troqueladora_resp = config_data['troqueladora']
-                    print(f"    - Centro Troqueladora: ({troqueladora_resp.get('x_mm', 'N/A')}, {troqueladora_resp.get('y_mm', 'N/A')})mm")
-                    print(f"    - Diámetro: {troqueladora_resp.get('diametro_mm', 'N/A')}mm")
-                else:
-                    print(f"    - No se encontró configuración de troqueladora en la respuesta")
-                
-                return {
-                    'ok': True,
-                    'mensaje': 'Configuración de ArUcos aplicada correctamente',
-                    'config': config_data
-                }
-            
-            else:
-                print(f"[vision_manager] ❌ Error del servidor: {response.status_code}")
-                print(f"[vision_manager] Respuesta: {response.text}")
-                return {
-                    'ok': False,
-                    'error': f'Error del servidor: {response.status_code}',
-                    'mensaje': 'Error aplicando configuración de ArUcos'
-                }
-                
-        except requests.exceptions.RequestException as e:
-            print(f"[vision_manager] ❌ Error de conexión: {e}")
-            return {
-                'ok': False,
-                'error': f'Error de conexión: {str(e)}',
-                'mensaje': 'No se pudo conectar al servidor de visión'
-            }
+    from src.vision import config_sync
     
-    except Exception as e:
-        print(f"[vision_manager] ❌ Error en configure_aruco_vision_server: {e}")
-        import traceback
-        traceback.print_exc()
+    if not os.path.exists(config_path):
         return {
             'ok': False,
-            'error': str(e),
-            'mensaje': 'Error en configuración de ArUcos'
+            'error': f'Archivo de configuración no encontrado: {config_path}',
+            'mensaje': 'No se pudo leer la configuración'
         }
+    return config_sync.sync(config_path, default_port=vision_server_port)
 
 
 def configure_roi_vision_server(config_path='config.json', vision_server_port=8000):
     """
-    Configura los parámetros de ROI en el servidor de visión usando PATCH /config/
-    Lee los datos desde config.json y los envía al servidor de visión.
+    Sincroniza la ROI (y el resto de la configuración) con el servidor de visión.
+    Solo se envía un PATCH /config/ si algo cambió (ver config_sync.sync).
     
     Args:
         config_path (str): Ruta al archivo config.json (default: 'config.json')
-        vision_server_port (int): Puerto del servidor de visión (default: 8000)
+        vision_server_port (int): Puerto si config.json no lo define (default: 8000)
     
     Returns:
         dict: Resultado de la configuración
     """
-    try:
-        print("[vision_manager] 🔧 Configurando ROI en servidor de visión...")
-        
-        import requests
-        import json
-        import os
-        
-        # Cargar configuración desde config.json
-        if not os.path.exists(config_path):
-            return {
-                'ok': False,
-                'error': f'Archivo de configuración no encontrado: {config_path}',
-                'mensaje': 'No se pudo leer la configuración'
-            }
-        
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        
-        vision_config = config.get('vision', {})
-        
-        # Obtener dimensiones base de la junta seleccionada
-        width_base_mm = 200  # Valor por defecto
-        height_base_mm = 150  # Valor por defecto
-        
-        try:
-            # Intentar obtener la junta seleccionada desde juntas.json
-            # Buscar juntas.json en el mismo directorio que config.json o en el directorio actual
-            juntas_path = None
-            if os.path.dirname(config_path):
-                juntas_path = os.path.join(os.path.dirname(config_path), 'juntas.json')
-            else:
-                juntas_path = 'juntas.json'
-            
-            if not os.path.exists(juntas_path):
-                # Intentar en el directorio actual
-                juntas_path = os.path.join(os.getcwd(), 'juntas.json')
-            
-            if os.path.exists(juntas_path):
-                with open(juntas_path, 'r', encoding='utf-8') as f:
-                    juntas_db = json.load(f)
-                
-                selected_id = juntas_db.get('selected_id')
-                if selected_id is not None:
-                    juntas = juntas_db.get('juntas', [])
-                    junta = next((j for j in juntas if j.get('id') == selected_id), None)
-                    
-                    if junta:
-                        # Verificar si la junta está parametrizada
-                        if junta.get('parametrizado') and junta.get('parametros_proporcionales'):
-                            px_mm = junta.get('px_mm', 1.0)
-                            parametros = junta.get('parametros_proporcionales', {})
-                            
-                            # Obtener ancho y alto desde parametros_proporcionales
-                            ancho_junta_px = parametros.get('ancho_junta_px')
-                            alto_junta_px = parametros.get('alto_junta_px')
-                            
-                            if ancho_junta_px is not None and alto_junta_px is not None:
-                                # Calcular dimensiones en mm (igual que parametrosManager.get_valor)
-                                width_base_mm = ancho_junta_px / px_mm
-                                height_base_mm = alto_junta_px / px_mm
-                                print(f"[vision_manager] 📐 Dimensiones obtenidas de junta seleccionada ({junta.get('nombre', 'Unknown')}): {width_base_mm:.1f}mm x {height_base_mm:.1f}mm")
-                            else:
-                                print(f"[vision_manager] ⚠️ Junta parametrizada pero no tiene ancho_junta_px/alto_junta_px, usando valores por defecto")
-                        else:
-                            print(f"[vision_manager] ⚠️ Junta no parametrizada, usando valores por defecto")
-        except Exception as e:
-            print(f"[vision_manager] ⚠️ No se pudo obtener junta seleccionada, usando valores por defecto: {e}")
-        
-        # Obtener valores de zoom
-        roi_zoom_x_percent = vision_config.get('roi_zoom_x_percent', 100)
-        roi_zoom_y_percent = vision_config.get('roi_zoom_y_percent', 100)
-        
-        # Calcular dimensiones finales aplicando zoom
-        width_final = int((roi_zoom_x_percent * width_base_mm) / 100)
-        height_final = int((roi_zoom_y_percent * height_base_mm) / 100)
-        
-        # Construir payload para PATCH con la estructura de ROI
-        payload = {
-            'roi_rectangulo': {
-                'x_mm': vision_config.get('roi_offset_x_mm', 0),
-                'y_mm': vision_config.get('roi_offset_y_mm', 0),
-                'width_mm': width_final,
-                'height_mm': height_final,
-                'rotation': 0
-            }
-        }
-        
-        print(f"[vision_manager] 📋 Configuración ROI a enviar:")
-        print(f"  - Offset: ({payload['roi_rectangulo']['x_mm']}, {payload['roi_rectangulo']['y_mm']})mm")
-        print(f"  - Dimensiones base: {width_base_mm}mm x {height_base_mm}mm")
-        print(f"  - Zoom aplicado: {roi_zoom_x_percent}% x {roi_zoom_y_percent}%")
-        print(f"  - Dimensiones finales: {width_final}mm x {height_final}mm")
-        print(f"  - Rotación: {payload['roi_rectangulo']['rotation']}°")
-        
-        # Enviar configuración al servidor
-        url = f"http://127.0.0.1:{vision_server_port}/config/"
-        
-        try:
-            response = requests.patch(
-                url,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                config_data = response.json()
-                print(f"[vision_manager] ✅ Configuración de ROI aplicada exitosamente")
-                
-                return {
-                    'ok': True,
-                    'mensaje': 'Configuración de ROI aplicada correctamente',
-                    'config': config_data
-                }
-            
-            else:
-                print(f"[vision_manager] ❌ Error del servidor: {response.status_code}")
-                print(f"[vision_manager] Respuesta: {response.text}")
-                return {
-                    'ok': False,
-                    'error': f'Error del servidor: {response.status_code}',
-                    'mensaje': 'Error aplicando configuración de ROI'
-                }
-                
-        except requests.exceptions.RequestException as e:
-            print(f"[vision_manager] ❌ Error de conexión: {e}")
-            return {
-                'ok': False,
-                'error': f'Error de conexión: {str(e)}',
-                'mensaje': 'No se pudo conectar al servidor de visión'
-            }
+    from src.vision import config_sync
     
-    except Exception as e:
-        print(f"[vision_manager] ❌ Error en configure_roi_vision_server: {e}")
-        import traceback
-        traceback.print_exc()
+    if not os.path.exists(config_path):
         return {
             'ok': False,
-            'error': str(e),
-            'mensaje': 'Error en configuración de ROI'
-        }
\ No newline at end of file
+            'error': f'Archivo de configuración no encontrado: {config_path}',
+            'mensaje': 'No se pudo leer la configuración'
+        }
+    return config_sync.sync(config_path, default_port=vision_server_port)
@@ -0,0 +1,131 @@
+# vision_server_bench.py - Benchmark de punta a punta contra el servidor de visión
+"""
+Vision Server Bench - COMAU-VISION
+==================================
+
+Envía imágenes al servidor de visión configurado (config.json → vision) con el
+mismo camino que server_test() (vision_client + frame_transport) y mide la
+latencia de cada análisis por transporte:
+
+- shm:  frame crudo en memoria compartida + descriptor a /process_shm/ (servidor local)
+- jpeg: JPEG calidad 90 multipart a /process/
+
+Pensado para usarse con el servidor de referencia:
+
+    python local_vision_server.py --fake
+    python -m src.vision.vision_server_bench imagenes_juntas/ --requests 50 --transports shm jpeg
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import cv2
+import requests
+
+from src.vision import frame_transport, vision_client
+from src.vision.yolo_benchmark import _percentiles, list_images
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+DEFAULT_REQUESTS = 20
+DEFAULT_TRANSPORTS = ['shm', 'jpeg']
+JPEG_QUALITY = 90
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def bench_transport(transport: str, images: List, requests_count: int, timeout: float = 10) -> Dict[str, Any]:
+    """
+    Ejecuta requests_count análisis recorriendo las imágenes en ciclo.
+
+    Returns:
+        {'transport', 'requests', 'errors', 'latency_ms': percentiles, 'server_ms': percentiles}
+    """
+    latencies, server_times, errors = [], [], 0
+    for i in range(requests_count):
+        image = images[i % len(images)]
+        encode = lambda: cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])[1].tobytes()
+        start = time.perf_counter()
+        try:
+            response = frame_transport.send_frame(image, encode, use_shm=(transport == 'shm'), timeout=timeout)
+            data = response.json() if response.status_code == 200 else None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"[vision_bench] ❌ {transport}: {e}")
+            data = None
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        if data is None:
+            errors += 1
+        elif 'processing_ms' in data:
+            server_times.append(float(data['processing_ms']))
+
+    return {
+        'transport': transport,
+        'requests': requests_count,
+        'errors': errors,
+        'latency_ms': _percentiles(latencies),
+        'server_ms': _percentiles(server_times)
+    }
+
+
+def run_bench(source: str, requests_count: int = DEFAULT_REQUESTS,
+              transports: Optional[List[str]] = None) -> Dict[str, Any]:
+    images = [image for image in (cv2.imread(path) for path in list_images(source)) if image is not None]
+    if not images:
+        return {'ok': False, 'error': f'Sin imágenes en {source}'}
+
+    base_url = vision_client.get_base_url()
+    print(f"[vision_bench] 🖼️ {len(images)} imágenes, {requests_count} análisis por transporte contra {base_url}")
+    if 'shm' in (transports or DEFAULT_TRANSPORTS) and not frame_transport.is_local_server():
+        print("[vision_bench] ⚠️ Servidor remoto: el transporte shm usará JPEG")
+
+    vision_client.get('/health/', timeout=5)   # Abre la conexión keep-alive antes de medir
+    rows = [bench_transport(transport, images, requests_count) for transport in transports or DEFAULT_TRANSPORTS]
+    return {'ok': True, 'server': base_url, 'images': len(images), 'transports': rows,
+            'transport_stats': frame_transport.get_stats()}
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"\n[vision_bench] Servidor {result['server']}")
+    print(f"{'transporte':<12}{'p50':>9}{'p90':>9}{'p99':>9}{'media':>9}{'servidor':>10}{'errores':>9}")
+    for row in result['transports']:
+        lat = row['latency_ms']
+        print(f"{row['transport']:<12}{lat['p50']:>9.1f}{lat['p90']:>9.1f}{lat['p99']:>9.1f}{lat['mean']:>9.1f}"
+              f"{row['server_ms']['p50']:>10.1f}{row['errors']:>9}")
+    print(f"[vision_bench] Envíos: {result['transport_stats']}")
+
+# ============================================================
+# LÍNEA DE COMANDOS
+# ============================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de punta a punta contra el servidor de visión")
+    parser.add_argument('source', nargs='?', default='imagenes_juntas', help="Imagen o directorio de imágenes")
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help="Análisis por transporte")
+    parser.add_argument('--transports', nargs='+', choices=('shm', 'jpeg'), default=DEFAULT_TRANSPORTS)
+    parser.add_argument('--json', help="Guardar el resultado completo en este archivo")
+    args = parser.parse_args(argv)
+
+    try:
+        result = run_bench(args.source, args.requests, args.transports)
+    except requests.exceptions.RequestException as e:
+        print(f"[vision_bench] ❌ No se pudo conectar al servidor de visión: {e}")
+        return 1
+    finally:
+        frame_transport.close()
+    if not result['ok']:
+        print(f"[vision_bench] ❌ {result['error']}")
+        return 1
+
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,427 @@
+# yolo_benchmark.py - Benchmark de modos de inferencia YOLO en CPU
+"""
+YOLO Benchmark - COMAU-VISION
+=============================
+
+Compara modos de inferencia (tamaño de entrada, precisión FP32/INT8, hilos) sobre
+las imágenes de imagenes_juntas/ para elegir el más rápido que siga dentro de
+tolerancia respecto del modo de referencia FP32:
+
+- Latencia por inferencia: p50 / p90 / p99 / media (ms)
+- Agujeros: diferencia en cantidad y desvío de centroides (px) contra la referencia
+
+Los modelos se construyen con el mismo camino que usa yolo_detector (export y
+cuantización cacheados), así que lo medido es lo que correrá en línea.
+
+Uso:
+    python -m src.vision.yolo_benchmark models/holes_model.pt imagenes_juntas/ \\
+        --backend onnxruntime --modes fp32:640 int8:640 fp32:480 int8:480:2
+
+Formato de modo: precision:imgsz[:threads]
+
+Con --tiled compara la detección de agujeros en mosaico (tiles solapados a
+resolución nativa + NMS) contra la inferencia sobre el frame completo: latencia y
+recall. El recall se mide contra etiquetas YOLO (<imagen>.txt) si existen; si no,
+contra la unión de lo que detectan ambos métodos.
+
+    python -m src.vision.yolo_benchmark models/holes_model.pt imagenes_juntas/ \\
+        --backend ultralytics --tiled --tile-size 640 --overlap 96
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    cv2 = None
+    OPENCV_AVAILABLE = False
+
+from src.vision import yolo_detector
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+BASELINE_MODE = 'fp32:640'
+DEFAULT_MODES = ['fp32:640', 'int8:640', 'fp32:480', 'int8:480']
+DEFAULT_REPEATS = 3
+MAX_COUNT_DIFF = 0           # Diferencia máxima de agujeros por imagen
+MAX_CENTROID_PX = 2.0        # Desvío máximo de centroide (px del frame)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+EXCLUDED_SUFFIXES = ('_overlay', '_visualizacion')   # Salidas de análisis guardadas junto a las capturas
+MATCH_PX = 10.0              # Distancia máxima entre centros para considerar el mismo agujero (recall)
+
+# ============================================================
+# UTILIDADES
+# ============================================================
+
+def parse_mode(spec: str) -> Dict[str, Any]:
+    """'int8:480:2' → {'precision': 'int8', 'imgsz': 480, 'threads': 2}"""
+    parts = spec.split(':')
+    mode = {'precision': parts[0]}
+    if len(parts) > 1 and parts[1]:
+        mode['imgsz'] = int(parts[1])
+    if len(parts) > 2 and parts[2]:
+        mode['threads'] = int(parts[2])
+    return yolo_detector.normalize_inference_mode(mode)
+
+
+def mode_label(mode: Dict[str, Any]) -> str:
+    label = f"{mode['precision']}:{mode['imgsz']}"
+    return f"{label}:{mode['threads']}" if mode['threads'] else label
+
+
+def list_images(source: str) -> List[str]:
+    """Capturas de un directorio (recursivo), sin overlays ni visualizaciones guardadas"""
+    if not os.path.isdir(source):
+        return [source]
+    paths = []
+    for root, _, names in os.walk(source):
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            if ext.lower() in IMAGE_EXTENSIONS and not stem.endswith(EXCLUDED_SUFFIXES):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def hole_centers(prediction: Optional[dict], frame_shape) -> np.ndarray:
+    """Centros de agujeros (N, 2): centroides de máscara o, sin máscaras, centros de caja"""
+    if prediction is None:
+        return np.zeros((0, 2))
+    if prediction['masks'] is not None and len(prediction['masks']):
+        centers, areas = yolo_detector.mask_centroids(prediction['masks'], frame_shape)
+        return centers[areas > 0]
+    boxes = prediction['boxes']
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
+
+def compare_centers(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, Any]:
+    """
+    Empareja centros por cercanía (greedy sobre la matriz de distancias).
+    Returns: {'count_diff', 'matched', 'mean_dev_px', 'max_dev_px'}
+    """
+    count_diff = abs(len(reference) - len(candidate))
+    if len(reference) == 0 or len(candidate) == 0:
+        return {'count_diff': count_diff, 'matched': 0, 'mean_dev_px': 0.0, 'max_dev_px': 0.0}
+
+    distances = np.linalg.norm(reference[:, None, :] - candidate[None, :, :], axis=2)
+    deviations = []
+    for _ in range(min(len(reference), len(candidate))):
+        i, j = np.unravel_index(np.argmin(distances), distances.shape)
+        deviations.append(float(distances[i, j]))
+        distances[i, :] = np.inf
+        distances[:, j] = np.inf
+
+    return {
+        'count_diff': count_diff,
+        'matched': len(deviations),
+        'mean_dev_px': float(np.mean(deviations)),
+        'max_dev_px': float(np.max(deviations))
+    }
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'mean': 0.0}
+    arr = np.asarray(values)
+    return {
+        'p50': round(float(np.percentile(arr, 50)), 2),
+        'p90': round(float(np.percentile(arr, 90)), 2),
+        'p99': round(float(np.percentile(arr, 99)), 2),
+        'mean': round(float(arr.mean()), 2)
+    }
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def benchmark_mode(model_path: str, backend: str, mode: Dict[str, Any], images: List[np.ndarray],
+                   conf: float = 0.5, repeats: int = DEFAULT_REPEATS) -> Optional[Dict[str, Any]]:
+    """
+    Mide un modo: construye el modelo, lo calienta y ejecuta repeats inferencias por imagen.
+
+    Returns:
+        {'mode', 'backend', 'load_s', 'latency_ms': percentiles, 'centers': [array por imagen]}
+        o None si el modelo no se pudo construir
+    """
+    start = time.time()
+    model, effective_backend, effective_mode = yolo_detector._build_model('holes', model_path, backend, mode)
+    if model is None:
+        return None
+    load_s = time.time() - start
+
+    yolo_detector._run_model(model, effective_backend, images[0], conf, effective_mode)
+
+    latencies, centers = [], []
+    for image in images:
+        prediction = None
+        for _ in range(max(1, repeats)):
+            start = time.perf_counter()
+            prediction = yolo_detector._run_model(model, effective_backend, image, conf, effective_mode)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        centers.append(hole_centers(prediction, image.shape))
+
+    del model
+    if effective_backend == 'ultralytics':
+        yolo_detector._apply_torch_threads(None)   # Los hilos de torch son de todo el proceso
+    return {
+        'mode': mode_label(effective_mode),
+        'backend': effective_backend,
+        'load_s': round(load_s, 2),
+        'latency_ms': _percentiles(latencies),
+        'centers': centers
+    }
+
+
+def run_benchmark(model_path: str, source: str, backend: str = 'onnxruntime',
+                  modes: Optional[List[str]] = None, baseline: str = BASELINE_MODE,
+                  conf: float = 0.5, repeats: int = DEFAULT_REPEATS,
+                  max_count_diff: int = MAX_COUNT_DIFF, max_centroid_px: float = MAX_CENTROID_PX) -> Dict[str, Any]:
+    """
+    Ejecuta la referencia y cada modo sobre las mismas imágenes.
+
+    Returns:
+        {'ok', 'images', 'baseline', 'modes': [{'mode', 'backend', 'load_s', 'latency_ms',
+         'count_diff_max', 'count_diff_total', 'centroid_mean_px', 'centroid_max_px',
+         'within_tolerance', 'speedup'}], 'recommended'}
+    """
+    paths = list_images(source)
+    images = [image for image in (cv2.imread(path) for path in paths) if image is not None]
+    if not images:
+        return {'ok': False, 'error': f'Sin imágenes en {source}'}
+    print(f"[benchmark] 🖼️ {len(images)} imágenes, {repeats} repeticiones por imagen, backend {backend}")
+
+    reference = benchmark_mode(model_path, backend, parse_mode(baseline), images, conf, repeats)
+    if reference is None:
+        return {'ok': False, 'error': 'No se pudo construir el modelo de referencia'}
+
+    rows = []
+    for spec in modes or DEFAULT_MODES:
+        mode = parse_mode(spec)
+        if mode_label(mode) == reference['mode']:
+            result = reference
+        else:
+            print(f"[benchmark] ⏱️ Modo {mode_label(mode)}...")
+            result = benchmark_mode(model_path, backend, mode, images, conf, repeats)
+        if result is None:
+            rows.append({'mode': mode_label(mode), 'error': 'No se pudo construir el modelo'})
+            continue
+
+        comparisons = [compare_centers(ref, cand) for ref, cand in zip(reference['centers'], result['centers'])]
+        row = {
+            'mode': result['mode'],
+            'backend': result['backend'],
+            'load_s': result['load_s'],
+            'latency_ms': result['latency_ms'],
+            'count_diff_max': max(c['count_diff'] for c in comparisons),
+            'count_diff_total': sum(c['count_diff'] for c in comparisons),
+            'centroid_mean_px': round(float(np.mean([c['mean_dev_px'] for c in comparisons])), 3),
+            'centroid_max_px': round(max(c['max_dev_px'] for c in comparisons), 3),
+            'speedup': round(reference['latency_ms']['p50'] / max(result['latency_ms']['p50'], 1e-6), 2)
+        }
+        row['within_tolerance'] = (row['count_diff_max'] <= max_count_diff and
+                                   row['centroid_max_px'] <= max_centroid_px)
+        rows.append(row)
+
+    candidates = [row for row in rows if row.get('within_tolerance')]
+    recommended = min(candidates, key=lambda row: row['latency_ms']['p50'])['mode'] if candidates else None
+    return {
+        'ok': True,
+        'images': len(images),
+        'baseline': {'mode': reference['mode'], 'latency_ms': reference['latency_ms'],
+                     'holes': [int(len(c)) for c in reference['centers']]},
+        'modes': rows,
+        'recommended': recommended
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    """Tabla de resultados por consola"""
+    print(f"\n[benchmark] Referencia {result['baseline']['mode']}: p50 "
+          f"{result['baseline']['latency_ms']['p50']} ms, agujeros por imagen {result['baseline']['holes']}")
+    print(f"{'modo':<14}{'p50':>9}{'p90':>9}{'p99':>9}{'x':>7}{'Δcant':>7}{'Δc med':>9}{'Δc máx':>9}  ok")
+    for row in result['modes']:
+        if 'error' in row:
+            print(f"{row['mode']:<14}  {row['error']}")
+            continue
+        lat = row['latency_ms']
+        print(f"{row['mode']:<14}{lat['p50']:>9.1f}{lat['p90']:>9.1f}{lat['p99']:>9.1f}{row['speedup']:>7.2f}"
+              f"{row['count_diff_max']:>7}{row['centroid_mean_px']:>9.2f}{row['centroid_max_px']:>9.2f}"
+              f"  {'✅' if row['within_tolerance'] else '❌'}")
+    print(f"[benchmark] Modo recomendado: {result['recommended'] or 'ninguno dentro de tolerancia'}")
+
+# ============================================================
+# MOSAICO VS FRAME COMPLETO
+# ============================================================
+
+def load_labels(image_path: str, frame_shape) -> Optional[np.ndarray]:
+    """Centros (N, 2) en píxeles de las etiquetas YOLO (<imagen>.txt: clase cx cy w h normalizados) o None"""
+    label_path = os.path.splitext(image_path)[0] + '.txt'
+    if not os.path.isfile(label_path):
+        return None
+    h, w = frame_shape[:2]
+    rows = [line.split() for line in open(label_path, encoding='utf-8') if line.strip()]
+    centers = [(float(row[1]) * w, float(row[2]) * h) for row in rows if len(row) >= 5]
+    return np.array(centers).reshape(-1, 2)
+
+
+def box_centers(detections: List[dict]) -> np.ndarray:
+    boxes = np.array([d['bbox'] for d in detections], dtype=np.float64).reshape(-1, 4)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
+
+def match_count(reference: np.ndarray, candidate: np.ndarray, match_px: float = MATCH_PX) -> int:
+    """Agujeros de reference con un centro de candidate a menos de match_px (emparejamiento 1 a 1)"""
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0
+    distances = np.linalg.norm(reference[:, None, :] - candidate[None, :, :], axis=2)
+    matched = 0
+    while np.isfinite(distances).any():
+        i, j = np.unravel_index(np.argmin(distances), distances.shape)
+        if distances[i, j] > match_px:
+            break
+        matched += 1
+        distances[i, :] = np.inf
+        distances[:, j] = np.inf
+    return matched
+
+
+def _union_centers(a: np.ndarray, b: np.ndarray, match_px: float) -> np.ndarray:
+    """Centros de a más los de b que no están cerca de ninguno de a"""
+    if len(a) == 0:
+        return b
+    if len(b) == 0:
+        return a
+    distances = np.linalg.norm(b[:, None, :] - a[None, :, :], axis=2)
+    return np.vstack([a, b[distances.min(axis=1) > match_px]])
+
+
+def run_tiling_benchmark(model_path: str, source: str, backend: str = 'ultralytics', conf: float = 0.5,
+                         repeats: int = DEFAULT_REPEATS, tile_size: int = yolo_detector.TILE_SIZE_PX,
+                         overlap: int = yolo_detector.TILE_OVERLAP_PX, match_px: float = MATCH_PX) -> Dict[str, Any]:
+    """
+    Compara detect_holes_bboxes() (frame completo) con detect_holes_tiled() sobre las mismas imágenes.
+
+    Returns:
+        {'ok', 'images', 'reference': 'labels' | 'union', 'tiles_per_image',
+         'methods': {'full_frame' | 'tiled': {'latency_ms', 'holes', 'recall'}}}
+    """
+    paths = list_images(source)
+    loaded = [(path, cv2.imread(path)) for path in paths]
+    loaded = [(path, image) for path, image in loaded if image is not None]
+    if not loaded:
+        return {'ok': False, 'error': f'Sin imágenes en {source}'}
+    if not yolo_detector.load_model('holes', model_path, backend):
+        return {'ok': False, 'error': 'No se pudo cargar el modelo'}
+
+    # Sin caché de resultados: cada repetición debe ejecutar el modelo
+    yolo_detector.configure_result_cache(enabled=False)
+    print(f"[benchmark] 🖼️ {len(loaded)} imágenes, tiles de {tile_size} px con {overlap} px de solape")
+
+    methods = {
+        'full_frame': lambda image: yolo_detector.detect_holes_bboxes(image, conf),
+        'tiled': lambda image: yolo_detector.detect_holes_tiled(image, conf, tile_size=tile_size, overlap=overlap)
+    }
+    yolo_detector.detect_holes_bboxes(loaded[0][1], conf)   # Calentamiento
+
+    latencies = {name: [] for name in methods}
+    centers = {name: [] for name in methods}
+    for _, image in loaded:
+        for name, detect in methods.items():
+            detections = []
+            for _ in range(max(1, repeats)):
+                start = time.perf_counter()
+                detections = detect(image)
+                latencies[name].append((time.perf_counter() - start) * 1000.0)
+            centers[name].append(box_centers(detections))
+
+    labels = [load_labels(path, image.shape) for path, image in loaded]
+    use_labels = all(label is not None for label in labels)
+    if not use_labels:
+        labels = [_union_centers(full, tiled, match_px) for full, tiled in zip(centers['full_frame'], centers['tiled'])]
+
+    expected = sum(len(label) for label in labels)
+    result = {}
+    for name in methods:
+        matched = sum(match_count(label, found, match_px) for label, found in zip(labels, centers[name]))
+        result[name] = {
+            'latency_ms': _percentiles(latencies[name]),
+            'holes': [int(len(c)) for c in centers[name]],
+            'recall': round(matched / expected, 3) if expected else 1.0
+        }
+
+    h, w = loaded[0][1].shape[:2]
+    return {
+        'ok': True,
+        'images': len(loaded),
+        'reference': 'labels' if use_labels else 'union',
+        'expected_holes': expected,
+        'tiles_per_image': len(yolo_detector.tile_grid((0, 0, w, h), tile_size, overlap)),
+        'methods': result
+    }
+
+
+def print_tiling_report(result: Dict[str, Any]) -> None:
+    """Tabla mosaico vs frame completo por consola"""
+    print(f"\n[benchmark] {result['images']} imágenes, {result['tiles_per_image']} tiles por imagen, "
+          f"{result['expected_holes']} agujeros de referencia ({result['reference']})")
+    print(f"{'método':<14}{'p50':>9}{'p90':>9}{'p99':>9}{'recall':>9}  agujeros por imagen")
+    for name, row in result['methods'].items():
+        lat = row['latency_ms']
+        print(f"{name:<14}{lat['p50']:>9.1f}{lat['p90']:>9.1f}{lat['p99']:>9.1f}{row['recall']:>9.3f}  {row['holes']}")
+
+# ============================================================
+# LÍNEA DE COMANDOS
+# ============================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de modos de inferencia YOLO en CPU")
+    parser.add_argument('model', help="Modelo .pt")
+    parser.add_argument('source', nargs='?', default='imagenes_juntas', help="Imagen o directorio de imágenes")
+    parser.add_argument('--backend', choices=('ultralytics', 'onnxruntime', 'openvino'), default='onnxruntime')
+    parser.add_argument('--modes', nargs='+', default=DEFAULT_MODES, help="Modos precision:imgsz[:threads]")
+    parser.add_argument('--baseline', default=BASELINE_MODE)
+    parser.add_argument('--conf', type=float, default=0.5)
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    parser.add_argument('--max-count-diff', type=int, default=MAX_COUNT_DIFF)
+    parser.add_argument('--max-centroid-px', type=float, default=MAX_CENTROID_PX)
+    parser.add_argument('--tiled', action='store_true', help="Comparar mosaico de tiles contra frame completo")
+    parser.add_argument('--tile-size', type=int, default=yolo_detector.TILE_SIZE_PX)
+    parser.add_argument('--overlap', type=int, default=yolo_detector.TILE_OVERLAP_PX)
+    parser.add_argument('--match-px', type=float, default=MATCH_PX)
+    parser.add_argument('--json', help="Guardar el resultado completo en este archivo")
+    args = parser.parse_args(argv)
+
+    if args.tiled:
+        result = run_tiling_benchmark(args.model, args.source, args.backend, args.conf, args.repeats,
+                                      args.tile_size, args.overlap, args.match_px)
+        if not result['ok']:
+            print(f"[benchmark] ❌ {result['error']}")
+            return 1
+        print_tiling_report(result)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+        return 0
+
+    result = run_benchmark(args.model, args.source, args.backend, args.modes, args.baseline,
+                           args.conf, args.repeats, args.max_count_diff, args.max_centroid_px)
+    if not result['ok']:
+        print(f"[benchmark] ❌ {result['error']}")
+        return 1
+
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,7 +1,15 @@
 # yolo_detector.py - Detección de agujeros con YOLO
-from typing import List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 import numpy as np
+import gc
 import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import partial
+
+from src.vision.frame_context import FrameContext, get_frame
 
 try:
     import cv2
@@ -33,30 +41,151 @@ _model_paths = {
     'detection': None,
     'holes': None
 }
+_model_backends = {
+    'detection': None,
+    'holes': None
+}
+
+# Un lock por modelo: los objetos de ultralytics no admiten inferencias concurrentes
+_model_locks = {
+    'detection': threading.Lock(),
+    'holes': threading.Lock()
+}
+
+# Protege el intercambio de modelo/path/backend (ver _install_model)
+_swap_lock = threading.Lock()
+
+# Generación de cada modelo: se incrementa con cada modelo instalado (local o en el worker)
+# y forma parte de la clave de la caché de resultados, así una inferencia en curso con el
+# modelo anterior no puede dejar su resultado visible para el modelo nuevo
+_model_generations = {
+    'detection': 0,
+    'holes': 0
+}
+
+# Backend de inferencia: 'ultralytics' (PyTorch) o 'onnxruntime' / 'openvino' (ver yolo_onnx.py)
+DEFAULT_BACKEND = 'ultralytics'
+
+# Modo de inferencia en CPU (config.json → vision.inference_mode), aplicado al cargar cada modelo:
+# - imgsz: tamaño de entrada del modelo (múltiplo de 32)
+# - precision: 'fp32' o 'int8' (cuantización dinámica, solo backend onnxruntime)
+# - threads: hilos de inferencia (None = valor por defecto del runtime). Con ultralytics es
+#   un ajuste de todo el proceso (torch.set_num_threads): vale el del último modelo construido
+INFERENCE_MODE_DEFAULTS = {'imgsz': 640, 'precision': 'fp32', 'threads': None}
+_inference_mode = dict(INFERENCE_MODE_DEFAULTS)
+_model_modes = {
+    'detection': None,
+    'holes': None
+}
+_torch_default_threads: Optional[int] = None   # Hilos de torch antes del primer ajuste
+
+# Worker de inferencia en otro proceso (ver inference_worker.py). Si está activo, los
+# modelos viven en el worker y _predict() / _predict_batch() / load_model() delegan en él
+_inference_worker = None
+
+def set_inference_worker(worker) -> None:
+    """Conecta (o desconecta con None) el worker de inferencia"""
+    global _inference_worker
+    _inference_worker = worker
+
+# ============================================================
+# MODO DE INFERENCIA
+# ============================================================
+def normalize_inference_mode(mode: Optional[dict]) -> dict:
+    """Completa un modo parcial con los valores por defecto y valida sus campos"""
+    normalized = dict(INFERENCE_MODE_DEFAULTS)
+    normalized.update({k: v for k, v in (mode or {}).items() if k in INFERENCE_MODE_DEFAULTS and v is not None})
+    normalized['imgsz'] = max(32, int(round(int(normalized['imgsz']) / 32.0)) * 32)
+    normalized['precision'] = str(normalized['precision']).lower()
+    if normalized['precision'] not in ('fp32', 'int8'):
+        print(f"[yolo] ⚠️ Precisión desconocida '{normalized['precision']}', usando fp32")
+        normalized['precision'] = 'fp32'
+    normalized['threads'] = int(normalized['threads']) if normalized['threads'] else None
+    return normalized
+
+def set_inference_mode(mode: Optional[dict]) -> dict:
+    """
+    Establece el modo de inferencia para los modelos que se carguen a partir de ahora
+    (los ya cargados se actualizan con hot_swap_model).
+    
+    Returns:
+        Modo normalizado
+    """
+    global _inference_mode
+    _inference_mode = normalize_inference_mode(mode)
+    print(f"[yolo] ⚙️ Modo de inferencia: {_inference_mode}")
+    return dict(_inference_mode)
+
+def get_inference_mode() -> dict:
+    """Modo de inferencia vigente para nuevas cargas"""
+    return dict(_inference_mode)
+
+def get_model_mode(model_type: str) -> Optional[dict]:
+    """Modo efectivo con el que se cargó un modelo (None si no está cargado en este proceso)"""
+    mode = _model_modes.get(model_type)
+    return dict(mode) if mode else None
 
 # ============================================================
 # CARGA DE MODELO
 # ============================================================
-def load_model(model_type: str, model_path: str) -> bool:
+def load_model(model_type: str, model_path: str, backend: Optional[str] = None) -> bool:
     """
     Carga un modelo YOLO desde un archivo .pt
     
+    El modelo nuevo se construye aparte y se instala con un intercambio atómico
+    (ver _install_model): si falla la carga, el modelo anterior sigue activo.
+    
     Args:
         model_type: Tipo de modelo ('detection' o 'holes')
         model_path: Path al archivo del modelo
+        backend: 'ultralytics', 'onnxruntime' u 'openvino' (None = DEFAULT_BACKEND).
+                 Si el backend ONNX no está disponible o falla, se usa ultralytics.
     
     Returns:
         True si se cargó correctamente, False en caso contrario
     """
-    global _models, _model_paths
+    if model_type not in _models:
+        print(f"[yolo] Tipo de modelo inválido: {model_type}")
+        return False
+    
+    if _inference_worker is not None:
+        loaded = _inference_worker.load_model(model_type, model_path, backend)
+        _bump_model_generation(model_type)
+        return loaded
+    
+    model, backend, mode = _build_model(model_type, model_path, backend)
+    if model is None:
+        return False
+    _install_model(model_type, model, model_path, backend, mode)
+    return True
+
+def _build_model(model_type: str, model_path: str, backend: Optional[str] = None,
+                 mode: Optional[dict] = None):
+    """
+    Construye un modelo SIN instalarlo en _models.
+    
+    Args:
+        mode: Modo de inferencia (None = el vigente, ver set_inference_mode)
+    
+    Returns:
+        (modelo, backend efectivo, modo efectivo) o (None, None, None) si falla
+    """
+    backend = backend or DEFAULT_BACKEND
+    mode = normalize_inference_mode(mode if mode is not None else _inference_mode)
+    if backend != 'ultralytics':
+        # El export a ONNX requiere ultralytics solo la primera vez; luego se usa la caché
+        model = _build_onnx_model(model_type, model_path, backend, mode)
+        if model is not None:
+            return model, backend, mode
+        print(f"[yolo] ⚠️ Backend {backend} no disponible para {model_type}, usando ultralytics")
     
     if not YOLO_AVAILABLE:
         print("[yolo] Ultralytics no disponible")
-        return False
+        return None, None, None
     
-    if model_type not in _models:
-        print(f"[yolo] Tipo de modelo inválido: {model_type}")
-        return False
+    if mode['precision'] != 'fp32':
+        print(f"[yolo] ⚠️ Precisión {mode['precision']} solo disponible con onnxruntime, usando fp32")
+        mode = dict(mode, precision='fp32')
     
     try:
         print(f"[yolo] Intentando cargar modelo {model_type} desde: {model_path}")
@@ -64,16 +193,17 @@ def load_model(model_type: str, model_path: str) -> bool:
         # Verificar que el archivo existe
         if not os.path.exists(model_path):
             print(f"[yolo] ❌ Archivo no encontrado: {model_path}")
-            return False
+            return None, None, None
         
         # Cargar modelo con CUDA si está disponible
-        _models[model_type] = YOLO(model_path)
+        model = YOLO(model_path)
+        _apply_torch_threads(mode['threads'])
         
         # Activar CUDA si está disponible
         try:
             import torch
             if torch.cuda.is_available():
-                _models[model_type].to('cuda')
+                model.to('cuda')
                 print(f"[yolo] ✓ Modelo {model_type} cargado en CUDA: {model_path}")
             else:
                 print(f"[yolo] ✓ Modelo {model_type} cargado en CPU: {model_path}")
@@ -81,25 +211,277 @@ def load_model(model_type: str, model_path: str) -> bool:
             print(f"[yolo] ⚠️ Error activando CUDA: {cuda_error}")
             print(f"[yolo] ✓ Modelo {model_type} cargado en CPU: {model_path}")
         
-        _model_paths[model_type] = model_path
-        return True
+        return model, 'ultralytics', mode
     except Exception as e:
         import traceback
         print(f"[yolo] ❌ Error cargando modelo {model_type}: {e}")
         print(f"[yolo] Traceback completo:")
         traceback.print_exc()
-        _models[model_type] = None
-        _model_paths[model_type] = None
-        return False
+        return None, None, None
+
+def _apply_torch_threads(threads: Optional[int]) -> None:
+    """
+    Fija los hilos de torch. Es un ajuste de TODO el proceso: cada construcción con
+    ultralytics lo vuelve a fijar (None = valor por defecto del proceso), así un modo con
+    :threads no se hereda en construcciones posteriores.
+    """
+    global _torch_default_threads
+    try:
+        import torch
+        if _torch_default_threads is None:
+            _torch_default_threads = torch.get_num_threads()
+        torch.set_num_threads(threads or _torch_default_threads)
+    except Exception as thread_error:
+        print(f"[yolo] ⚠️ No se pudo fijar el número de hilos: {thread_error}")
+
+def _build_onnx_model(model_type: str, model_path: str, backend: str, mode: dict):
+    """Construye un modelo con el backend ONNX (export y cuantización cacheados). Returns: modelo o None"""
+    try:
+        from src.vision import yolo_onnx
+        
+        if not yolo_onnx.is_backend_available(backend):
+            print(f"[yolo] ⚠️ Runtime {backend} no instalado")
+            return None
+        if not os.path.exists(model_path):
+            print(f"[yolo] ❌ Archivo no encontrado: {model_path}")
+            return None
+        
+        model = yolo_onnx.load_onnx_model(model_path, backend, mode['imgsz'], mode['threads'], mode['precision'])
+        print(f"[yolo] ✓ Modelo {model_type} cargado con {backend} (CPU, {mode['precision']}, "
+              f"imgsz={mode['imgsz']}): {model_path}")
+        return model
+    except Exception as e:
+        print(f"[yolo] ❌ Error cargando {model_type} con {backend}: {e}")
+        return None
+
+def _bump_model_generation(model_type: str) -> None:
+    """Invalida los resultados cacheados de un modelo (nuevo modelo en el worker de inferencia)"""
+    with _swap_lock:
+        _model_generations[model_type] += 1
+    clear_result_cache()
+
+def _install_model(model_type: str, model, model_path: str, backend: str, mode: dict) -> None:
+    """
+    Instala un modelo ya construido con un intercambio atómico de referencias.
+    
+    Las inferencias en curso terminan con el modelo anterior (tienen tomado el lock
+    del modelo); las siguientes usan el nuevo. El anterior se libera después.
+    """
+    with _swap_lock:
+        old_model = _models[model_type]
+        _models[model_type] = model
+        _model_paths[model_type] = model_path
+        _model_backends[model_type] = backend
+        _model_modes[model_type] = mode
+        _model_generations[model_type] += 1
+    clear_result_cache()
+    
+    if old_model is not None and old_model is not model:
+        _release_model(model_type, old_model)
+
+def _release_model(model_type: str, model) -> None:
+    """Libera un modelo reemplazado, una vez terminada la inferencia en curso"""
+    with _model_locks[model_type]:
+        pass
+    del model
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+    print(f"[yolo] ♻️ Modelo {model_type} anterior liberado")
+
+def get_model_backend(model_type: str) -> Optional[str]:
+    """Backend con el que está cargado un modelo ('ultralytics', 'onnxruntime', 'openvino')"""
+    if _inference_worker is not None:
+        return _inference_worker.get_model_backend(model_type)
+    return _model_backends.get(model_type)
 
 def is_model_loaded(model_type: str) -> bool:
     """Verifica si un modelo específico está cargado"""
+    if _inference_worker is not None:
+        return _inference_worker.is_model_loaded(model_type)
     return _models.get(model_type) is not None
 
 def get_model_path(model_type: str) -> Optional[str]:
     """Obtiene el path de un modelo específico"""
+    if _inference_worker is not None:
+        return _inference_worker.get_model_path(model_type)
     return _model_paths.get(model_type)
 
+# ============================================================
+# PRECARGA Y CALENTAMIENTO
+# ============================================================
+WARMUP_RESOLUTION = (1920, 1080)   # (width, height) por defecto de la imagen de calentamiento
+
+# Estados: 'not_configured', 'pending', 'loading', 'warming', 'ready', 'error'
+_status_lock = threading.Lock()
+_model_status = {
+    model_type: {'state': 'not_configured', 'path': None, 'backend': None,
+                 'load_s': None, 'warmup_s': None, 'error': None, 'swap': None, 'updated_at': None}
+    for model_type in _models
+}
+
+def _set_model_status(model_type: str, **fields) -> None:
+    with _status_lock:
+        _model_status[model_type].update(fields, updated_at=time.time())
+
+def mark_model_pending(model_type: str, model_path: str) -> None:
+    """Marca un modelo como pendiente de carga (antes de lanzar la precarga en segundo plano)"""
+    _set_model_status(model_type, state='pending', path=model_path, error=None)
+
+def warmup_model(model_type: str, resolution: Tuple[int, int] = WARMUP_RESOLUTION,
+                 conf_threshold: float = 0.5) -> Optional[float]:
+    """
+    Ejecuta una inferencia sobre una imagen negra de la resolución indicada para
+    inicializar el grafo y los buffers del runtime antes del primer análisis real.
+    
+    Returns:
+        Duración del calentamiento en segundos, o None si el modelo no está cargado
+    """
+    if not is_model_loaded(model_type):
+        return None
+    width, height = resolution
+    dummy = np.zeros((int(height), int(width), 3), dtype=np.uint8)
+    start = time.time()
+    _predict(model_type, dummy, conf_threshold, use_cache=False)
+    return time.time() - start
+
+def preload_model(model_type: str, model_path: str, backend: Optional[str] = None,
+                  resolution: Tuple[int, int] = WARMUP_RESOLUTION) -> bool:
+    """
+    Carga y calienta un modelo, registrando el progreso en el estado de modelos
+    (ver get_models_status). Pensado para ejecutarse en un hilo en segundo plano.
+    
+    Returns:
+        True si el modelo quedó listo
+    """
+    if not os.path.exists(model_path):
+        print(f"[yolo] ⚠️ Archivo no encontrado: {model_path}")
+        _set_model_status(model_type, state='error', path=model_path, error='Archivo no encontrado')
+        return False
+    
+    _set_model_status(model_type, state='loading', path=model_path, error=None)
+    start = time.time()
+    if not load_model(model_type, model_path, backend):
+        _set_model_status(model_type, state='error', error='Error cargando el modelo')
+        return False
+    load_s = time.time() - start
+    
+    _set_model_status(model_type, state='warming', load_s=round(load_s, 3),
+                      backend=get_model_backend(model_type))
+    try:
+        warmup_s = warmup_model(model_type, resolution)
+    except Exception as e:
+        # Un fallo de calentamiento no invalida el modelo: la primera inferencia pagará la inicialización
+        print(f"[yolo] ⚠️ Error en calentamiento de {model_type}: {e}")
+        warmup_s = None
+    
+    _set_model_status(model_type, state='ready',
+                      warmup_s=round(warmup_s, 3) if warmup_s is not None else None)
+    print(f"[yolo] ✓ Modelo {model_type} listo (carga {load_s:.2f}s, calentamiento "
+          f"{warmup_s if warmup_s is not None else 0:.2f}s a {resolution[0]}x{resolution[1]})")
+    return True
+
+def get_models_status() -> dict:
+    """
+    Estado de carga de los modelos para /api/status.
+    
+    Returns:
+        {'ready': algún modelo listo y ninguno cargándose, 'loading': bool,
+         'swapping': algún intercambio en caliente en curso,
+         'models': {model_type: {'state', 'path', 'backend', 'load_s', 'warmup_s', 'error',
+                                 'swap', 'updated_at'}}}
+    """
+    with _status_lock:
+        models = {model_type: dict(status) for model_type, status in _model_status.items()}
+    states = [status['state'] for status in models.values()]
+    loading = any(state in ('pending', 'loading', 'warming') for state in states)
+    return {
+        'ready': not loading and 'ready' in states,
+        'loading': loading,
+        'swapping': any((status['swap'] or {}).get('state') == 'loading' for status in models.values()),
+        'models': models
+    }
+
+# ============================================================
+# INTERCAMBIO DE MODELOS EN CALIENTE
+# ============================================================
+_hot_swap_lock = threading.Lock()
+
+def _swap_in(model_type: str, model_path: str, backend: Optional[str],
+             resolution: Tuple[int, int] = WARMUP_RESOLUTION, mode: Optional[dict] = None) -> dict:
+    """
+    Construye y calienta un modelo nuevo mientras el actual sigue atendiendo, y
+    solo entonces lo instala (ver _install_model).
+    
+    Returns:
+        {'ok': bool, 'backend', 'load_s', 'warmup_s', 'error'}
+    """
+    start = time.time()
+    model, backend, mode = _build_model(model_type, model_path, backend, mode)
+    if model is None:
+        return {'ok': False, 'error': 'Error cargando el modelo'}
+    load_s = time.time() - start
+    
+    # Un modelo que no puede inferir no se instala: el actual sigue activo
+    width, height = resolution
+    start = time.time()
+    try:
+        _run_model(model, backend, np.zeros((int(height), int(width), 3), dtype=np.uint8), 0.5, mode)
+    except Exception as e:
+        return {'ok': False, 'error': f'Error en calentamiento: {e}'}
+    warmup_s = time.time() - start
+    
+    _install_model(model_type, model, model_path, backend, mode)
+    return {'ok': True, 'backend': backend, 'load_s': round(load_s, 3), 'warmup_s': round(warmup_s, 3)}
+
+def hot_swap_model(model_type: str, model_path: str, backend: Optional[str] = None,
+                   resolution: Tuple[int, int] = WARMUP_RESOLUTION) -> bool:
+    """
+    Reemplaza un modelo sin detener la inferencia (doble buffer).
+    
+    El modelo nuevo se carga y calienta en paralelo al actual; cuando está listo se
+    intercambia la referencia. Las inferencias en curso terminan con el modelo
+    anterior, que se libera después. Si algo falla, el modelo actual sigue activo.
+    Si no había modelo cargado, equivale a preload_model().
+    
+    Returns:
+        True si el modelo nuevo quedó activo
+    """
+    with _hot_swap_lock:
+        # Dentro del lock: dos solicitudes simultáneas sin modelo cargado no hacen dos preloads
+        if not is_model_loaded(model_type):
+            return preload_model(model_type, model_path, backend, resolution)
+        
+        if not os.path.exists(model_path):
+            print(f"[yolo] ⚠️ Archivo no encontrado: {model_path}")
+            _set_model_status(model_type, swap={'state': 'error', 'path': model_path, 'error': 'Archivo no encontrado'})
+            return False
+        
+        print(f"[yolo] 🔄 Intercambio en caliente de {model_type}: {model_path}")
+        _set_model_status(model_type, swap={'state': 'loading', 'path': model_path, 'error': None})
+        if _inference_worker is not None:
+            result = _inference_worker.hot_swap_model(model_type, model_path, backend, resolution)
+            _bump_model_generation(model_type)
+        else:
+            result = _swap_in(model_type, model_path, backend, resolution)
+        
+        clear_result_cache()
+        if not result.get('ok'):
+            print(f"[yolo] ❌ Intercambio de {model_type} cancelado: {result.get('error')}")
+            _set_model_status(model_type, swap={'state': 'error', 'path': model_path, 'error': result.get('error')})
+            return False
+        
+        _set_model_status(model_type, state='ready', path=model_path, backend=result['backend'],
+                          load_s=result['load_s'], warmup_s=result['warmup_s'], error=None,
+                          swap={'state': 'done', 'path': model_path, 'error': None, 'swapped_at': time.time()})
+        print(f"[yolo] ✓ Modelo {model_type} intercambiado (carga {result['load_s']:.2f}s, "
+              f"calentamiento {result['warmup_s']:.2f}s)")
+        return True
+
 # ============================================================
 # VALIDACIÓN DE FORMA ELÍPTICA
 # ============================================================
@@ -108,149 +490,477 @@ def get_model_path(model_type: str) -> Optional[str]:
 # que usa OpenCV para detectar bordes reales del agujero azul
 
 # ============================================================
-# DETECCIÓN DE JUNTA (BOUNDING BOX)
+# INFERENCIA NORMALIZADA
 # ============================================================
-def detect_gasket(frame, conf_threshold: float = 0.5):
+def _predict(model_type: str, frame, conf_threshold: float, use_cache: bool = True) -> Optional[dict]:
     """
-    Detecta la junta completa y devuelve su bounding box.
-    Compatible con YOLO normal (xyxy) y YOLO-OBB (xywhr).
+    Ejecuta UNA inferencia y normaliza la salida a arrays numpy.
+    
+    Los resultados se memorizan en la caché LRU (ver CACHÉ DE RESULTADOS): repetir
+    la inferencia sobre los mismos píxeles es una consulta de diccionario. El
+    resultado cacheado es compartido: no debe modificarse.
+    
+    Args:
+        frame: numpy array o FrameContext (clave de caché = número de secuencia)
+        use_cache: False para forzar la inferencia sin consultar ni poblar la caché
+    
+    Returns:
+        {
+            'boxes': (N, 4) xyxy en píxeles del frame,
+            'scores': (N,), 'classes': (N,),
+            'obb': (N, 5) xywhr (radianes) o None si el modelo no es OBB,
+            'masks': (N, h, w) float a resolución del modelo o None si no es de segmentación,
+            'orig_shape': (H, W)
+        }
+        None si el modelo no está cargado o falla la inferencia
+    """
+    key = None
+    if use_cache and _result_cache_config['enabled']:
+        key = _cache_key(model_type, conf_threshold, frame)
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+    
+    prediction = _predict_uncached(model_type, get_frame(frame), conf_threshold)
+    if key is not None and prediction is not None:
+        _cache_put(key, prediction)
+    return prediction
+
+
+def _predict_uncached(model_type: str, frame: np.ndarray, conf_threshold: float) -> Optional[dict]:
+    """Inferencia sin caché: en el worker de inferencia si está activo, si no con el modelo local"""
+    if _inference_worker is not None:
+        return _inference_worker.predict(model_type, frame, conf_threshold)
+    
+    with _model_locks[model_type]:
+        with _swap_lock:
+            model, backend, mode = _models.get(model_type), _model_backends.get(model_type), _model_modes.get(model_type)
+        if model is None:
+            return None
+        return _run_model(model, backend, frame, conf_threshold, mode)
+
+
+def _run_model(model, backend: Optional[str], frame, conf_threshold: float,
+               mode: Optional[dict] = None) -> Optional[dict]:
+    """Inferencia de un frame con un modelo concreto (instalado o recién construido)"""
+    if backend not in (None, 'ultralytics'):
+        return model.predict(frame, conf=conf_threshold)[0]
+    
+    imgsz = (mode or INFERENCE_MODE_DEFAULTS)['imgsz']
+    results = model(frame, conf=conf_threshold, imgsz=imgsz, verbose=False)
+    if results is None or len(results) == 0:
+        print(f"[yolo] No se recibieron resultados del modelo")
+        return None
+    return _normalize_result(results[0], frame.shape)
+
+
+def _predict_batch(model_type: str, images: List[np.ndarray], conf_threshold: float) -> Optional[List[dict]]:
+    """
+    Ejecuta UNA inferencia sobre un lote de imágenes (ultralytics las lleva a un
+    tamaño común con letterbox y hace un único forward pass). Solo las imágenes
+    que no están en la caché de resultados entran en el lote.
+    
+    Returns:
+        Lista con la salida normalizada de _predict() por imagen, o None si el modelo no está cargado
+    """
+    if not images:
+        return []
+    
+    outputs: List[Optional[dict]] = [None] * len(images)
+    keys: List[Optional[tuple]] = [None] * len(images)
+    if _result_cache_config['enabled']:
+        for i, image in enumerate(images):
+            keys[i] = _cache_key(model_type, conf_threshold, image)
+            outputs[i] = _cache_get(keys[i])
+    
+    # Imágenes repetidas dentro del mismo lote se infieren una sola vez
+    pending: Dict[Any, List[int]] = {}
+    for i, output in enumerate(outputs):
+        if output is None:
+            pending.setdefault(keys[i] if keys[i] is not None else i, []).append(i)
+    if pending:
+        groups = list(pending.values())
+        predictions = _predict_batch_uncached(model_type, [images[group[0]] for group in groups], conf_threshold)
+        if predictions is None:
+            return None
+        for group, prediction in zip(groups, predictions):
+            for i in group:
+                outputs[i] = prediction
+            if keys[group[0]] is not None:
+                _cache_put(keys[group[0]], prediction)
+    return outputs
+
+
+def _predict_batch_uncached(model_type: str, images: List[np.ndarray], conf_threshold: float) -> Optional[List[dict]]:
+    """Inferencia por lotes sin caché (worker de inferencia o modelo local)"""
+    if _inference_worker is not None:
+        return _inference_worker.predict_batch(model_type, images, conf_threshold)
+    
+    with _model_locks[model_type]:
+        with _swap_lock:
+            model, backend, mode = _models.get(model_type), _model_backends.get(model_type), _model_modes.get(model_type)
+        if model is None:
+            return None
+        if backend not in (None, 'ultralytics'):
+            return model.predict(list(images), conf=conf_threshold)
+        imgsz = (mode or INFERENCE_MODE_DEFAULTS)['imgsz']
+        results = model(list(images), conf=conf_threshold, imgsz=imgsz, verbose=False)
+    
+    return [_normalize_result(result, image.shape) for result, image in zip(results, images)]
+
+# ============================================================
+# CACHÉ DE RESULTADOS
+# ============================================================
+RESULT_CACHE_MAX_ENTRIES = 32
+RESULT_CACHE_MAX_MB = 64
+
+_result_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+_result_cache_lock = threading.Lock()
+_result_cache_config = {
+    'enabled': True,
+    'max_entries': RESULT_CACHE_MAX_ENTRIES,
+    'max_bytes': RESULT_CACHE_MAX_MB * 1024 * 1024
+}
+_result_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes': 0}
+
+def frame_key(frame) -> tuple:
+    """
+    Identidad de un frame para la caché: número de secuencia si es un FrameContext,
+    si no forma + dtype + CRC32 del contenido (~2-3 ms para un frame Full HD).
+    """
+    if isinstance(frame, FrameContext):
+        return ('seq', frame.seq)
+    data = np.ascontiguousarray(frame)
+    return ('crc', data.shape, data.dtype.str, zlib.crc32(memoryview(data).cast('B')))
+
+def _cache_key(model_type: str, conf_threshold: float, frame) -> tuple:
+    """Clave de la caché: modelo y su generación, umbral y frame (la generación se toma antes de inferir)"""
+    with _swap_lock:
+        generation = _model_generations[model_type]
+    return (model_type, generation, round(float(conf_threshold), 4), frame_key(frame))
+
+def _prediction_nbytes(prediction: dict) -> int:
+    return sum(value.nbytes for value in prediction.values() if isinstance(value, np.ndarray))
+
+def _cache_get(key: tuple) -> Optional[dict]:
+    with _result_cache_lock:
+        prediction = _result_cache.get(key)
+        if prediction is None:
+            _result_cache_stats['misses'] += 1
+            return None
+        _result_cache.move_to_end(key)
+        _result_cache_stats['hits'] += 1
+        return prediction
+
+def _cache_put(key: tuple, prediction: dict) -> None:
+    size = _prediction_nbytes(prediction)
+    with _result_cache_lock:
+        if size > _result_cache_config['max_bytes']:
+            return
+        if key in _result_cache:
+            _result_cache_stats['bytes'] -= _prediction_nbytes(_result_cache.pop(key))
+        _result_cache[key] = prediction
+        _result_cache_stats['bytes'] += size
+        while (len(_result_cache) > _result_cache_config['max_entries'] or
+               _result_cache_stats['bytes'] > _result_cache_config['max_bytes']):
+            _, evicted = _result_cache.popitem(last=False)
+            _result_cache_stats['bytes'] -= _prediction_nbytes(evicted)
+            _result_cache_stats['evictions'] += 1
+
+def configure_result_cache(enabled: Optional[bool] = None, max_entries: Optional[int] = None,
+                           max_mb: Optional[float] = None) -> dict:
+    """Ajusta la caché de resultados (config.json → vision.result_cache). Returns: configuración vigente"""
+    with _result_cache_lock:
+        if enabled is not None:
+            _result_cache_config['enabled'] = bool(enabled)
+        if max_entries is not None:
+            _result_cache_config['max_entries'] = max(1, int(max_entries))
+        if max_mb is not None:
+            _result_cache_config['max_bytes'] = int(float(max_mb) * 1024 * 1024)
+        config = dict(_result_cache_config)
+    if not config['enabled']:
+        clear_result_cache()
+    return config
+
+def clear_result_cache() -> None:
+    """Vacía la caché (p. ej. al cambiar de modelo)"""
+    with _result_cache_lock:
+        _result_cache.clear()
+        _result_cache_stats['bytes'] = 0
+
+def get_result_cache_stats() -> dict:
+    """Contadores de la caché: hits, misses, evictions, entries, bytes, hit_rate"""
+    with _result_cache_lock:
+        stats = dict(_result_cache_stats, entries=len(_result_cache), **_result_cache_config)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+    return stats
+
+
+def _normalize_result(result, frame_shape) -> dict:
+    """Convierte un Results de ultralytics al diccionario de arrays numpy de _predict()"""
+    output = {
+        'boxes': np.zeros((0, 4), dtype=np.float32),
+        'scores': np.zeros((0,), dtype=np.float32),
+        'classes': np.zeros((0,), dtype=np.int32),
+        'obb': None,
+        'masks': None,
+        'orig_shape': tuple(frame_shape[:2])
+    }
+    
+    if getattr(result, 'obb', None) is not None and len(result.obb) > 0:
+        obb = result.obb
+        output['obb'] = obb.xywhr.cpu().numpy().astype(np.float32)
+        output['boxes'] = obb.xyxy.cpu().numpy().astype(np.float32)
+        output['scores'] = obb.conf.cpu().numpy().astype(np.float32)
+        output['classes'] = obb.cls.cpu().numpy().astype(np.int32)
+    elif getattr(result, 'boxes', None) is not None and len(result.boxes) > 0:
+        boxes = result.boxes
+        output['boxes'] = boxes.xyxy.cpu().numpy().astype(np.float32)
+        output['scores'] = boxes.conf.cpu().numpy().astype(np.float32)
+        output['classes'] = boxes.cls.cpu().numpy().astype(np.int32)
+    
+    if getattr(result, 'masks', None) is not None and len(result.masks) > 0:
+        output['masks'] = result.masks.data.cpu().numpy().astype(np.float32)
+    
+    return output
+
+# ============================================================
+# DETECCIÓN DE JUNTA (INFERENCIA ÚNICA)
+# ============================================================
+def _obb_to_dict(xywhr) -> dict:
+    """Convierte un OBB xywhr (radianes) al formato del proyecto"""
+    x, y, w, h, angle = [float(v) for v in xywhr]
+    angle_degrees = float(np.degrees(angle))
+    rect = ((x, y), (w, h), angle_degrees)
+    pts = cv2.boxPoints(rect).astype(np.intp)
+    return {
+        'center': (x, y),
+        'size': (w, h),
+        'angle': angle_degrees,
+        'points': pts,
+        'bbox': (int(pts[:, 0].min()), int(pts[:, 1].min()), int(pts[:, 0].max()), int(pts[:, 1].max()))
+    }
+
+
+def _mask_letterbox(mask_shape, frame_shape) -> Tuple[float, float, float]:
+    """
+    Relación analítica entre la resolución de las máscaras y la del frame.
+    
+    Las máscaras vienen a la resolución de entrada del modelo, con el frame escalado
+    por 'gain' y centrado con relleno (letterbox). Para máscaras sin relleno
+    (backend ONNX) el relleno calculado es ~0.
+    
+    Returns:
+        (gain, pad_x, pad_y): x_frame = (x_mask - pad_x) / gain
+    """
+    mh, mw = mask_shape[-2:]
+    h, w = frame_shape[:2]
+    gain = min(mh / h, mw / w)
+    return gain, (mw - w * gain) / 2.0, (mh - h * gain) / 2.0
+
+
+def _mask_to_frame(mask_data: np.ndarray, frame_shape) -> np.ndarray:
+    """Lleva una máscara del modelo al tamaño del frame (sin el relleno del letterbox) y la binariza (0/1)"""
+    h, w = frame_shape[:2]
+    gain, pad_x, pad_y = _mask_letterbox(mask_data.shape, frame_shape)
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    content = mask_data[top:top + int(round(h * gain)), left:left + int(round(w * gain))]
+    mask = cv2.resize(content, (w, h), interpolation=cv2.INTER_LINEAR)
+    return (mask > 0.5).astype(np.uint8)
+
+
+def mask_centroids(masks: np.ndarray, frame_shape, threshold: float = 0.5) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Centroide y área de la componente conexa MAYOR de cada máscara (mismo criterio que
+    el contorno de mayor área: los fragmentos sueltos de una máscara no desplazan el centro).
+    
+    Las componentes se buscan sobre las máscaras a baja resolución (letterbox del modelo)
+    y los centroides se llevan al frame analíticamente, sin redimensionar ninguna máscara
+    al tamaño del frame.
+    
+    Args:
+        masks: (N, h, w) float a resolución del modelo
+        frame_shape: Forma del frame original
+        threshold: Umbral de binarización
+    
+    Returns:
+        (centers (N, 2) en píxeles del frame, areas (N,) en píxeles² del frame);
+        las máscaras vacías tienen área 0 y centro NaN
+    """
+    binary = (masks > threshold).astype(np.uint8)
+    n, mh, mw = binary.shape
+    centers = np.full((n, 2), np.nan)
+    areas = np.zeros(n)
+    
+    for i in range(n):
+        count, _, stats, centroids = cv2.connectedComponentsWithStats(binary[i], connectivity=8)
+        if count < 2:
+            continue
+        largest = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+        areas[i] = stats[largest, cv2.CC_STAT_AREA]
+        centers[i] = centroids[largest] + 0.5       # Índice de píxel → centro del píxel
+    
+    gain, pad_x, pad_y = _mask_letterbox((mh, mw), frame_shape)
+    centers = np.stack([(centers[:, 0] - pad_x) / gain, (centers[:, 1] - pad_y) / gain], axis=1)
+    return centers, areas / (gain * gain)
+
+
+def detection_mask(detection: Dict[str, Any]) -> Optional[np.ndarray]:
+    """
+    Máscara binaria del tamaño del frame de una detección de infer_gasket().
+    
+    Las máscaras se convierten al frame la primera vez que se piden (un resize por
+    detección): quien solo usa el bbox no paga ninguna conversión.
+    
+    Returns:
+        Máscara (H, W) uint8 0/1 o None si el modelo no es de segmentación
+    """
+    loader = detection.get('_mask_loader')
+    if detection.get('mask') is None and loader is not None:
+        detection['mask'] = loader()
+    return detection.get('mask')
+
+
+def _infer_gasket(frame, conf_threshold: float) -> Optional[dict]:
+    """Implementación de infer_gasket() sobre un numpy array o FrameContext"""
+    start = time.time()
+    prediction = _predict('detection', frame, conf_threshold)
+    if prediction is None:
+        return None
+    frame = get_frame(frame)
+    
+    is_obb = prediction['obb'] is not None
+    masks = prediction['masks']
+    detections = []
+    
+    for i in range(len(prediction['scores'])):
+        if is_obb:
+            obb = _obb_to_dict(prediction['obb'][i])
+            bbox = obb['bbox']
+        else:
+            obb = None
+            bbox = tuple(int(v) for v in prediction['boxes'][i])
+        
+        detections.append({
+            'bbox': bbox,
+            'obb': obb,
+            'confidence': float(prediction['scores'][i]),
+            'class_id': int(prediction['classes'][i]),
+            'mask': None,
+            '_mask_loader': partial(_mask_to_frame, masks[i], frame.shape)
+                            if masks is not None and i < len(masks) else None
+        })
+    
+    return {
+        'type': 'obb' if is_obb else 'bbox',
+        'detections': detections,
+        'best': detections[0] if detections else None,
+        'has_masks': masks is not None,
+        'frame_shape': tuple(frame.shape[:2]),
+        'inference_ms': (time.time() - start) * 1000.0
+    }
+
+
+def infer_gasket(frame, conf_threshold: float = 0.5) -> Optional[dict]:
+    """
+    Detecta la junta con UNA sola inferencia y devuelve todo lo que produce el modelo.
+    
+    Si se recibe un FrameContext, el resultado queda cacheado en el contexto: las
+    llamadas posteriores sobre el mismo frame (p. ej. detect_gasket() y
+    detect_gasket_with_mask()) no vuelven a ejecutar el modelo.
     
     Args:
-        frame: Frame de OpenCV
+        frame: Frame de OpenCV o FrameContext
         conf_threshold: Umbral de confianza
     
     Returns:
-        Para YOLO normal: (x1, y1, x2, y2)
-        Para YOLO-OBB: {'type': 'obb', 'center': (x, y), 'size': (w, h), 'angle': angle, 'points': pts, 'bbox': (x1, y1, x2, y2)}
-        None si no se detecta
+        {
+            'type': 'obb' o 'bbox',
+            'detections': [{'bbox': (x1, y1, x2, y2), 'obb': dict o None, 'confidence': float,
+                            'class_id': int, 'mask': máscara binaria del tamaño del frame o None
+                            (se completa al pedirla con detection_mask())}],
+            'best': primera detección (mayor confianza) o None,
+            'has_masks': bool, 'frame_shape': (H, W), 'inference_ms': float
+        }
+        None si el modelo no está disponible o falla la inferencia
     """
-    if not OPENCV_AVAILABLE or not YOLO_AVAILABLE or _models['detection'] is None:
+    if not OPENCV_AVAILABLE or not is_model_loaded('detection'):
         return None
     
     if frame is None:
         return None
     
     try:
-        # Ejecutar detección
-        results = _models['detection'](frame, conf=conf_threshold, verbose=False)
-        
-        # Verificar que hay resultados
-        if results is None or len(results) == 0:
-            print("[yolo] No se recibieron resultados del modelo")
-            return None
-        
-        # Para YOLO-OBB, verificar si hay atributo 'obb' en lugar de 'boxes'
-        result = results[0]
-        
-        # Intentar obtener detecciones de OBB primero, luego boxes
-        if hasattr(result, 'obb') and result.obb is not None and len(result.obb) > 0:
-            # ⭐ YOLO-OBB: Usar datos de oriented bounding box
-            obb = result.obb[0]
-            xywhr_data = obb.xywhr[0].cpu().numpy()
-            x, y, w, h, angle = xywhr_data
-            
-            print(f"[yolo] 🔍 DEBUG OBB raw: x={x:.1f}, y={y:.1f}, w={w:.1f}, h={h:.1f}, angle_raw={angle:.4f}")
-            
-            # YOLO-OBB usa radianes, convertir a grados para OpenCV
-            angle_degrees = float(np.degrees(angle))
-            print(f"[yolo] 🔍 DEBUG angle converted: {angle_degrees:.1f}°")
-            
-            # Calcular los 4 puntos del rectángulo rotado
-            rect = ((float(x), float(y)), (float(w), float(h)), angle_degrees)
-            pts = np.int0(cv2.boxPoints(rect))
-            
-            print(f"[yolo] 🔍 DEBUG puntos: {pts.tolist()}")
-            
-            # Calcular bbox alineado a ejes (para compatibilidad)
-            x_coords = pts[:, 0]
-            y_coords = pts[:, 1]
-            x1, y1 = int(x_coords.min()), int(y_coords.min())
-            x2, y2 = int(x_coords.max()), int(y_coords.max())
-            
-            print(f"[yolo] ✓ YOLO-OBB detectado: center=({x:.1f}, {y:.1f}), size=({w:.1f}x{h:.1f}), angle={angle_degrees:.1f}°")
-            
-            return {
-                'type': 'obb',
-                'center': (float(x), float(y)),
-                'size': (float(w), float(h)),
-                'angle': angle_degrees,
-                'points': pts,
-                'bbox': (x1, y1, x2, y2)  # Bbox alineado a ejes para compatibilidad
-            }
-        
-        elif hasattr(result, 'boxes') and result.boxes is not None and len(result.boxes) > 0:
-            # ⭐ YOLO normal: Bounding box recto
-            box = result.boxes[0]
-            bbox = box.xyxy[0].cpu().numpy()
-            x1, y1, x2, y2 = map(int, bbox)
-            
-            print(f"[yolo] ✓ YOLO normal detectado: bbox=({x1}, {y1}, {x2}, {y2})")
-            
-            return (x1, y1, x2, y2)
-        
-        else:
-            # No se detectó nada
-            print("[yolo] No se detectaron objetos (obb y boxes vacíos)")
-            return None
+        if isinstance(frame, FrameContext):
+            ctx = frame
+            return ctx._memo(('yolo_gasket', float(conf_threshold)),
+                             lambda: _infer_gasket(ctx, conf_threshold))
+        return _infer_gasket(frame, conf_threshold)
     
     except Exception as e:
-        print(f"[yolo] Error detectando junta: {e}")
+        print(f"[yolo] Error en inferencia de junta: {e}")
         return None
 
 
+def detect_gasket(frame, conf_threshold: float = 0.5):
+    """
+    Detecta la junta completa y devuelve su bounding box.
+    Compatible con YOLO normal (xyxy) y YOLO-OBB (xywhr).
+    Envoltorio de compatibilidad sobre infer_gasket().
+    
+    Args:
+        frame: Frame de OpenCV o FrameContext
+        conf_threshold: Umbral de confianza
+    
+    Returns:
+        Para YOLO normal: (x1, y1, x2, y2)
+        Para YOLO-OBB: {'type': 'obb', 'center': (x, y), 'size': (w, h), 'angle': angle, 'points': pts, 'bbox': (x1, y1, x2, y2)}
+        None si no se detecta
+    """
+    result = infer_gasket(frame, conf_threshold)
+    if result is None or result['best'] is None:
+        print("[yolo] No se detectaron objetos (obb y boxes vacíos)")
+        return None
+    
+    best = result['best']
+    if result['type'] == 'obb':
+        obb = best['obb']
+        print(f"[yolo] ✓ YOLO-OBB detectado: center=({obb['center'][0]:.1f}, {obb['center'][1]:.1f}), "
+              f"size=({obb['size'][0]:.1f}x{obb['size'][1]:.1f}), angle={obb['angle']:.1f}°")
+        return dict(obb, type='obb')
+    
+    print(f"[yolo] ✓ YOLO normal detectado: bbox={best['bbox']}")
+    return best['bbox']
+
+
 def detect_gasket_with_mask(frame, conf_threshold: float = 0.5) -> Optional[Tuple[Tuple[int, int, int, int], np.ndarray]]:
     """
     Detecta la junta completa y devuelve su bounding box y máscara de segmentación.
+    Envoltorio de compatibilidad sobre infer_gasket().
     
     Args:
-        frame: Frame de OpenCV
+        frame: Frame de OpenCV o FrameContext
         conf_threshold: Umbral de confianza
     
     Returns:
         ((x1, y1, x2, y2), mask) o None si no se detecta
         mask es un array numpy binario del tamaño del frame
     """
-    if not OPENCV_AVAILABLE or not YOLO_AVAILABLE or _models['detection'] is None:
+    result = infer_gasket(frame, conf_threshold)
+    if result is None or result['best'] is None:
         return None
     
-    if frame is None:
-        return None
-    
-    try:
-        # Ejecutar detección
-        results = _models['detection'](frame, conf=conf_threshold, verbose=False)
-        
-        # Verificar que se detectó algo
-        if len(results[0].boxes) == 0:
-            return None
-        
-        # Obtener primer bbox (mejor detección)
-        bbox = results[0].boxes[0].xyxy[0].cpu().numpy()
-        x1, y1, x2, y2 = map(int, bbox)
-        
-        # Intentar obtener máscara de segmentación (si el modelo lo soporta)
-        mask = None
-        if hasattr(results[0], 'masks') and results[0].masks is not None and len(results[0].masks) > 0:
-            # El modelo es de segmentación (YOLOv8-seg)
-            mask_data = results[0].masks[0].data.cpu().numpy()[0]  # Primera máscara
-            
-            # Redimensionar máscara al tamaño del frame
-            h, w = frame.shape[:2]
-            mask = cv2.resize(mask_data, (w, h), interpolation=cv2.INTER_LINEAR)
-            
-            # Binarizar (threshold)
-            mask = (mask > 0.5).astype(np.uint8)
-        else:
-            # El modelo es solo de detección, crear máscara simple desde el bbox
-            h, w = frame.shape[:2]
-            mask = np.zeros((h, w), dtype=np.uint8)
-            mask[y1:y2, x1:x2] = 1
-        
-        return ((x1, y1, x2, y2), mask)
+    best = result['best']
+    x1, y1, x2, y2 = best['bbox']
+    mask = detection_mask(best)
+    if mask is None:
+        # El modelo es solo de detección, crear máscara simple desde el bbox
+        h, w = result['frame_shape']
+        mask = np.zeros((h, w), dtype=np.uint8)
+        mask[max(0, y1):y2, max(0, x1):x2] = 1
     
-    except Exception as e:
-        print(f"[yolo] Error detectando junta con máscara: {e}")
-        return None
+    return ((x1, y1, x2, y2), mask)
 
 # ============================================================
 # DETECCIÓN DE AGUJEROS
@@ -260,53 +970,31 @@ def detect_holes(frame, conf_threshold: float = 0.5) -> List[Tuple[int, int]]:
     Detecta agujeros en el frame usando YOLO y calcula sus centros geométricos.
     
     Args:
-        frame: Frame de OpenCV (numpy array)
+        frame: Frame de OpenCV (numpy array) o FrameContext
         conf_threshold: Umbral de confianza (default: 0.5)
     
     Returns:
         Lista de centros [(x1, y1), (x2, y2), ...]
     """
-    if not OPENCV_AVAILABLE or not YOLO_AVAILABLE or _models['holes'] is None:
+    if not OPENCV_AVAILABLE or not is_model_loaded('holes'):
         return []
     
     if frame is None:
         return []
     
+    image = get_frame(frame)
+    
     try:
-        # Ejecutar detección YOLO
-        results = _models['holes'](frame, conf=conf_threshold, verbose=False)
+        # Ejecutar detección YOLO (con FrameContext la caché de resultados usa su número de secuencia)
+        prediction = _predict('holes', frame, conf_threshold)
         
         # Verificar que hay máscaras detectadas
-        if results[0].masks is None:
+        if prediction is None or prediction['masks'] is None:
             return []
         
-        centers = []
-        
-        # Procesar cada máscara detectada
-        for mask_tensor in results[0].masks.data:
-            # Convertir tensor a numpy array
-            float_mask = mask_tensor.cpu().numpy()
-            
-            # Convertir a máscara binaria (0 o 255)
-            binary_mask = (float_mask > 0.5).astype(np.uint8) * 255
-            
-            # Redimensionar al tamaño del frame
-            mask_resized = cv2.resize(binary_mask, (frame.shape[1], frame.shape[0]))
-            
-            # Encontrar contornos
-            contours, _ = cv2.findContours(mask_resized, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            if contours:
-                # Seleccionar contorno de mayor área
-                largest_contour = max(contours, key=cv2.contourArea)
-                
-                # Calcular centro geométrico usando momentos
-                moments = cv2.moments(largest_contour)
-                
-                if moments["m00"] != 0:  # Evitar división por cero
-                    center_x = int(moments["m10"] / moments["m00"])
-                    center_y = int(moments["m01"] / moments["m00"])
-                    centers.append((center_x, center_y))
+        # Centroide de la componente mayor de cada máscara (sin redimensionar al frame)
+        centers_xy, areas = mask_centroids(prediction['masks'], image.shape)
+        centers = [(int(x), int(y)) for (x, y), area in zip(centers_xy, areas) if area > 0]
         
         return centers
     
@@ -329,7 +1017,7 @@ def detect_holes_bboxes(frame, conf_threshold: float = 0.5) -> List[dict]:
     Esta función es simple y hace UNA sola cosa: detectar ubicaciones.
     
     Args:
-        frame: Frame de OpenCV (numpy array)
+        frame: Frame de OpenCV (numpy array) o FrameContext
         conf_threshold: Umbral de confianza (default: 0.5)
     
     Returns:
@@ -337,31 +1025,24 @@ def detect_holes_bboxes(frame, conf_threshold: float = 0.5) -> List[dict]:
         Lista vacía si no se detecta nada
     """
     
-    if not OPENCV_AVAILABLE or not YOLO_AVAILABLE or _models['holes'] is None:
+    if not OPENCV_AVAILABLE or not is_model_loaded('holes'):
         return []
     
     if frame is None:
         return []
     
     try:
-        # Ejecutar detección YOLO
-        results = _models['holes'](frame, conf=conf_threshold, verbose=False)
+        # Ejecutar detección YOLO (con FrameContext la caché de resultados usa su número de secuencia)
+        prediction = _predict('holes', frame, conf_threshold)
         
         # Verificar que hay detecciones
-        if results is None or len(results) == 0:
-            return []
-        
-        result = results[0]
-        
-        # Verificar si el modelo retorna boxes
-        if not hasattr(result, 'boxes') or result.boxes is None or len(result.boxes) == 0:
+        if prediction is None or len(prediction['boxes']) == 0:
             return []
         
         detecciones = []
         
         # Por cada detección, extraer solo el bounding box
-        for box in result.boxes:
-            bbox = box.xyxy[0].cpu().numpy()
+        for bbox in prediction['boxes']:
             x1, y1, x2, y2 = map(int, bbox)
             
             detecciones.append({
@@ -375,4 +1056,191 @@ def detect_holes_bboxes(frame, conf_threshold: float = 0.5) -> List[dict]:
         print(f"[yolo] Error detectando agujeros (bboxes): {e}")
         return []
 
+# ============================================================
+# DETECCIÓN DE AGUJEROS - LOTES DE RECORTES
+# ============================================================
+HOLES_BATCH_SIZE = 8   # Recortes por forward pass
 
+def detect_holes_bboxes_batch(crops: List[np.ndarray], conf_threshold: float = 0.5,
+                              offsets: Optional[List[Tuple[int, int]]] = None,
+                              batch_size: int = HOLES_BATCH_SIZE) -> List[List[dict]]:
+    """
+    Detecta agujeros en varios recortes con inferencias por lotes.
+    
+    Los recortes se agrupan de a batch_size y cada grupo se procesa en UN forward
+    pass (letterbox común). Las coordenadas se devuelven en el sistema del frame
+    sumando el offset de cada recorte.
+    
+    Args:
+        crops: Lista de recortes (numpy arrays)
+        conf_threshold: Umbral de confianza
+        offsets: (x, y) de la esquina superior izquierda de cada recorte en el frame
+                 (None = coordenadas del propio recorte)
+        batch_size: Recortes por forward pass
+    
+    Returns:
+        Una lista por recorte: [{'bbox': (x1, y1, x2, y2) en el frame,
+                                 'bbox_crop': (x1, y1, x2, y2) en el recorte,
+                                 'confidence': float}, ...]
+    """
+    if not OPENCV_AVAILABLE or not is_model_loaded('holes'):
+        return [[] for _ in crops]
+    
+    offsets = offsets or [(0, 0)] * len(crops)
+    results: List[List[dict]] = [[] for _ in crops]
+    valid = [i for i, crop in enumerate(crops) if crop is not None and crop.size > 0]
+    
+    try:
+        start = time.time()
+        for chunk_start in range(0, len(valid), max(1, batch_size)):
+            indices = valid[chunk_start:chunk_start + batch_size]
+            predictions = _predict_batch('holes', [crops[i] for i in indices], conf_threshold) or []
+            
+            for i, prediction in zip(indices, predictions):
+                ox, oy = offsets[i]
+                for bbox, score in zip(prediction['boxes'], prediction['scores']):
+                    x1, y1, x2, y2 = map(int, bbox)
+                    results[i].append({
+                        'bbox': (x1 + ox, y1 + oy, x2 + ox, y2 + oy),
+                        'bbox_crop': (x1, y1, x2, y2),
+                        'confidence': float(score)
+                    })
+        
+        total = sum(len(r) for r in results)
+        print(f"[yolo] ✓ Lote de {len(valid)} recortes: {total} agujeros en {time.time() - start:.3f}s")
+        return results
+    
+    except Exception as e:
+        print(f"[yolo] Error detectando agujeros por lotes: {e}")
+        return [[] for _ in crops]
+
+
+def detect_holes_in_rois(frame, rois: List[Tuple[int, int, int, int]], conf_threshold: float = 0.5,
+                         batch_size: int = HOLES_BATCH_SIZE) -> List[List[dict]]:
+    """
+    Recorta varias regiones (x1, y1, x2, y2) de un frame y detecta agujeros en
+    todas ellas por lotes. Ver detect_holes_bboxes_batch().
+    """
+    frame = get_frame(frame)
+    if frame is None:
+        return [[] for _ in rois]
+    
+    h, w = frame.shape[:2]
+    crops, offsets = [], []
+    for x1, y1, x2, y2 in rois:
+        x1, y1 = max(0, int(x1)), max(0, int(y1))
+        x2, y2 = min(w, int(x2)), min(h, int(y2))
+        crops.append(frame[y1:y2, x1:x2])
+        offsets.append((x1, y1))
+    
+    return detect_holes_bboxes_batch(crops, conf_threshold, offsets, batch_size)
+
+
+# ============================================================
+# DETECCIÓN DE AGUJEROS - MOSAICO (TILES)
+# ============================================================
+TILE_SIZE_PX = 640      # Lado del tile = entrada nativa del modelo (los agujeros no se reducen)
+TILE_OVERLAP_PX = 96    # Solape mínimo entre tiles: debe superar el diámetro de un agujero (~30 px en 1920x1080)
+TILE_EDGE_PX = 2        # Detecciones a menos de esto de un borde interior del tile se descartan (cortadas)
+TILE_NMS_IOU = 0.5      # IoU a partir del cual dos detecciones de tiles distintos son el mismo agujero
+
+def tile_grid(region: Tuple[int, int, int, int], tile_size: int = TILE_SIZE_PX,
+              overlap: int = TILE_OVERLAP_PX) -> List[Tuple[int, int, int, int]]:
+    """
+    Divide una región (x1, y1, x2, y2) en tiles de tile_size con al menos overlap
+    píxeles de solape. Los tiles se reparten uniformemente y el último queda
+    apoyado en el borde de la región (ningún tile sale de ella).
+    """
+    x1, y1, x2, y2 = region
+    step = max(1, tile_size - overlap)
+    
+    def starts(lo: int, hi: int) -> List[int]:
+        span = hi - lo - tile_size
+        if span <= 0:
+            return [lo]
+        n = int(np.ceil(span / step)) + 1
+        return [lo + int(round(i * span / (n - 1))) for i in range(n)]
+    
+    return [(sx, sy, min(sx + tile_size, x2), min(sy + tile_size, y2))
+            for sy in starts(y1, y2) for sx in starts(x1, x2)]
+
+
+def nms_boxes(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = TILE_NMS_IOU) -> List[int]:
+    """
+    Supresión de no máximos (greedy por confianza) sobre cajas xyxy.
+    
+    Returns:
+        Índices de las cajas conservadas, de mayor a menor confianza
+    """
+    if len(boxes) == 0:
+        return []
+    boxes = np.asarray(boxes, dtype=np.float64)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = np.argsort(-np.asarray(scores))
+    keep = []
+    while order.size:
+        i, rest = order[0], order[1:]
+        keep.append(int(i))
+        inter_w = np.clip(np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0]), 0, None)
+        inter_h = np.clip(np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1]), 0, None)
+        inter = inter_w * inter_h
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return keep
+
+
+def detect_holes_tiled(frame, conf_threshold: float = 0.5, region: Optional[Tuple[int, int, int, int]] = None,
+                       tile_size: int = TILE_SIZE_PX, overlap: int = TILE_OVERLAP_PX,
+                       iou_threshold: float = TILE_NMS_IOU, batch_size: int = HOLES_BATCH_SIZE) -> List[dict]:
+    """
+    Detecta agujeros a resolución nativa recorriendo la región con tiles solapados.
+    
+    Con el frame completo el modelo reduce 1920x1080 a su entrada y los agujeros
+    chicos se pierden; con tiles del tamaño de la entrada no hay reducción. Los
+    tiles se infieren por lotes, las detecciones cortadas por un borde interior
+    se descartan (el solape garantiza que el agujero entero está en el tile
+    vecino) y los duplicados entre tiles se fusionan con NMS.
+    
+    Args:
+        frame: Frame de OpenCV (numpy array) o FrameContext
+        conf_threshold: Umbral de confianza
+        region: (x1, y1, x2, y2) a recorrer, p. ej. la ROI de la junta (None = frame completo)
+        tile_size: Lado de cada tile en píxeles
+        overlap: Solape mínimo entre tiles en píxeles
+        iou_threshold: IoU de la NMS entre tiles
+        batch_size: Tiles por forward pass
+    
+    Returns:
+        [{'bbox': (x1, y1, x2, y2) en el frame, 'confidence': float}, ...] de mayor a menor confianza
+    """
+    frame = get_frame(frame)
+    if frame is None or not OPENCV_AVAILABLE or not is_model_loaded('holes'):
+        return []
+    
+    h, w = frame.shape[:2]
+    region = region or (0, 0, w, h)
+    rx1, ry1 = max(0, int(region[0])), max(0, int(region[1]))
+    rx2, ry2 = min(w, int(region[2])), min(h, int(region[3]))
+    tiles = tile_grid((rx1, ry1, rx2, ry2), tile_size, overlap)
+    
+    start = time.time()
+    per_tile = detect_holes_in_rois(frame, tiles, conf_threshold, batch_size)
+    
+    boxes, scores = [], []
+    for (tx1, ty1, tx2, ty2), detections in zip(tiles, per_tile):
+        # Bordes del tile que no coinciden con el de la región: ahí los agujeros pueden estar cortados
+        left, top = tx1 > rx1, ty1 > ry1
+        right, bottom = tx2 < rx2, ty2 < ry2
+        for det in detections:
+            x1, y1, x2, y2 = det['bbox']
+            if ((left and x1 - tx1 < TILE_EDGE_PX) or (top and y1 - ty1 < TILE_EDGE_PX) or
+                    (right and tx2 - x2 < TILE_EDGE_PX) or (bottom and ty2 - y2 < TILE_EDGE_PX)):
+                continue
+            boxes.append(det['bbox'])
+            scores.append(det['confidence'])
+    
+    keep = nms_boxes(np.array(boxes).reshape(-1, 4), np.array(scores), iou_threshold)
+    detections = [{'bbox': tuple(boxes[i]), 'confidence': scores[i]} for i in keep]
+    print(f"[yolo] ✓ Mosaico de {len(tiles)} tiles: {len(detections)} agujeros "
+          f"({len(boxes) - len(keep)} duplicados fusionados) en {time.time() - start:.3f}s")
+    return detections
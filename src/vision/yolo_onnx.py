@@ -0,0 +1,553 @@
+# yolo_onnx.py - Backend de inferencia YOLO en CPU (ONNX Runtime / OpenVINO)
+"""
+YOLO ONNX Backend - COMAU-VISION
+================================
+
+Backend alternativo para yolo_detector pensado para los PCs de línea sin GPU:
+
+- Exporta el .pt a ONNX UNA vez (con ultralytics) y cachea el export junto al modelo
+- Ejecuta el ONNX con ONNX Runtime u OpenVINO en CPU
+- Pre/post-procesado propio (letterbox, NMS, máscaras, OBB) sin PyTorch en el camino caliente
+
+La salida de predict() es la misma estructura normalizada que usa yolo_detector
+(ver yolo_detector._predict), por lo que el resto del código no distingue backends.
+
+Selección en config.json:
+    "vision": {"inference_backend": "ultralytics" | "onnxruntime" | "openvino"}
+
+Precisión INT8 (solo onnxruntime): cuantización dinámica de pesos del export FP32,
+cacheada junto a él (ver quantize_int8).
+
+Verificación de paridad contra ultralytics (línea de comandos):
+    python -m src.vision.yolo_onnx parity models/holes_model.pt imagenes_juntas/
+y automática en tests/test_yolo_onnx.py (se omite sin ultralytics/onnxruntime o sin los .pt).
+"""
+
+import os
+import json
+import time
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    cv2 = None
+    OPENCV_AVAILABLE = False
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ort = None
+    ONNXRUNTIME_AVAILABLE = False
+
+try:
+    import openvino as ov
+    OPENVINO_AVAILABLE = True
+except ImportError:
+    try:
+        from openvino import runtime as ov
+        OPENVINO_AVAILABLE = True
+    except ImportError:
+        ov = None
+        OPENVINO_AVAILABLE = False
+
+# ============================================================
+# CONFIGURACIÓN
+# ============================================================
+BACKENDS = ('ultralytics', 'onnxruntime', 'openvino')
+EXPORT_DIR_NAME = "onnx_cache"      # Subdirectorio junto al .pt donde se cachean los exports
+DEFAULT_IMGSZ = 640
+IOU_THRESHOLD = 0.7                 # Igual que el predict por defecto de ultralytics
+MAX_DETECTIONS = 300
+MAX_WH = 7680                       # Desplazamiento por clase para NMS no agnóstico
+
+
+def is_backend_available(backend: str) -> bool:
+    """Indica si el runtime del backend está instalado"""
+    if backend == 'onnxruntime':
+        return ONNXRUNTIME_AVAILABLE and OPENCV_AVAILABLE
+    if backend == 'openvino':
+        return OPENVINO_AVAILABLE and OPENCV_AVAILABLE
+    return backend == 'ultralytics'
+
+# ============================================================
+# EXPORT CACHEADO
+# ============================================================
+
+def get_export_path(pt_path: str, imgsz: int = DEFAULT_IMGSZ) -> str:
+    """
+    Ruta del ONNX cacheado para un .pt. El nombre incluye tamaño y mtime del .pt,
+    de modo que reemplazar el modelo invalida el export automáticamente.
+    """
+    stat = os.stat(pt_path)
+    base = os.path.splitext(os.path.basename(pt_path))[0]
+    export_dir = os.path.join(os.path.dirname(os.path.abspath(pt_path)), EXPORT_DIR_NAME)
+    return os.path.join(export_dir, f"{base}-{imgsz}-{int(stat.st_mtime)}-{stat.st_size}.onnx")
+
+
+def export_onnx(pt_path: str, imgsz: int = DEFAULT_IMGSZ) -> str:
+    """
+    Exporta el .pt a ONNX si no hay un export cacheado vigente.
+    Returns: Ruta del .onnx
+    """
+    if pt_path.lower().endswith('.onnx'):
+        return pt_path
+
+    onnx_path = get_export_path(pt_path, imgsz)
+    if os.path.exists(onnx_path):
+        print(f"[yolo_onnx] ✓ Export cacheado: {onnx_path}")
+        return onnx_path
+
+    from ultralytics import YOLO
+
+    print(f"[yolo_onnx] 📦 Exportando {pt_path} a ONNX (imgsz={imgsz})...")
+    start = time.time()
+    exported = YOLO(pt_path).export(format='onnx', imgsz=imgsz, dynamic=False, verbose=False)
+
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    os.replace(str(exported), onnx_path)
+    print(f"[yolo_onnx] ✓ Export guardado en {onnx_path} ({time.time() - start:.1f}s)")
+    return onnx_path
+
+
+def quantize_int8(onnx_path: str) -> str:
+    """
+    Cuantización dinámica INT8 (pesos en uint8, activaciones cuantizadas en tiempo
+    de ejecución) del ONNX FP32. Se cachea como <export>-int8.onnx.
+
+    Returns: Ruta del .onnx cuantizado
+    """
+    int8_path = os.path.splitext(onnx_path)[0] + '-int8.onnx'
+    if os.path.exists(int8_path):
+        print(f"[yolo_onnx] ✓ Export INT8 cacheado: {int8_path}")
+        return int8_path
+
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    print(f"[yolo_onnx] 📦 Cuantizando {onnx_path} a INT8...")
+    start = time.time()
+    tmp_path = int8_path + '.tmp'
+    quantize_dynamic(onnx_path, tmp_path, weight_type=QuantType.QUInt8)
+
+    # Conservar los metadatos de ultralytics (task, names, imgsz) que lee OnnxYoloModel
+    source_meta = {p.key: p.value for p in onnx.load(onnx_path, load_external_data=False).metadata_props}
+    quantized = onnx.load(tmp_path)
+    present = {p.key for p in quantized.metadata_props}
+    for key, value in source_meta.items():
+        if key not in present:
+            entry = quantized.metadata_props.add()
+            entry.key, entry.value = key, value
+    onnx.save(quantized, int8_path)
+    os.remove(tmp_path)
+
+    print(f"[yolo_onnx] ✓ Export INT8 guardado en {int8_path} ({time.time() - start:.1f}s)")
+    return int8_path
+
+# ============================================================
+# PRE-PROCESADO
+# ============================================================
+
+def letterbox(image: np.ndarray, new_shape: Tuple[int, int]) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    Redimensiona manteniendo proporción y rellena hasta new_shape (h, w) con gris 114,
+    igual que el LetterBox de ultralytics.
+
+    Returns:
+        (imagen, gain, (pad_x, pad_y))
+    """
+    h, w = image.shape[:2]
+    gain = min(new_shape[0] / h, new_shape[1] / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+    pad_x, pad_y = (new_shape[1] - new_w) / 2, (new_shape[0] - new_h) / 2
+
+    if (w, h) != (new_w, new_h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return image, gain, (pad_x, pad_y)
+
+
+def _to_tensor(images: List[np.ndarray]) -> np.ndarray:
+    """Lote BGR uint8 (HWC) → tensor float32 RGB NCHW normalizado a [0, 1]"""
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+# ============================================================
+# POST-PROCESADO
+# ============================================================
+
+def _nms(boxes_xywh: np.ndarray, scores: np.ndarray, classes: np.ndarray, iou: float) -> np.ndarray:
+    """NMS no agnóstico (desplazando cajas por clase) con cv2.dnn"""
+    if len(scores) == 0:
+        return np.zeros((0,), dtype=np.int64)
+    offset = classes[:, None].astype(np.float32) * MAX_WH
+    shifted = boxes_xywh.copy()
+    shifted[:, :2] = shifted[:, :2] - shifted[:, 2:] / 2 + offset   # xywh centro → x,y esquina
+    keep = cv2.dnn.NMSBoxes(shifted.tolist(), scores.tolist(), 0.0, iou)
+    return np.asarray(keep, dtype=np.int64).reshape(-1)[:MAX_DETECTIONS]
+
+
+def _nms_rotated(xywhr: np.ndarray, scores: np.ndarray, classes: np.ndarray, iou: float) -> np.ndarray:
+    """NMS rotado con cv2.dnn (el ángulo en grados, como espera OpenCV)"""
+    if len(scores) == 0:
+        return np.zeros((0,), dtype=np.int64)
+    rects = [((float(x + c * MAX_WH), float(y + c * MAX_WH)), (float(w), float(h)), float(np.degrees(r)))
+             for (x, y, w, h, r), c in zip(xywhr, classes)]
+    keep = cv2.dnn.NMSBoxesRotated(rects, scores.tolist(), 0.0, iou)
+    return np.asarray(keep, dtype=np.int64).reshape(-1)[:MAX_DETECTIONS]
+
+
+def _xywh_to_xyxy(xywh: np.ndarray) -> np.ndarray:
+    xyxy = np.empty_like(xywh)
+    xyxy[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    xyxy[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+    return xyxy
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+# ============================================================
+# MODELO
+# ============================================================
+
+class OnnxYoloModel:
+    """
+    Modelo YOLO exportado a ONNX ejecutado con ONNX Runtime u OpenVINO.
+    Soporta las tareas detect, segment y obb de ultralytics.
+    """
+
+    def __init__(self, onnx_path: str, backend: str = 'onnxruntime', num_threads: Optional[int] = None):
+        if not is_backend_available(backend):
+            raise RuntimeError(f"Backend {backend} no disponible")
+
+        self.path = onnx_path
+        self.backend = backend
+
+        if backend == 'onnxruntime':
+            options = ort.SessionOptions()
+            if num_threads:
+                options.intra_op_num_threads = int(num_threads)
+            self._session = ort.InferenceSession(onnx_path, sess_options=options,
+                                                 providers=['CPUExecutionProvider'])
+            self._input_name = self._session.get_inputs()[0].name
+            self.metadata = self._read_metadata(onnx_path, self._session)
+        else:
+            core = ov.Core()
+            config = {'INFERENCE_NUM_THREADS': int(num_threads)} if num_threads else {}
+            self._compiled = core.compile_model(onnx_path, 'CPU', config)
+            self.metadata = self._read_metadata(onnx_path)
+
+        self.task = self.metadata.get('task', 'detect')
+        self.names = self.metadata.get('names', {})
+        imgsz = self.metadata.get('imgsz', [DEFAULT_IMGSZ, DEFAULT_IMGSZ])
+        self.imgsz = (int(imgsz[0]), int(imgsz[1]))
+
+        print(f"[yolo_onnx] ✓ Modelo {os.path.basename(onnx_path)} cargado con {backend} "
+              f"(task={self.task}, imgsz={self.imgsz})")
+
+    @staticmethod
+    def _read_metadata(onnx_path: str, session=None) -> Dict[str, Any]:
+        """
+        Metadatos que ultralytics escribe en el ONNX (task, names, imgsz, stride).
+        Se leen de la sesión de ONNX Runtime ya creada o, sin sesión, solo del grafo
+        (onnx.load sin pesos externos): nunca se crea otra sesión de inferencia.
+        """
+        if session is not None:
+            raw = session.get_modelmeta().custom_metadata_map
+        else:
+            import onnx
+            raw = {p.key: p.value for p in onnx.load(onnx_path, load_external_data=False).metadata_props}
+
+        import ast
+        metadata = {}
+        for key, value in raw.items():
+            try:
+                metadata[key] = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                metadata[key] = value
+        return metadata
+
+    def _run(self, tensor: np.ndarray) -> List[np.ndarray]:
+        if self.backend == 'onnxruntime':
+            return self._session.run(None, {self._input_name: tensor})
+        results = self._compiled(tensor)
+        return [results[output] for output in self._compiled.outputs]
+
+    # --------------------------------------------------------
+    # Inferencia
+    # --------------------------------------------------------
+    def predict(self, images, conf: float = 0.25, iou: float = IOU_THRESHOLD) -> List[Dict[str, Any]]:
+        """
+        Inferencia sobre una imagen o una lista de imágenes BGR.
+        El modelo se exporta con batch fijo 1: las imágenes se ejecutan de a una.
+
+        Returns:
+            Lista de salidas normalizadas (formato de yolo_detector._predict)
+        """
+        if isinstance(images, np.ndarray):
+            images = [images]
+
+        outputs = []
+        for image in images:
+            boxed, gain, pad = letterbox(image, self.imgsz)
+            raw = self._run(_to_tensor([boxed]))
+            outputs.append(self._postprocess(raw, image.shape, gain, pad, conf, iou))
+        return outputs
+
+    def _postprocess(self, raw: List[np.ndarray], orig_shape, gain: float, pad: Tuple[float, float],
+                     conf: float, iou: float) -> Dict[str, Any]:
+        nc = len(self.names) if self.names else 1
+        pred = raw[0][0].T                                  # (N, 4 + nc + extra)
+        class_scores = pred[:, 4:4 + nc]
+        classes = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(pred)), classes]
+        candidates = scores > conf
+        pred, classes, scores = pred[candidates], classes[candidates], scores[candidates]
+
+        h, w = orig_shape[:2]
+        output = {
+            'boxes': np.zeros((0, 4), dtype=np.float32),
+            'scores': np.zeros((0,), dtype=np.float32),
+            'classes': np.zeros((0,), dtype=np.int32),
+            'obb': None,
+            'masks': None,
+            'orig_shape': (h, w)
+        }
+
+        if self.task == 'obb':
+            xywhr = np.concatenate([pred[:, :4], pred[:, 4 + nc:4 + nc + 1]], axis=1)
+            keep = _nms_rotated(xywhr, scores, classes, iou)
+            xywhr = xywhr[keep]
+            xywhr[:, 0] = (xywhr[:, 0] - pad[0]) / gain
+            xywhr[:, 1] = (xywhr[:, 1] - pad[1]) / gain
+            xywhr[:, 2:4] /= gain
+            boxes = np.array([cv2.boxPoints(((x, y), (bw, bh), np.degrees(r)))
+                              for x, y, bw, bh, r in xywhr]).reshape(-1, 4, 2)
+            xyxy = np.concatenate([boxes.min(axis=1), boxes.max(axis=1)], axis=1) if len(boxes) else np.zeros((0, 4))
+            output['obb'] = xywhr.astype(np.float32) if len(xywhr) else None
+        else:
+            keep = _nms(pred[:, :4], scores, classes, iou)
+            xyxy = _xywh_to_xyxy(pred[keep, :4])
+            xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - pad[0]) / gain
+            xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - pad[1]) / gain
+            xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+            xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+
+            if self.task == 'segment' and len(keep):
+                output['masks'] = self._masks(pred[keep, 4 + nc:], raw[1][0], pred[keep, :4], pad, gain, orig_shape)
+
+        output['boxes'] = xyxy.astype(np.float32)
+        output['scores'] = scores[keep].astype(np.float32)
+        output['classes'] = classes[keep].astype(np.int32)
+        return output
+
+    def _masks(self, coefficients: np.ndarray, protos: np.ndarray, boxes_xywh: np.ndarray,
+               pad: Tuple[float, float], gain: float, orig_shape) -> np.ndarray:
+        """
+        Máscaras a resolución de entrada del modelo, recortadas a su caja y sin el
+        relleno del letterbox: cubren exactamente la imagen original a escala gain,
+        de modo que redimensionarlas al frame es una correspondencia directa.
+        """
+        c, mh, mw = protos.shape
+        masks = _sigmoid(coefficients @ protos.reshape(c, -1)).reshape(-1, mh, mw)
+
+        in_h, in_w = self.imgsz
+        masks = np.stack([cv2.resize(m, (in_w, in_h), interpolation=cv2.INTER_LINEAR) for m in masks])
+
+        # Anular fuera de la caja (como process_mask de ultralytics)
+        xyxy = _xywh_to_xyxy(boxes_xywh)
+        cols = np.arange(in_w)[None, None, :]
+        rows = np.arange(in_h)[None, :, None]
+        inside = ((cols >= xyxy[:, 0, None, None]) & (cols < xyxy[:, 2, None, None]) &
+                  (rows >= xyxy[:, 1, None, None]) & (rows < xyxy[:, 3, None, None]))
+        masks = masks * inside
+
+        # Quitar el relleno del letterbox
+        h, w = orig_shape[:2]
+        top, left = int(round(pad[1] - 0.1)), int(round(pad[0] - 0.1))
+        return masks[:, top:top + int(round(h * gain)), left:left + int(round(w * gain))].astype(np.float32)
+
+
+def load_onnx_model(pt_path: str, backend: str = 'onnxruntime', imgsz: int = DEFAULT_IMGSZ,
+                    num_threads: Optional[int] = None, precision: str = 'fp32') -> OnnxYoloModel:
+    """
+    Exporta (si hace falta) y carga un modelo con el backend indicado.
+    precision='int8' usa la cuantización dinámica (solo onnxruntime; con OpenVINO se usa FP32).
+    """
+    onnx_path = export_onnx(pt_path, imgsz)
+    if precision == 'int8':
+        if backend == 'onnxruntime':
+            onnx_path = quantize_int8(onnx_path)
+        else:
+            print(f"[yolo_onnx] ⚠️ INT8 dinámico no soportado con {backend}, usando FP32")
+    return OnnxYoloModel(onnx_path, backend, num_threads)
+
+# ============================================================
+# PARIDAD CON ULTRALYTICS
+# ============================================================
+
+def _box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU entre dos conjuntos de cajas xyxy → matriz (len(a), len(b))"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def _mask_iou(a: np.ndarray, b: np.ndarray) -> float:
+    """IoU entre dos máscaras binarias del mismo tamaño"""
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def compare_predictions(reference: Dict[str, Any], candidate: Dict[str, Any],
+                        min_iou: float = 0.9, max_score_diff: float = 0.05,
+                        min_mask_iou: float = 0.9) -> Dict[str, Any]:
+    """
+    Compara dos salidas normalizadas emparejando cajas por IoU. Si ambas traen
+    máscaras, las de cada par se comparan al tamaño del frame (sin letterbox).
+    Returns: {'ok', 'reference', 'candidate', 'matched', 'min_iou', 'max_score_diff', 'min_mask_iou'}
+    """
+    from src.vision.yolo_detector import _mask_to_frame
+
+    iou = _box_iou(reference['boxes'], candidate['boxes'])
+    compare_masks = reference.get('masks') is not None and candidate.get('masks') is not None
+    matched, ious, score_diffs, mask_ious = 0, [], [], []
+    free = set(range(len(candidate['boxes'])))
+    for i in np.argsort(-reference['scores']):
+        if not free:
+            break
+        j = max(free, key=lambda k: iou[i, k])
+        if iou[i, j] >= min_iou:
+            free.discard(j)
+            matched += 1
+            ious.append(float(iou[i, j]))
+            score_diffs.append(abs(float(reference['scores'][i] - candidate['scores'][j])))
+            if compare_masks:
+                mask_ious.append(_mask_iou(_mask_to_frame(reference['masks'][i], reference['orig_shape']),
+                                           _mask_to_frame(candidate['masks'][j], candidate['orig_shape'])))
+
+    worst_score = max(score_diffs) if score_diffs else 0.0
+    worst_mask = min(mask_ious) if mask_ious else None
+    return {
+        'ok': (matched == len(reference['boxes']) == len(candidate['boxes']) and worst_score <= max_score_diff
+               and (worst_mask is None or worst_mask >= min_mask_iou)),
+        'reference': int(len(reference['boxes'])),
+        'candidate': int(len(candidate['boxes'])),
+        'matched': matched,
+        'min_iou': min(ious) if ious else None,
+        'max_score_diff': worst_score,
+        'min_mask_iou': worst_mask
+    }
+
+
+def run_parity(pt_path: str, source: str, backend: str = 'onnxruntime', imgsz: int = DEFAULT_IMGSZ,
+               conf: float = 0.5, min_iou: float = 0.9, max_score_diff: float = 0.05,
+               max_images: int = 20, min_mask_iou: float = 0.9) -> Dict[str, Any]:
+    """
+    Ejecuta ultralytics y el backend ONNX sobre las mismas imágenes y compara resultados.
+
+    Args:
+        pt_path: Modelo .pt
+        source: Imagen o directorio (se recorre recursivamente)
+        backend: 'onnxruntime' u 'openvino'
+
+    Returns:
+        {'ok', 'images', 'failures', 'details': [...], 'timing_ms': {'ultralytics', backend}}
+    """
+    from ultralytics import YOLO
+    from src.vision.yolo_detector import _normalize_result
+
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(source)
+                       for name in names if name.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')))
+    else:
+        paths = [source]
+    paths = paths[:max_images]
+
+    reference_model = YOLO(pt_path)
+    candidate_model = load_onnx_model(pt_path, backend, imgsz)
+
+    details, failures = [], 0
+    timing = {'ultralytics': 0.0, backend: 0.0}
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+
+        start = time.time()
+        reference = _normalize_result(reference_model(image, conf=conf, imgsz=imgsz, verbose=False)[0], image.shape)
+        timing['ultralytics'] += (time.time() - start) * 1000.0
+
+        start = time.time()
+        candidate = candidate_model.predict(image, conf=conf)[0]
+        timing[backend] += (time.time() - start) * 1000.0
+
+        comparison = compare_predictions(reference, candidate, min_iou, max_score_diff, min_mask_iou)
+        comparison['image'] = path
+        details.append(comparison)
+        if not comparison['ok']:
+            failures += 1
+            print(f"[yolo_onnx] ❌ {path}: {comparison}")
+
+    count = max(1, len(details))
+    return {
+        'ok': failures == 0 and len(details) > 0,
+        'images': len(details),
+        'failures': failures,
+        'details': details,
+        'timing_ms': {k: v / count for k, v in timing.items()}
+    }
+
+# ============================================================
+# LÍNEA DE COMANDOS
+# ============================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backend ONNX de YOLO: export y verificación de paridad")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    export_cmd = sub.add_parser('export', help="Exportar (o reutilizar) el ONNX cacheado de un .pt")
+    export_cmd.add_argument('model')
+    export_cmd.add_argument('--imgsz', type=int, default=DEFAULT_IMGSZ)
+
+    parity_cmd = sub.add_parser('parity', help="Comparar ultralytics contra el backend ONNX")
+    parity_cmd.add_argument('model')
+    parity_cmd.add_argument('source', help="Imagen o directorio de imágenes")
+    parity_cmd.add_argument('--backend', choices=('onnxruntime', 'openvino'), default='onnxruntime')
+    parity_cmd.add_argument('--imgsz', type=int, default=DEFAULT_IMGSZ)
+    parity_cmd.add_argument('--conf', type=float, default=0.5)
+    parity_cmd.add_argument('--min-iou', type=float, default=0.9)
+    parity_cmd.add_argument('--max-score-diff', type=float, default=0.05)
+    parity_cmd.add_argument('--max-images', type=int, default=20)
+    parity_cmd.add_argument('--min-mask-iou', type=float, default=0.9)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        print(export_onnx(args.model, args.imgsz))
+        return 0
+
+    result = run_parity(args.model, args.source, args.backend, args.imgsz, args.conf,
+                        args.min_iou, args.max_score_diff, args.max_images, args.min_mask_iou)
+    print(json.dumps({k: v for k, v in result.items() if k != 'details'}, indent=2))
+    print(f"[yolo_onnx] {'✅ Paridad OK' if result['ok'] else '❌ Paridad FALLIDA'}")
+    return 0 if result['ok'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
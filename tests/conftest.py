@@ -0,0 +1,9 @@
+# conftest.py - Configuración común de los tests
+"""Permite importar los paquetes del proyecto (src, lib) ejecutando pytest desde cualquier directorio"""
+
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
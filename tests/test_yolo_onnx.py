@@ -0,0 +1,207 @@
+# test_yolo_onnx.py - Tests del backend ONNX de YOLO
+"""
+Tests de src/vision/yolo_onnx.py:
+
+- Pre/post-procesado (letterbox, decodificación, NMS, máscaras, OBB) sobre tensores sintéticos
+- Sesión de ONNX Runtime con un modelo mínimo generado en el test (se omite sin onnx/onnxruntime)
+- Paridad contra ultralytics con los modelos de config.json (se omite sin ultralytics,
+  onnxruntime o sin los .pt)
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from src import config_store
+from src.vision import yolo_onnx
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGES_DIR = os.path.join(PROJECT_ROOT, 'imagenes_juntas')
+
+# Frame 32x64 (h, w) sobre entrada 64x64: gain 1, relleno de 16 px arriba y abajo
+FRAME_SHAPE = (32, 64, 3)
+IMGSZ = (64, 64)
+PAD_Y = 16
+
+
+def _model(task, names):
+    """OnnxYoloModel sin sesión: solo para ejercitar el post-procesado"""
+    model = yolo_onnx.OnnxYoloModel.__new__(yolo_onnx.OnnxYoloModel)
+    model.task, model.names, model.imgsz = task, names, IMGSZ
+    return model
+
+
+def _raw(rows):
+    """Filas por candidato → salida cruda de ultralytics (1, 4 + nc + extra, N)"""
+    return np.asarray(rows, dtype=np.float32).T[None]
+
+
+def _detect_rows():
+    # xywh en el espacio de entrada del modelo, luego scores de las 2 clases
+    return [
+        [20, 20 + PAD_Y, 10, 8, 0.9, 0.0],     # caja A, clase 0
+        [21, 20 + PAD_Y, 10, 8, 0.8, 0.0],     # solapada con A, misma clase → suprimida
+        [20, 20 + PAD_Y, 10, 8, 0.0, 0.7],     # misma caja, otra clase → se conserva
+        [50, 10 + PAD_Y, 6, 6, 0.1, 0.0],      # bajo el umbral de confianza
+    ]
+
+# ============================================================
+# PRE-PROCESADO
+# ============================================================
+
+def test_letterbox_pads_to_model_input_with_gray():
+    image = np.zeros((30, 60, 3), dtype=np.uint8)
+    boxed, gain, (pad_x, pad_y) = yolo_onnx.letterbox(image, IMGSZ)
+
+    assert boxed.shape == (64, 64, 3)
+    assert gain == pytest.approx(64 / 60)
+    assert pad_x == pytest.approx(0.0)
+    assert pad_y == pytest.approx(16.0)
+    assert (boxed[:16] == 114).all() and (boxed[-16:] == 114).all()
+    assert (boxed[16:48] == 0).all()
+
+
+def test_letterbox_odd_padding_keeps_input_size():
+    boxed, _, (_, pad_y) = yolo_onnx.letterbox(np.zeros((31, 60, 3), dtype=np.uint8), IMGSZ)
+    assert boxed.shape == (64, 64, 3)
+    assert pad_y == pytest.approx(15.5)
+
+
+def test_to_tensor_is_rgb_nchw_normalized():
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    image[..., 0] = 255                                  # canal B
+    tensor = yolo_onnx._to_tensor([image])
+    assert tensor.shape == (1, 3, 4, 4) and tensor.dtype == np.float32
+    assert (tensor[0, 2] == 1.0).all() and (tensor[0, :2] == 0.0).all()
+
+# ============================================================
+# POST-PROCESADO
+# ============================================================
+
+def test_nms_is_per_class():
+    boxes = np.array([[20, 30, 10, 8], [21, 30, 10, 8], [20, 30, 10, 8]], dtype=np.float32)
+    scores = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+    classes = np.array([0, 0, 1])
+    assert sorted(yolo_onnx._nms(boxes, scores, classes, 0.7).tolist()) == [0, 2]
+
+
+def test_postprocess_detect_decodes_to_frame_coordinates():
+    output = _model('detect', {0: 'a', 1: 'b'})._postprocess(
+        [_raw(_detect_rows())], FRAME_SHAPE, 1.0, (0.0, float(PAD_Y)), conf=0.25, iou=0.7)
+
+    assert output['orig_shape'] == FRAME_SHAPE[:2]
+    assert output['scores'].tolist() == pytest.approx([0.9, 0.7])
+    assert output['classes'].tolist() == [0, 1]
+    np.testing.assert_allclose(output['boxes'], [[15, 16, 25, 24]] * 2)
+    assert output['masks'] is None and output['obb'] is None
+
+
+def test_postprocess_detect_clips_boxes_to_frame():
+    rows = [[2, 2 + PAD_Y, 10, 10, 0.9]]
+    output = _model('detect', {0: 'a'})._postprocess([_raw(rows)], FRAME_SHAPE, 1.0, (0.0, float(PAD_Y)), 0.25, 0.7)
+    np.testing.assert_allclose(output['boxes'], [[0, 0, 7, 7]])
+
+
+def test_postprocess_segment_masks_cropped_to_box_without_padding():
+    # Coeficientes [1, 0] sobre prototipos (+10, 0): máscara ~1 en toda la entrada
+    rows = [[20, 20 + PAD_Y, 10, 8, 0.9, 1.0, 0.0]]
+    protos = np.zeros((1, 2, 16, 16), dtype=np.float32)
+    protos[0, 0] = 10.0
+    output = _model('segment', {0: 'a'})._postprocess(
+        [_raw(rows), protos], FRAME_SHAPE, 1.0, (0.0, float(PAD_Y)), 0.25, 0.7)
+
+    masks = output['masks']
+    assert masks.shape == (1,) + FRAME_SHAPE[:2]
+    binary = masks[0] > 0.5
+    assert binary[16:24, 15:25].all()
+    assert binary.sum() == 8 * 10
+
+
+def test_postprocess_obb_uses_rotated_nms():
+    rows = [
+        [32, 32, 20, 10, 0.9, 0.0],
+        [32, 32, 20, 10, 0.8, 0.05],            # casi la misma caja rotada → suprimida
+        [10, 10, 6, 6, 0.7, 0.0],
+    ]
+    output = _model('obb', {0: 'a'})._postprocess([_raw(rows)], (64, 64, 3), 1.0, (0.0, 0.0), 0.25, 0.7)
+
+    assert output['scores'].tolist() == pytest.approx([0.9, 0.7])
+    np.testing.assert_allclose(output['obb'][0], [32, 32, 20, 10, 0], atol=1e-5)
+    np.testing.assert_allclose(output['boxes'][0], [22, 27, 42, 37], atol=1e-4)
+
+
+def test_compare_predictions_matches_boxes_scores_and_masks():
+    mask = np.zeros((1, 64, 64), dtype=np.float32)
+    mask[0, 26:34, 15:25] = 1.0
+    reference = {'boxes': np.array([[15, 10, 25, 18]], dtype=np.float32),
+                 'scores': np.array([0.9], dtype=np.float32),
+                 'masks': mask, 'orig_shape': FRAME_SHAPE[:2]}
+
+    assert yolo_onnx.compare_predictions(reference, dict(reference))['ok']
+    assert not yolo_onnx.compare_predictions(reference, dict(reference, scores=np.array([0.7], dtype=np.float32)))['ok']
+    assert not yolo_onnx.compare_predictions(reference, dict(reference, boxes=reference['boxes'] + 6))['ok']
+
+    moved = np.zeros_like(mask)
+    moved[0, 26:34, 35:45] = 1.0
+    comparison = yolo_onnx.compare_predictions(reference, dict(reference, masks=moved))
+    assert not comparison['ok'] and comparison['min_mask_iou'] == pytest.approx(0.0)
+
+# ============================================================
+# SESIÓN ONNX RUNTIME
+# ============================================================
+
+def _write_constant_model(path, raw):
+    """Modelo ONNX mínimo: ignora la imagen (0 * media) y devuelve siempre 'raw'"""
+    onnx = pytest.importorskip('onnx')
+    from onnx import TensorProto, helper, numpy_helper
+
+    nodes = [
+        helper.make_node('ReduceMean', ['images'], ['mean'], keepdims=0),
+        helper.make_node('Mul', ['mean', 'zero'], ['null']),
+        helper.make_node('Add', ['raw', 'null'], ['output0']),
+    ]
+    graph = helper.make_graph(
+        nodes, 'constant_yolo',
+        [helper.make_tensor_value_info('images', TensorProto.FLOAT, [1, 3, IMGSZ[0], IMGSZ[1]])],
+        [helper.make_tensor_value_info('output0', TensorProto.FLOAT, list(raw.shape))],
+        initializer=[numpy_helper.from_array(raw, 'raw'),
+                     numpy_helper.from_array(np.array(0.0, dtype=np.float32), 'zero')])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    for key, value in {'task': 'detect', 'names': "{0: 'a', 1: 'b'}", 'imgsz': str(list(IMGSZ))}.items():
+        entry = model.metadata_props.add()
+        entry.key, entry.value = key, value
+    onnx.save(model, path)
+
+
+def test_onnxruntime_session_predict(tmp_path):
+    pytest.importorskip('onnxruntime')
+    path = str(tmp_path / 'constant_yolo.onnx')
+    _write_constant_model(path, _raw(_detect_rows()))
+
+    model = yolo_onnx.OnnxYoloModel(path, 'onnxruntime')
+    assert (model.task, model.names, model.imgsz) == ('detect', {0: 'a', 1: 'b'}, IMGSZ)
+
+    output = model.predict(np.zeros(FRAME_SHAPE, dtype=np.uint8), conf=0.25)[0]
+    assert output['classes'].tolist() == [0, 1]
+    np.testing.assert_allclose(output['boxes'], [[15, 16, 25, 24]] * 2)
+
+# ============================================================
+# PARIDAD CON ULTRALYTICS
+# ============================================================
+
+@pytest.mark.parametrize('model_key', ['detection_model', 'holes_model'])
+def test_parity_with_ultralytics(model_key):
+    pytest.importorskip('ultralytics')
+    pytest.importorskip('onnxruntime')
+
+    model_path = config_store.get_section('vision').get(model_key)
+    pt_path = os.path.join(PROJECT_ROOT, model_path) if model_path else None
+    if not pt_path or not os.path.exists(pt_path):
+        pytest.skip(f"Modelo no disponible: {model_path}")
+
+    result = yolo_onnx.run_parity(pt_path, IMAGES_DIR, 'onnxruntime')
+    failures = [d for d in result['details'] if not d['ok']]
+    assert result['images'] > 0
+    assert result['ok'], failures
@@ -38,6 +38,7 @@ if src_path not in sys.path:
     sys.path.insert(0, src_path)
 
 from vision import camera_manager
+from src import config_store
 
 
 # ============================================================
@@ -300,7 +301,6 @@ def _dibujar_linea_offset(frame, datos_aruco, primera_muesca, linea_referencia):
         Frame con línea offset dibujada
     """
     
-    import json
     import numpy as np
     
     try:
@@ -313,10 +313,7 @@ def _dibujar_linea_offset(frame, datos_aruco, primera_muesca, linea_referencia):
         angle_rad = linea_referencia.get('angle_rad', 0)
         
         # Cargar configuración del ArUco para obtener offset del troquel
-        with open('config.json', 'r') as f:
-            config = json.load(f)
-        
-        aruco_config = config.get('aruco', {})
+        aruco_config = config_store.get_section('aruco')
         center_x_mm = aruco_config.get('troqueladora_center_x_mm', 0)
         center_y_mm = aruco_config.get('troqueladora_center_y_mm', 0)
         